@@ -1,14 +1,25 @@
 import pymel.core as pm
+import key_transfer
 
-root1 = pm.ls(sl=1)
-joint_children1 = root1[0].listRelatives(ad=1, type='joint')
-joint_children1.insert(0, root1[0])
 
-root2 = pm.ls(sl=1)
-joint_children2 = root2[0].listRelatives(ad=1, type='joint')
-joint_children2.insert(0, root2[0])
+def copy_selected_keys(mode="name", prefixes=()):
+    '''
+    Copies the animation of the first selected skeleton to the second one. Joints are paired by name (or by path
+    under the root with mode="path") instead of by their order in the hierarchy.
+    Args:
+        mode: How joints are paired, "name" or "path"
+        prefixes: Name prefixes to ignore when pairing
+    Returns: The new animCurves
+    '''
+    selection = pm.ls(sl=1)
+    if len(selection) != 2:
+        raise RuntimeError("Select the source skeleton root, then the target skeleton root")
+    root1, root2 = selection
 
+    new_curves, _ = key_transfer.transfer_hierarchy(root1.longName(), root2.longName(), mode=mode,
+                                                    prefixes=prefixes)
+    return new_curves
 
-for i in range(len(joint_children1)):
-    pm.copyKey(str(joint_children1[i]))
-    pm.pasteKey(str(joint_children2[i]))
\ No newline at end of file
+
+if __name__ == "__main__":
+    copy_selected_keys()
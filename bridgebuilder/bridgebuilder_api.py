@@ -0,0 +1,258 @@
+from maya import cmds as cmds
+from maya.api import OpenMaya
+import bridgebuilder.bridgebuilder_core as bridgebuilder_core
+import bridgebuilder.bridgebuilder_graph as bridgebuilder_graph
+import contextlib
+import os
+
+##############################################
+##Applying build plans through the Maya API##
+##############################################
+# ModifierBackend runs a GraphModifier's node creations, parenting, attribute sets and connections through an
+# MDGModifier/MDagModifier pair instead of one maya.cmds call per edit. Edits made with a modifier from a script
+# can't be undone on their own, so this file is also loaded as a plugin for APPLY_COMMAND, an undoable command that
+# applies the queued edits and undoes/redoes them with the modifiers.
+
+maya_useNewAPI = True
+PLUGIN_NAME = "bridgebuilder_api"
+APPLY_COMMAND = "bridgeBuilderApply"
+# Edits waiting for APPLY_COMMAND, callables taking (MDGModifier, MDagModifier)
+_pending_edits = []
+_INTEGER_TYPES = (OpenMaya.MFnNumericData.kByte, OpenMaya.MFnNumericData.kChar, OpenMaya.MFnNumericData.kShort,
+                  OpenMaya.MFnNumericData.kInt)
+
+
+class ApplyEditsCommand(OpenMaya.MPxCommand):
+    """
+    Runs a queued edit with an MDGModifier for dependency nodes and an MDagModifier for everything else, so Maya
+    undoes and redoes it like any other command
+    """
+    def __init__(self):
+        super(ApplyEditsCommand, self).__init__()
+        self.dg_modifier = OpenMaya.MDGModifier()
+        self.dag_modifier = OpenMaya.MDagModifier()
+
+    @staticmethod
+    def creator():
+        return ApplyEditsCommand()
+
+    def isUndoable(self):
+        return True
+
+    def doIt(self, args):
+        # Maya loads the plugin as a second copy of this file, the queue lives in the imported module
+        import bridgebuilder.bridgebuilder_api as bridgebuilder_api
+        bridgebuilder_api._pending_edits.pop(0)(self.dg_modifier, self.dag_modifier)
+
+    def redoIt(self):
+        self.dg_modifier.doIt()
+        self.dag_modifier.doIt()
+
+    def undoIt(self):
+        self.dag_modifier.undoIt()
+        self.dg_modifier.undoIt()
+
+
+def initializePlugin(plugin):
+    OpenMaya.MFnPlugin(plugin).registerCommand(APPLY_COMMAND, ApplyEditsCommand.creator)
+
+
+def uninitializePlugin(plugin):
+    OpenMaya.MFnPlugin(plugin).deregisterCommand(APPLY_COMMAND)
+
+
+def applyEdits(edit, cmds=cmds):
+    """
+    Runs edit(dg_modifier, dag_modifier) as a single undoable command, loading this file as a plugin the first time.
+    The edit has to call doIt() on the modifiers itself.
+    Args:
+        edit: The callable to run
+        cmds: The maya.cmds module (or a wrapper around it) to run the command with
+    """
+    if not cmds.pluginInfo(PLUGIN_NAME, query=True, loaded=True):
+        cmds.loadPlugin("{}.py".format(os.path.splitext(os.path.abspath(__file__))[0]), quiet=True)
+    _pending_edits.append(edit)
+    try:
+        getattr(cmds, APPLY_COMMAND)()
+    finally:
+        del _pending_edits[:]
+
+
+def _setPlug(modifier, mplug, values):
+    """
+    Queues a plug value the way cmds.setAttr would set it, values are in UI units and compounds take a value per child
+    """
+    if mplug.isCompound:
+        if len(values) != mplug.numChildren():
+            raise ValueError("{} has {} children, got {} values".format(mplug.name(), mplug.numChildren(),
+                                                                      len(values)))
+        for i, value in enumerate(values):
+            _setPlug(modifier, mplug.child(i), [value])
+        return
+    if len(values) != 1:
+        raise ValueError("{} takes one value, got {}".format(mplug.name(), len(values)))
+
+    value = values[0]
+    attribute = mplug.attribute()
+    if attribute.hasFn(OpenMaya.MFn.kEnumAttribute):
+        modifier.newPlugValueInt(mplug, int(value))
+    elif attribute.hasFn(OpenMaya.MFn.kUnitAttribute):
+        unit_type = OpenMaya.MFnUnitAttribute(attribute).unitType()
+        if unit_type == OpenMaya.MFnUnitAttribute.kAngle:
+            modifier.newPlugValueMAngle(mplug, OpenMaya.MAngle(value, OpenMaya.MAngle.uiUnit()))
+        elif unit_type == OpenMaya.MFnUnitAttribute.kDistance:
+            modifier.newPlugValueMDistance(mplug, OpenMaya.MDistance(value, OpenMaya.MDistance.uiUnit()))
+        else:
+            modifier.newPlugValueDouble(mplug, float(value))
+    elif attribute.hasFn(OpenMaya.MFn.kNumericAttribute):
+        numeric_type = OpenMaya.MFnNumericAttribute(attribute).numericType()
+        if numeric_type == OpenMaya.MFnNumericData.kBoolean:
+            modifier.newPlugValueBool(mplug, bool(value))
+        elif numeric_type in _INTEGER_TYPES:
+            modifier.newPlugValueInt(mplug, int(value))
+        else:
+            modifier.newPlugValueDouble(mplug, float(value))
+    else:
+        raise TypeError("Can't set {} through a modifier, use GraphModifier.command".format(mplug.name()))
+
+
+def _curveData(points, degree):
+    """
+    Builds the nurbsCurve data cmds.curve(degree=degree, point=points) would create
+    """
+    data = OpenMaya.MFnNurbsCurveData().create()
+    OpenMaya.MFnNurbsCurve().create(OpenMaya.MPointArray([OpenMaya.MPoint(*p) for p in points]),
+                                    OpenMaya.MDoubleArray(bridgebuilder_core.uniformKnots(len(points), degree)),
+                                    degree, OpenMaya.MFnNurbsCurve.kOpen, False, False, data)
+    return data
+
+
+class ModifierBackend(object):
+    """
+    Executes a GraphModifier with one undoable API command instead of a maya.cmds call per edit. Node creations,
+    parenting, attribute sets and connections are queued and applied together when the transaction ends or right
+    before a command needs the real node names. Commands still run through maya.cmds, inside the same undo chunk.
+    Nodes are returned under their requested names until the edits are applied, GraphModifier.doIt swaps them for
+    the real names with nodeName afterwards.
+    """
+    def __init__(self, cmds=cmds):
+        """
+        Args:
+            cmds: The maya.cmds module (or a wrapper around it) to run the undo chunk, the apply command and any
+            GraphModifier.command edits with
+        """
+        self.cmds = cmds
+        self.creates = []
+        self.parents = []
+        self.sets = []
+        self.connections = []
+        self.objects = {}
+        self.names = {}
+        self.dag_types = {}
+
+    @contextlib.contextmanager
+    def transaction(self, name):
+        self.cmds.undoInfo(openChunk=True, chunkName=name)
+        try:
+            with bridgebuilder_graph.suspendedRefresh(self.cmds):
+                yield
+                self.flush()
+        finally:
+            self.cmds.undoInfo(closeChunk=True)
+
+    def _isDag(self, node_type):
+        if node_type not in self.dag_types:
+            self.dag_types[node_type] = "dagNode" in (self.cmds.nodeType(node_type, isTypeName=True,
+                                                                         inherited=True) or [])
+        return self.dag_types[node_type]
+
+    def createNode(self, node_type, name, parent=None):
+        self.creates.append((node_type, name, parent, None))
+        return name
+
+    def curve(self, name, points, degree):
+        shape = name + "Shape"
+        self.creates.append(("transform", name, None, None))
+        self.creates.append(("nurbsCurve", shape, name, (points, degree)))
+        return name, shape
+
+    def parent(self, child, parent):
+        self.parents.append((child, parent))
+
+    def setAttr(self, plug, values, kwargs):
+        self.sets.append((plug, values))
+
+    def connectAttr(self, source, destination, force=False):
+        self.connections.append((source, destination, force))
+
+    def command(self, command_name, args, kwargs):
+        self.flush()
+        args = [[self.nodeName(a) for a in arg] if isinstance(arg, (list, tuple)) else self.nodeName(arg)
+                for arg in args]
+        return getattr(self.cmds, command_name)(*args, **kwargs)
+
+    def nodeName(self, name):
+        """
+        Gets the real name of a node created by this backend, once the edits are applied
+        """
+        return self.names.get(name, name) if isinstance(name, str) else name
+
+    def _object(self, name):
+        if name in self.objects:
+            return self.objects[name]
+        selection_list = OpenMaya.MSelectionList()
+        selection_list.add(name)
+        return selection_list.getDependNode(0)
+
+    def _plug(self, plug):
+        node, _, attribute = plug.partition(".")
+        selection_list = OpenMaya.MSelectionList()
+        selection_list.add("{}.{}".format(self.nodeName(node), attribute))
+        return selection_list.getPlug(0)
+
+    def _apply(self, dg_modifier, dag_modifier):
+        # Create and name every node first so the rest of the edits can find their plugs by name
+        for node_type, name, parent, curve in self.creates:
+            if self._isDag(node_type):
+                parent_object = self._object(parent) if parent else OpenMaya.MObject.kNullObj
+                node = dag_modifier.createNode(node_type, parent_object)
+                dag_modifier.renameNode(node, name)
+            else:
+                node = dg_modifier.createNode(node_type)
+                dg_modifier.renameNode(node, name)
+            self.objects[name] = node
+        dg_modifier.doIt()
+        dag_modifier.doIt()
+
+        for name, node in self.objects.items():
+            if node.hasFn(OpenMaya.MFn.kDagNode):
+                self.names[name] = OpenMaya.MFnDagNode(node).partialPathName()
+            else:
+                self.names[name] = OpenMaya.MFnDependencyNode(node).name()
+
+        for node_type, name, parent, curve in self.creates:
+            if curve:
+                dag_modifier.newPlugValue(self._plug(name + ".cached"), _curveData(*curve))
+        for child, parent in self.parents:
+            dag_modifier.reparentNode(self._object(child), self._object(parent))
+        for plug, values in self.sets:
+            _setPlug(dag_modifier, self._plug(plug), values)
+        for source, destination, force in self.connections:
+            destination_plug = self._plug(destination)
+            if destination_plug.isDestination:
+                if not force:
+                    raise RuntimeError("{} already has an incoming connection".format(destination))
+                dag_modifier.disconnect(destination_plug.source(), destination_plug)
+            dag_modifier.connect(self._plug(source), destination_plug)
+        dag_modifier.doIt()
+
+    def flush(self):
+        """
+        Applies the queued edits with one APPLY_COMMAND call
+        """
+        if not (self.creates or self.parents or self.sets or self.connections):
+            return
+        try:
+            applyEdits(self._apply, self.cmds)
+        finally:
+            self.creates, self.parents, self.sets, self.connections = [], [], [], []
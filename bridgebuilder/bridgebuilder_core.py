@@ -0,0 +1,667 @@
+import concurrent.futures
+import hashlib
+import multiprocessing
+import numpy
+import re
+
+#############################################
+##Geometry helpers that don't require Maya##
+#############################################
+# Everything in here works on plain lists/NumPy arrays so the heavy math of a rope build can be run and checked
+# outside of Maya. bridgebuilder_func is responsible for pulling the data out of the scene and applying the results.
+
+
+def spanCenters(positions, verts_in_span):
+    """
+    Computes the center point of every span of a cylinder in one vectorized pass
+    Args:
+        positions: A flat list of xyz values or an (N, 3) array of vertex/CV positions ordered span by span
+        verts_in_span: The number of vertices that make up one edge loop/span
+    Returns:
+        centers: An (spans, 3) array with the center of each span
+    """
+    positions = numpy.asarray(positions, dtype=float).reshape(-1, 3)
+    if verts_in_span < 1:
+        raise ValueError("verts_in_span must be at least 1, got {}".format(verts_in_span))
+
+    # Any leftover vertices that don't make up a full span (caps etc.) are ignored, same as selectSpans
+    num_of_spans = len(positions) // verts_in_span
+    spans = positions[:num_of_spans * verts_in_span].reshape(num_of_spans, verts_in_span, 3)
+
+    # centerJoint averages the bounding box of each component, which for points is just their mean
+    return spans.mean(axis=1)
+
+
+def groupCenters(positions, counts):
+    """
+    Computes the center point of consecutive groups of positions that can each have a different size
+    Args:
+        positions: A flat list of xyz values or an (N, 3) array, with the positions of each group stored back to back
+        counts: The number of positions that belong to each group
+    Returns:
+        centers: A (groups, 3) array with the center of each group
+    """
+    positions = numpy.asarray(positions, dtype=float).reshape(-1, 3)
+    counts = numpy.asarray(counts, dtype=int)
+    if len(counts) == 0:
+        return numpy.zeros((0, 3))
+    if numpy.any(counts < 1):
+        raise ValueError("Every group needs at least one position")
+    if counts.sum() != len(positions):
+        raise ValueError("Group sizes add up to {} but {} positions were given".format(counts.sum(), len(positions)))
+
+    starts = numpy.concatenate(([0], numpy.cumsum(counts)[:-1]))
+    return numpy.add.reduceat(positions, starts, axis=0) / counts[:, None]
+
+
+def uniqueSurfaceCVs(positions, num_cvs_u, num_cvs_v, overlap_u=0, overlap_v=0):
+    """
+    Drops the CVs a periodic nurbsSurface repeats at the end of each direction, so the positions line up with the
+    unique CVs cmds.ls(cv[*][*], fl=True) lists
+    Args:
+        positions: A flat list of xyz values or an (N, 3) array as returned by MFnNurbsSurface.cvPositions, V varying
+        fastest
+        num_cvs_u: MFnNurbsSurface.numCVsInU, which counts the overlapping CVs
+        num_cvs_v: MFnNurbsSurface.numCVsInV, which counts the overlapping CVs
+        overlap_u: The number of repeated CVs in U, the U degree for a periodic form and 0 otherwise
+        overlap_v: The number of repeated CVs in V, the V degree for a periodic form and 0 otherwise
+    Returns:
+        positions: An ((num_cvs_u - overlap_u) * (num_cvs_v - overlap_v), 3) array
+    """
+    positions = numpy.asarray(positions, dtype=float).reshape(-1, 3)
+    if len(positions) != num_cvs_u * num_cvs_v:
+        raise ValueError("Expected {} x {} CVs, got {}".format(num_cvs_u, num_cvs_v, len(positions)))
+    if not (0 <= overlap_u < num_cvs_u and 0 <= overlap_v < num_cvs_v):
+        raise ValueError("Can't drop {} x {} overlapping CVs from {} x {}".format(overlap_u, overlap_v, num_cvs_u,
+                                                                                 num_cvs_v))
+
+    grid = positions.reshape(num_cvs_u, num_cvs_v, 3)
+    return grid[:num_cvs_u - overlap_u, :num_cvs_v - overlap_v].reshape(-1, 3)
+
+
+def plankSides(positions, counts):
+    """
+    Computes the left/right joint positions and two-influence skin weights for many boards at once. Like bindPlanks
+    always did, the odd vertices of a board are its left side and the even ones its right side.
+    Args:
+        positions: A flat list of xyz values or an (N, 3) array, with the vertices of each board stored back to back
+        counts: The number of vertices of each board
+    Returns:
+        left_centers, right_centers, left_weights: (boards, 3) arrays of the side centers and an (N,) array with the
+        left joint's weight of every vertex (the right joint gets the rest). Weights fall off linearly along the line
+        from the left center to the right one.
+    """
+    positions = numpy.asarray(positions, dtype=float).reshape(-1, 3)
+    counts = numpy.asarray(counts, dtype=int)
+    if numpy.any(counts < 2):
+        raise ValueError("Every board needs at least two vertices")
+    if counts.sum() != len(positions):
+        raise ValueError("Board sizes add up to {} but {} positions were given".format(counts.sum(), len(positions)))
+
+    boards = numpy.repeat(numpy.arange(len(counts)), counts)
+    starts = numpy.concatenate(([0], numpy.cumsum(counts)[:-1]))
+    left = (numpy.arange(len(positions)) - starts[boards]) % 2 == 1
+
+    def sideCenters(mask):
+        side_counts = numpy.bincount(boards[mask], minlength=len(counts))[:, None]
+        sums = numpy.stack([numpy.bincount(boards[mask], positions[mask, axis], minlength=len(counts))
+                            for axis in range(3)], axis=1)
+        return sums / side_counts
+
+    left_centers = sideCenters(left)
+    right_centers = sideCenters(~left)
+
+    axes = right_centers - left_centers
+    lengths = numpy.einsum("ij,ij->i", axes, axes)
+    offsets = numpy.einsum("ij,ij->i", positions - left_centers[boards], axes[boards])
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        along = numpy.where(lengths[boards] > 0, offsets / lengths[boards], 0.5)
+
+    return left_centers, right_centers, 1.0 - numpy.clip(along, 0.0, 1.0)
+
+
+def fullKnots(knots):
+    """
+    Converts a Maya knot vector (which leaves out the first and last knot) to the full knot vector used by de Boor
+    Args:
+        knots: The knots as returned by MFnNurbsCurve.knots() or curveInfo.knots
+    Returns:
+        knots: The knot vector with the two outer knots added back
+    """
+    knots = [float(k) for k in knots]
+    return [knots[0]] + knots + [knots[-1]]
+
+
+def uniformKnots(num_cvs, degree=3):
+    """
+    Builds the Maya knot vector that cmds.curve(degree=degree, point=...) creates for the given number of CVs
+    Args:
+        num_cvs: The number of CVs on the curve
+        degree: The degree of the curve
+    Returns:
+        knots: A Maya style (num_cvs + degree - 1) knot vector, pass it through fullKnots before evaluating
+    """
+    spans = num_cvs - degree
+    if spans < 1:
+        raise ValueError("A degree {} curve needs at least {} CVs, got {}".format(degree, degree + 1, num_cvs))
+    return [0.0] * (degree - 1) + [float(i) for i in range(spans + 1)] + [float(spans)] * (degree - 1)
+
+
+def _findSpan(knots, degree, num_cvs, param):
+    """
+    Finds the index k of the knot interval [knots[k], knots[k + 1]) that contains param
+    """
+    if param >= knots[num_cvs]:
+        # The end of the curve belongs to the last non-empty interval
+        k = num_cvs - 1
+        while k > degree and knots[k] == knots[k + 1]:
+            k -= 1
+        return k
+    k = degree
+    while k < num_cvs - 1 and param >= knots[k + 1]:
+        k += 1
+    return k
+
+
+def evaluateBSpline(cvs, knots, degree, param):
+    """
+    Evaluates a point on a NURBS curve (non-rational) with de Boor's algorithm in pure Python
+    Args:
+        cvs: A list of xyz control points
+        knots: The full knot vector (len(cvs) + degree + 1 values, see fullKnots)
+        degree: The degree of the curve
+        param: The parameter to evaluate, clamped to the curve's domain
+    Returns:
+        point: The [x, y, z] position on the curve
+    """
+    num_cvs = len(cvs)
+    if len(knots) != num_cvs + degree + 1:
+        raise ValueError("Expected {} knots for {} CVs of degree {}, got {}".format(num_cvs + degree + 1, num_cvs,
+                                                                                     degree, len(knots)))
+    param = min(max(param, knots[degree]), knots[num_cvs])
+    k = _findSpan(knots, degree, num_cvs, param)
+
+    points = [list(cvs[j + k - degree]) for j in range(degree + 1)]
+    for r in range(1, degree + 1):
+        for j in range(degree, r - 1, -1):
+            left = knots[j + k - degree]
+            denominator = knots[j + 1 + k - r] - left
+            alpha = 0.0 if denominator == 0 else (param - left) / denominator
+            points[j] = [(1.0 - alpha) * a + alpha * b for a, b in zip(points[j - 1], points[j])]
+
+    return points[degree]
+
+
+def evaluateBSplines(cvs, knots, degree, params):
+    """
+    Vectorized version of evaluateBSpline that evaluates any number of parameters on the same curve at once
+    Args:
+        cvs: A list/array of xyz control points
+        knots: The full knot vector (see fullKnots)
+        degree: The degree of the curve
+        params: A list/array of parameters, clamped to the curve's domain
+    Returns:
+        points: An (N, 3) array of positions on the curve
+    """
+    cvs = numpy.asarray(cvs, dtype=float).reshape(-1, 3)
+    knots = numpy.asarray(knots, dtype=float)
+    num_cvs = len(cvs)
+    params = numpy.clip(numpy.asarray(params, dtype=float).ravel(), knots[degree], knots[num_cvs])
+
+    # Find the knot interval of every parameter, the end of the curve belongs to the last interval
+    k = numpy.clip(numpy.searchsorted(knots, params, side="right") - 1, degree, num_cvs - 1)
+
+    points = cvs[k[:, None] + numpy.arange(degree + 1)[None, :] - degree].copy()
+    for r in range(1, degree + 1):
+        for j in range(degree, r - 1, -1):
+            left = knots[j + k - degree]
+            denominator = knots[j + 1 + k - r] - left
+            safe_denominator = numpy.where(denominator == 0, 1.0, denominator)
+            alpha = numpy.where(denominator == 0, 0.0, (params - left) / safe_denominator)[:, None]
+            points[:, j] = (1.0 - alpha) * points[:, j - 1] + alpha * points[:, j]
+
+    return points[:, degree]
+
+
+def derivativeCurve(cvs, knots, degree):
+    """
+    Builds the control points and knots of the first derivative of a NURBS curve (non-rational)
+    Args:
+        cvs: A list/array of xyz control points
+        knots: The full knot vector (see fullKnots)
+        degree: The degree of the curve
+    Returns:
+        cvs, knots, degree: The derivative curve, which can be evaluated with evaluateBSpline(s)
+    """
+    cvs = numpy.asarray(cvs, dtype=float).reshape(-1, 3)
+    knots = numpy.asarray(knots, dtype=float)
+    if degree == 0:
+        return numpy.zeros((1, 3)), knots[:2], 0
+
+    spans = knots[degree + 1:degree + len(cvs)] - knots[1:len(cvs)]
+    safe_spans = numpy.where(spans == 0, 1.0, spans)
+    derivative_cvs = numpy.where(spans[:, None] == 0, 0.0, degree * numpy.diff(cvs, axis=0) / safe_spans[:, None])
+
+    return derivative_cvs, knots[1:-1], degree - 1
+
+
+class ClosestParamSolver(object):
+    """
+    Batched closest point on curve solver, the replacement for a temporary nearestPointOnCurve node per point.
+    The curve is sampled once and the samples are bucketed in a uniform grid. Each query starts from its nearest
+    sample and is refined with Newton iterations on the exact curve.
+    """
+    def __init__(self, cvs, knots, degree, samples_per_span=8):
+        """
+        Args:
+            cvs: A list of xyz control points
+            knots: The full knot vector (see fullKnots)
+            degree: The degree of the curve
+            samples_per_span: The number of samples taken for each knot span to seed the Newton iterations
+        """
+        self.cvs = numpy.asarray(cvs, dtype=float).reshape(-1, 3)
+        self.knots = numpy.asarray(knots, dtype=float)
+        self.degree = degree
+        self.first_derivative = derivativeCurve(self.cvs, self.knots, degree)
+        self.second_derivative = derivativeCurve(*self.first_derivative)
+        self.min_param = self.knots[degree]
+        self.max_param = self.knots[len(self.cvs)]
+
+        domain = numpy.unique(self.knots[degree:len(self.cvs) + 1])
+        steps = numpy.linspace(0.0, 1.0, samples_per_span, endpoint=False)
+        self.sample_params = numpy.concatenate([start + (end - start) * steps
+                                                for start, end in zip(domain[:-1], domain[1:])] + [domain[-1:]])
+        self.sample_points = evaluateBSplines(self.cvs, self.knots, degree, self.sample_params)
+
+        # Bucket the samples so each cell holds a handful of consecutive samples along the curve
+        self.grid_min = self.sample_points.min(axis=0)
+        polyline_length = numpy.sum(numpy.linalg.norm(numpy.diff(self.sample_points, axis=0), axis=1))
+        self.cell_size = max(4.0 * polyline_length / max(len(self.sample_points) - 1, 1), 1e-8)
+        self.grid_max_cell = numpy.floor((self.sample_points.max(axis=0) - self.grid_min) / self.cell_size).astype(int)
+        self.buckets = {}
+        for index, cell in enumerate(self._cells(self.sample_points)):
+            self.buckets.setdefault(tuple(cell), []).append(index)
+
+    def _cells(self, points):
+        return numpy.floor((points - self.grid_min) / self.cell_size).astype(int)
+
+    def _nearestSample(self, point, cell):
+        """
+        Searches the grid in growing rings around a cell until no closer sample can exist
+        """
+        best_index = None
+        best_distance = numpy.inf
+        cx, cy, cz = (int(v) for v in cell)
+        max_ring = int(numpy.max(numpy.maximum(self.grid_max_cell - cell, cell))) + 1
+        for ring in range(max_ring + 1):
+            candidates = []
+            for dx in range(-ring, ring + 1):
+                for dy in range(-ring, ring + 1):
+                    # Only the outer shell of the ring is new, the inner cells were searched already
+                    on_shell = ring in (abs(dx), abs(dy))
+                    for dz in (range(-ring, ring + 1) if on_shell else ((-ring, ring) if ring else (0,))):
+                        candidates.extend(self.buckets.get((cx + dx, cy + dy, cz + dz), ()))
+            if candidates:
+                distances = numpy.sum((self.sample_points[candidates] - point) ** 2, axis=1)
+                closest = int(numpy.argmin(distances))
+                if distances[closest] < best_distance:
+                    best_index, best_distance = candidates[closest], distances[closest]
+            # Anything in the next ring is at least ring * cell_size away
+            if best_index is not None and numpy.sqrt(best_distance) <= ring * self.cell_size:
+                break
+
+        return best_index
+
+    def seedParams(self, points):
+        """
+        Finds the parameter of the closest curve sample for every query point
+        Args:
+            points: An (N, 3) array of query positions
+        Returns:
+            params: An (N,) array of sample parameters
+        """
+        points = numpy.asarray(points, dtype=float).reshape(-1, 3)
+        cells = self._cells(points)
+        inside = numpy.all((cells >= 0) & (cells <= self.grid_max_cell), axis=1)
+
+        indices = numpy.empty(len(points), dtype=int)
+        for i in numpy.nonzero(inside)[0]:
+            indices[i] = self._nearestSample(points[i], cells[i])
+
+        # Points outside of the grid are rare (locators are built from the curve), test them against every sample
+        outside = numpy.nonzero(~inside)[0]
+        if len(outside):
+            distances = numpy.sum((points[outside, None, :] - self.sample_points[None, :, :]) ** 2, axis=2)
+            indices[outside] = numpy.argmin(distances, axis=1)
+
+        return self.sample_params[indices]
+
+    def solve(self, points, iterations=8, tolerance=1e-10):
+        """
+        Finds the parameter of the closest point on the curve for every query point in one batch
+        Args:
+            points: An (N, 3) array of query positions
+            iterations: The maximum number of Newton iterations
+            tolerance: Stop once no parameter moves more than this
+        Returns:
+            params: An (N,) array of curve parameters, comparable to nearestPointOnCurve.parameter
+        """
+        points = numpy.asarray(points, dtype=float).reshape(-1, 3)
+        params = self.seedParams(points)
+
+        for _ in range(iterations):
+            offset = evaluateBSplines(self.cvs, self.knots, self.degree, params) - points
+            tangent = evaluateBSplines(*(self.first_derivative + (params,)))
+            curvature = evaluateBSplines(*(self.second_derivative + (params,)))
+
+            # Minimize |C(t) - P|^2, fall back to a gradient step where the second derivative isn't positive
+            slope = numpy.einsum("ij,ij->i", offset, tangent)
+            tangent_dot = numpy.einsum("ij,ij->i", tangent, tangent)
+            second = tangent_dot + numpy.einsum("ij,ij->i", offset, curvature)
+            denominator = numpy.where(second > 0, second, tangent_dot)
+            step = numpy.where(denominator > 0, slope / numpy.where(denominator > 0, denominator, 1.0), 0.0)
+
+            new_params = numpy.clip(params - step, self.min_param, self.max_param)
+            moved = numpy.max(numpy.abs(new_params - params)) if len(params) else 0.0
+            params = new_params
+            if moved < tolerance:
+                break
+
+        return params
+
+
+def motionPathRotations(tangents, up_vector=(0, 1, 0)):
+    """
+    Computes the rotations a motionPath node with follow on, frontAxis X, upAxis Y and a world up vector gives its
+    driven transform for the given curve tangents
+    Args:
+        tangents: An (N, 3) array of curve tangents
+        up_vector: The motionPath's worldUpVector
+    Returns:
+        rotations: An (N, 3) array of XYZ euler rotations in degrees
+    """
+    front = numpy.asarray(tangents, dtype=float).reshape(-1, 3)
+    front = front / numpy.maximum(numpy.linalg.norm(front, axis=1), 1e-12)[:, None]
+    side = numpy.cross(front, numpy.asarray(up_vector, dtype=float)[None, :])
+    side = side / numpy.maximum(numpy.linalg.norm(side, axis=1), 1e-12)[:, None]
+    up = numpy.cross(side, front)
+
+    # Maya matrices are row vectors, so the rows are the X/Y/Z axes and M = Rx * Ry * Rz for XYZ rotate order
+    matrices = numpy.stack([front, up, side], axis=1)
+    ry = numpy.arcsin(numpy.clip(-matrices[:, 0, 2], -1.0, 1.0))
+    gimbal = numpy.abs(numpy.cos(ry)) < 1e-9
+    rx = numpy.where(gimbal, numpy.arctan2(-matrices[:, 2, 1], matrices[:, 1, 1]),
+                     numpy.arctan2(matrices[:, 1, 2], matrices[:, 2, 2]))
+    rz = numpy.where(gimbal, 0.0, numpy.arctan2(matrices[:, 0, 1], matrices[:, 0, 0]))
+
+    return numpy.degrees(numpy.stack([rx, ry, rz], axis=1))
+
+
+class ArcLengthTable(object):
+    """
+    Samples a NURBS curve once into a cumulative arc length table so closest point and arc length queries for any
+    number of points can be answered in one vectorized batch
+    """
+    def __init__(self, cvs, knots, degree, samples_per_span=32):
+        """
+        Args:
+            cvs: A list of xyz control points
+            knots: The full knot vector (see fullKnots)
+            degree: The degree of the curve
+            samples_per_span: The number of line segments used to approximate each knot span
+        """
+        self.cvs = [list(map(float, cv)) for cv in cvs]
+        self.knots = [float(k) for k in knots]
+        self.degree = degree
+
+        num_cvs = len(self.cvs)
+        domain = sorted(set(self.knots[degree:num_cvs + 1]))
+        params = [domain[0]]
+        for start, end in zip(domain[:-1], domain[1:]):
+            params.extend(start + (end - start) * (i + 1) / float(samples_per_span) for i in range(samples_per_span))
+
+        self.params = numpy.array(params)
+        self.points = evaluateBSplines(self.cvs, self.knots, degree, self.params)
+        segment_lengths = numpy.linalg.norm(numpy.diff(self.points, axis=0), axis=1)
+        self.lengths = numpy.concatenate(([0.0], numpy.cumsum(segment_lengths)))
+        self.total_length = float(self.lengths[-1])
+
+    def closestPoints(self, points, chunk_size=256):
+        """
+        Finds the closest point on the sampled curve for every query point
+        Args:
+            points: An (N, 3) array of query positions
+            chunk_size: How many query points to test against all segments at once, keeps memory use bounded
+        Returns:
+            params, lengths: Arrays with the curve parameter and arc length of the closest point for each query
+        """
+        points = numpy.asarray(points, dtype=float).reshape(-1, 3)
+        starts = self.points[:-1]
+        segments = self.points[1:] - starts
+        segment_dot = numpy.einsum("ij,ij->i", segments, segments)
+        # Degenerate segments (repeated CVs) just snap to their start point
+        safe_dot = numpy.where(segment_dot > 0, segment_dot, 1.0)
+
+        params = numpy.empty(len(points))
+        lengths = numpy.empty(len(points))
+        for first in range(0, len(points), chunk_size):
+            chunk = points[first:first + chunk_size]
+            offsets = chunk[:, None, :] - starts[None, :, :]
+            t = numpy.clip(numpy.einsum("nsj,sj->ns", offsets, segments) / safe_dot, 0.0, 1.0)
+            t = numpy.where(segment_dot > 0, t, 0.0)
+            closest = starts[None, :, :] + t[:, :, None] * segments[None, :, :]
+            distances = numpy.einsum("nsj,nsj->ns", chunk[:, None, :] - closest, chunk[:, None, :] - closest)
+            best = numpy.argmin(distances, axis=1)
+            best_t = t[numpy.arange(len(chunk)), best]
+
+            params[first:first + len(chunk)] = self.params[best] + best_t * (self.params[best + 1] - self.params[best])
+            lengths[first:first + len(chunk)] = self.lengths[best] + best_t * (self.lengths[best + 1] -
+                                                                               self.lengths[best])
+
+        return params, lengths
+
+    def fractions(self, points):
+        """
+        Gets the arc length fraction (0-1, as used by motionPath.fractionMode) of the closest curve point to each query
+        Args:
+            points: An (N, 3) array of query positions
+        Returns:
+            fractions: An (N,) array of arc length fractions
+        """
+        params, lengths = self.closestPoints(points)
+        if self.total_length == 0:
+            return numpy.zeros(len(lengths))
+        return lengths / self.total_length
+
+
+def trailingIndex(name, token):
+    """
+    Parses the span number written right before a token in a node name, e.g. 12 for "left_rope_Main_12_CTRL_JNT"
+    Args:
+        name: The node name
+        token: The part of the name that follows the number, e.g. "_CTRL" or "_LOC"
+    Returns:
+        index: The number as an int (any width), or None if the name has no number before the token
+    """
+    match = re.search(r"(\d+){}".format(re.escape(token)), name)
+    return int(match.group(1)) if match else None
+
+
+def matchControlsToLocators(ctrl_joints, locators, ctrl_token="_CTRL", locator_token="_LOC", strict=False):
+    """
+    Pairs every locator with the control joint built for the same span using an index keyed on the span number,
+    so the matching runs in linear time
+    Args:
+        ctrl_joints: The control joint names
+        locators: The locator names
+        ctrl_token: The part of the control names that follows the span number
+        locator_token: The part of the locator names that follows the span number
+        strict: If True, every control and every locator has to be paired, for ropes built with a control per span
+    Returns:
+        pairs: A list of (locator, ctrl_joint) tuples in locator order, locators without a control are left out
+    """
+    if strict and len(ctrl_joints) != len(locators):
+        raise ValueError("Got {} control joints for {} locators".format(len(ctrl_joints), len(locators)))
+
+    ctrl_index = {}
+    for ctrl in ctrl_joints:
+        index = trailingIndex(ctrl, ctrl_token)
+        if index is not None:
+            # Keep the first control per span, the same one the old nested loop would have found
+            ctrl_index.setdefault(index, ctrl)
+
+    pairs = []
+    for locator in locators:
+        ctrl = ctrl_index.get(trailingIndex(locator, locator_token))
+        if ctrl is not None:
+            pairs.append((locator, ctrl))
+
+    if strict and len(pairs) != len(locators):
+        paired = set(locator for locator, _ in pairs)
+        raise ValueError("No control joint matches {}".format([locator for locator in locators
+                                                               if locator not in paired]))
+
+    return pairs
+
+
+def supportChain(control_count):
+    """
+    Gets the control joints buildSupport chains into its IK: every other control joint is an IK joint, and the chain
+    runs from the first one through the middle one to the last one
+    Args:
+        control_count: The number of control joints on the support rope
+    Returns:
+        start, middle, end: The indices of the chained control joints
+    """
+    ik_indices = list(range(control_count))[::2]
+    if len(ik_indices) < 3:
+        raise ValueError("A support rope needs at least 5 control joints for its IK chain, got {}".format(
+            control_count))
+    return ik_indices[0], ik_indices[len(ik_indices) // 2], ik_indices[-1]
+
+
+def supportRopeGeometry(positions, verts_in_span):
+    """
+    Computes everything about a support rope that only depends on its mesh, so it can run in a worker process
+    before any scene edits happen
+    Args:
+        positions: A flat list or (N, 3) array of the cylinder's vertex/CV positions, ordered span by span
+        verts_in_span: The number of vertices that make up one edge loop/span
+    Returns:
+        geometry: A dictionary with the span "centers", the "fractions" of each span along the control curve (built
+        through every other span like RopeUI.createSupportRopes does) and the upper/lower "ik_lengths" used by
+        addStretchyIK
+    """
+    centers = spanCenters(positions, verts_in_span)
+    control_positions = centers[0::2]
+
+    cvs = control_positions.tolist()
+    knots = fullKnots(uniformKnots(len(cvs)))
+    fractions = ArcLengthTable(cvs, knots, 3).fractions(centers)
+
+    # The upper and lower lengths of the same start -> middle -> end chain buildSupport builds
+    ik_positions = control_positions[list(supportChain(len(control_positions)))]
+    ik_lengths = numpy.linalg.norm(numpy.diff(ik_positions, axis=0), axis=1)
+
+    return {"centers": centers, "fractions": fractions, "ik_lengths": ik_lengths}
+
+
+def _supportRopeGeometryJob(job):
+    return supportRopeGeometry(*job)
+
+
+def computeSupportRopes(jobs, workers=None, executable=None, progress=None, cancelled=None):
+    """
+    Runs supportRopeGeometry for many ropes across a process pool
+    Args:
+        jobs: A list of (positions, verts_in_span) tuples
+        workers: The number of worker processes, all cores if None. 0 computes everything in this process
+        executable: The Python interpreter the workers are started with (inside Maya this has to be mayapy)
+        progress: An optional callable that gets the number of finished ropes after each one
+        cancelled: An optional callable, the computation stops as soon as it returns True
+    Returns:
+        results: A list of geometry dictionaries in job order, or None if it was cancelled
+    """
+    results = [None] * len(jobs)
+    if workers == 0 or len(jobs) < 2:
+        for i, job in enumerate(jobs):
+            if cancelled and cancelled():
+                return None
+            results[i] = _supportRopeGeometryJob(job)
+            if progress:
+                progress(i + 1)
+        return results
+
+    context = multiprocessing.get_context("spawn")
+    if executable:
+        context.set_executable(executable)
+
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context)
+    try:
+        futures = dict((executor.submit(_supportRopeGeometryJob, job), i) for i, job in enumerate(jobs))
+        pending = set(futures)
+        while pending:
+            done, pending = concurrent.futures.wait(pending, timeout=0.1,
+                                                    return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                results[futures[future]] = future.result()
+            if progress:
+                progress(len(jobs) - len(pending))
+            if cancelled and cancelled():
+                return None
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return results
+
+
+def ropeFingerprint(name, positions, verts_in_span, control_spans, rotation=False, decimals=4):
+    """
+    Summarizes the inputs a rope was built from so a later rebuild can tell what changed
+    Args:
+        name: The rope name the nodes were built with
+        positions: A flat list or (N, 3) array of the cylinder's vertex/CV positions, ordered span by span
+        verts_in_span: The number of vertices that make up one edge loop/span
+        control_spans: The indices of the spans the control joints were placed at
+        rotation: Whether the motion paths drive the locator rotations
+        decimals: Positions are rounded to this many decimals so float noise doesn't count as a change
+    Returns:
+        fingerprint: A JSON serializable dictionary with the vertex count, span layout, a hash per span, the control
+        picks and the curve CVs
+    """
+    positions = numpy.asarray(positions, dtype=float).reshape(-1, 3)
+    num_of_spans = len(positions) // verts_in_span
+    spans = numpy.round(positions[:num_of_spans * verts_in_span], decimals).reshape(num_of_spans, -1) + 0.0
+    curve_cvs = spanCenters(positions, verts_in_span)[list(control_spans)]
+
+    return {"name": name,
+            "rotation": bool(rotation),
+            "vertex_count": len(positions),
+            "verts_in_span": int(verts_in_span),
+            "span_hashes": [hashlib.sha1(span.tobytes()).hexdigest()[:16] for span in spans],
+            "control_spans": [int(i) for i in control_spans],
+            "curve_cvs": numpy.round(curve_cvs, decimals).tolist()}
+
+
+def diffFingerprints(old, new):
+    """
+    Compares two rope fingerprints
+    Args:
+        old: The fingerprint stored when the rope was built
+        new: The fingerprint of the current inputs
+    Returns:
+        diff: A dictionary with the "changed", "added" and "removed" span indices and whether the control curve
+        ("curve_changed") or the whole layout ("full") has to be rebuilt
+    """
+    full = any(old.get(key) != new.get(key) for key in ("name", "rotation", "verts_in_span"))
+    curve_changed = old["control_spans"] != new["control_spans"] or old["curve_cvs"] != new["curve_cvs"]
+
+    old_hashes = old["span_hashes"]
+    new_hashes = new["span_hashes"]
+    common = min(len(old_hashes), len(new_hashes))
+
+    return {"full": full,
+            "curve_changed": curve_changed,
+            "changed": [i for i in range(common) if old_hashes[i] != new_hashes[i]],
+            "added": list(range(common, len(new_hashes))),
+            "removed": list(range(common, len(old_hashes)))}
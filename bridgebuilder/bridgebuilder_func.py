@@ -1,6 +1,19 @@
 from maya import cmds as cmds
+from maya.api import OpenMaya
+from maya.api import OpenMayaAnim
 import create_buffer_groups as buffer
+import bridgebuilder.bridgebuilder_api as bridgebuilder_api
+import bridgebuilder.bridgebuilder_core as bridgebuilder_core
+import bridgebuilder.bridgebuilder_graph as bridgebuilder_graph
+import bridgebuilder.bridgebuilder_plan as bridgebuilder_plan
+import bridgebuilder.bridgebuilder_profile as bridgebuilder_profile
+import contextlib
+import functools
+import json
 import logging
+import numpy
+import random
+import time
 
 #################################
 ##Steps to create a bridge rope##
@@ -14,15 +27,128 @@ import logging
 # Set up logger config and current level
 logging.basicConfig()
 logger = logging.getLogger("BridgeBuilder")
-logger.setLevel(logging.DEBUG)
+logger.setLevel(logging.INFO)
 
-def selectSpans(joint_name, verts_in_span=None):
+# The real maya.cmds module, the module level cmds is a _CmdsCounter wrapped around it
+maya_cmds = cmds
+# The string attribute buildRope stores a rope's fingerprint in, see rebuildRope
+FINGERPRINT_ATTR = "bridgebuilderFingerprint"
+_deferred_state = {"depth": 0, "profiler": None}
+
+
+class _CmdsCounter(object):
+    """
+    Wraps maya.cmds and counts every command call. The total is always kept for deferredEvaluation to report, the
+    per command counts only go to a profiler inside a profiling block.
+    """
+    def __init__(self, module):
+        self.module = module
+        self.calls = 0
+        self.wrappers = {}
+
+    def __getattr__(self, name):
+        if name not in self.wrappers:
+            command = getattr(self.module, name)
+            if not callable(command):
+                return command
+
+            @functools.wraps(command)
+            def counted(*args, **kwargs):
+                self.calls += 1
+                profiler = _deferred_state["profiler"]
+                if profiler is not None:
+                    profiler.addCall(name)
+                return command(*args, **kwargs)
+            self.wrappers[name] = counted
+        return self.wrappers[name]
+
+
+cmds = _CmdsCounter(maya_cmds)
+
+
+@contextlib.contextmanager
+def profiling(path=None):
+    """
+    Profiles every bridgebuilder call made inside the block: wall time, cmds calls per command and nodes
+    created/deleted. Outside of a profiling block only the total cmds call count is kept.
+    Args:
+        path: If given, the JSON/Chrome trace report is written here when the block ends
+    Returns:
+        profiler: The BuildProfiler collecting the data
+    """
+    if _deferred_state["profiler"] is not None:
+        raise RuntimeError("Already profiling")
+
+    profiler = bridgebuilder_profile.BuildProfiler()
+    callback_ids = [OpenMaya.MDGMessage.addNodeAddedCallback(lambda *args: profiler.nodeCreated()),
+                    OpenMaya.MDGMessage.addNodeRemovedCallback(lambda *args: profiler.nodeDeleted())]
+    _deferred_state["profiler"] = profiler
+    try:
+        yield profiler
+    finally:
+        _deferred_state["profiler"] = None
+        OpenMaya.MMessage.removeCallbacks(callback_ids)
+        if path:
+            profiler.write(path)
+            logger.info("Wrote bridgebuilder profile to %s", path)
+
+
+@contextlib.contextmanager
+def deferredEvaluation(name):
+    """
+    Wraps bridgebuilder work so viewport refresh is suspended (nothing pulls on the DG until the block ends), all
+    edits collapse into one named undo chunk and everything is restored if an exception is raised. Blocks can be
+    nested, only the outermost one changes scene state. The outermost block's time and number of cmds calls are
+    logged at info level (nested blocks at debug level), and recorded in more detail by the profiler inside a
+    profiling block.
+    Args:
+        name: The undo chunk name, usually the function being run
+    """
+    outermost = _deferred_state["depth"] == 0
+    profiler = _deferred_state["profiler"]
+    if outermost:
+        maya_cmds.undoInfo(openChunk=True, chunkName=name)
+    if profiler:
+        profiler.begin(name)
+
+    start = time.time()
+    start_calls = cmds.calls
+    _deferred_state["depth"] += 1
+    try:
+        with bridgebuilder_graph.suspendedRefresh(maya_cmds):
+            yield
+    finally:
+        _deferred_state["depth"] -= 1
+        if profiler:
+            profiler.end()
+        if outermost:
+            maya_cmds.undoInfo(closeChunk=True)
+        # The operation the user ran is reported, the nested calls it makes only at debug level
+        logger.log(logging.INFO if outermost else logging.DEBUG, "%s: %.3fs, %d cmds calls", name,
+                   time.time() - start, cmds.calls - start_calls)
+
+
+def deferred(function):
+    """
+    Decorator that runs a function inside deferredEvaluation, named after the function
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with deferredEvaluation(function.__name__):
+            return function(*args, **kwargs)
+    return wrapper
+
+
+@deferred
+def selectSpans(joint_name, verts_in_span=None, vectorized=True):
     """
     Creates joints at center of each span of a cylinder using the number of vertices that make up each span
     Args:
         verts_in_span: The number of vertices that make up one edge loop/span (if a constructor node is present on a
         polygon mesh, the subdivisionsAxis attribute will be used)
         joint_name: The preferred name for the newly created joints
+        vectorized: If True, fetch every vertex/CV position in one API query and compute all span centers at once
+        instead of querying the span vertices by name
     Returns:
         mesh_bind_joints, locators, spans, joint_name, mesh, constructor
     """
@@ -35,24 +161,24 @@ def selectSpans(joint_name, verts_in_span=None):
     # Calculate the number of spans
     if cmds.objectType(shape_node, isType="nurbsSurface"):
         # TODO: Test script on nurbsSurfaces and figure out how to deal with the first two spans
-        num_of_spans = len(cmds.ls('{}.cv[*][0]'.format(shape_node), fl=True)) - 2
-        span_range = len(cmds.ls('{}.cv[*][0]'.format(shape_node), fl=True))
-        for i in range(span_range):
-            vert_span = cmds.ls('{}.cv[{}][*]'.format(shape_node, i), fl=True)
-            cmds.select(vert_span)
-            if i <= 9:
-                mesh_bind_joints.append(centerJoint(name="{}_BIND_0{}".format(joint_name, i)))
-            else:
-                mesh_bind_joints.append(centerJoint(name="{}_BIND_{}".format(joint_name, i)))
-            cmds.select(clear=True)
+        # Count the unique CVs, periodic surfaces repeat their first CVs at the end of each direction
+        span_range, verts_in_span = getSurfaceCVCounts(shape_node)
+        num_of_spans = span_range - 2
+        if vectorized:
+            spans = [all_verts[i * verts_in_span:(i + 1) * verts_in_span] for i in range(span_range)]
+            centers = bridgebuilder_core.spanCenters(getComponentPositions(shape_node), verts_in_span)
+            mesh_bind_joints = createSpanJoints(joint_name, centers)
+        else:
+            vert_spans = [cmds.ls('{}.cv[{}][*]'.format(shape_node, i), fl=True) for i in range(span_range)]
+            mesh_bind_joints = centerJoints(vert_spans, spanJointNames(joint_name, span_range))
 
     elif cmds.objectType(shape_node, isType="mesh"):
         # If verts_in_span is None, set it to the subdivisionsAxis from the constructor node
-        logger.debug("CONSTUCTOR: {}".format(constructor))
+        logger.debug("CONSTUCTOR: %s", constructor)
         if not verts_in_span:
             verts_in_span = cmds.getAttr("{}.subdivisionsAxis".format(constructor))
 
-        logger.debug("VERTS IN SPAN: {}".format(verts_in_span))
+        logger.debug("VERTS IN SPAN: %s", verts_in_span)
         num_of_spans = int(len(all_verts) / verts_in_span)
 
         # Select vertices in bulk based on the number of vertices per span and create a joint at the center point before
@@ -65,25 +191,260 @@ def selectSpans(joint_name, verts_in_span=None):
                 # cmds.select(all_verts[inc], add=True)
                 inc += 1
 
-        for i in range(len(spans)):
-            cmds.select(spans[i])
-            if i <= 9:
-                mesh_bind_joints.append(centerJoint(name="{}_BIND_0{}".format(joint_name, i)))
-            else:
-                mesh_bind_joints.append(centerJoint(name="{}_BIND_{}".format(joint_name, i)))
-            cmds.select(clear=True)
+        if vectorized:
+            centers = bridgebuilder_core.spanCenters(getComponentPositions(shape_node), verts_in_span)
+            mesh_bind_joints = createSpanJoints(joint_name, centers)
+        else:
+            mesh_bind_joints = centerJoints(spans, spanJointNames(joint_name, len(spans)))
 
     else:
         raise Exception("Wrong lever! (Lever as in node type, please select a nurbsSurface or mesh)")
 
     # Create locators to attach above the mesh bind joints
-    locators = addLocators(mesh_bind_joints)
-    for i in range(len(locators)):
-        cmds.parent(mesh_bind_joints[i], locators[i])
+    locators = parentUnderLocators(mesh_bind_joints)
 
     return mesh_bind_joints, locators, spans, joint_name, mesh, constructor
 
 
+@deferred
+def parentUnderLocators(joints):
+    """
+    Creates a locator at each joint and parents the joint under it
+    Args:
+        joints: The bind joints created for each span
+    Returns:
+        locators: A list of the created locators
+    """
+    locators = addLocators(joints)
+    for i in range(len(locators)):
+        cmds.parent(joints[i], locators[i])
+
+    return locators
+
+
+@deferred
+def getComponentPositions(shape_node):
+    """
+    Gets the world space position of every vertex/CV on a mesh or nurbsSurface with a single API query
+    Args:
+        shape_node: The mesh or nurbsSurface shape
+    Returns:
+        positions: An (N, 3) array of positions in the same order as cmds.ls(vtx[*]/cv[*][*], fl=True)
+    """
+    selection_list = OpenMaya.MSelectionList()
+    selection_list.add(shape_node)
+    dag_path = selection_list.getDagPath(0)
+
+    if dag_path.hasFn(OpenMaya.MFn.kMesh):
+        points = OpenMaya.MFnMesh(dag_path).getPoints(OpenMaya.MSpace.kWorld)
+    elif dag_path.hasFn(OpenMaya.MFn.kNurbsSurface):
+        surface_fn = OpenMaya.MFnNurbsSurface(dag_path)
+        points = surface_fn.cvPositions(OpenMaya.MSpace.kWorld)
+        positions = numpy.array([(p.x, p.y, p.z) for p in points], dtype=float).reshape(-1, 3)
+        # cvPositions includes the overlapping CVs of periodic forms, which cmds.ls(cv[*][*]) leaves out
+        return bridgebuilder_core.uniqueSurfaceCVs(positions, surface_fn.numCVsInU, surface_fn.numCVsInV,
+                                                   *_surfaceOverlaps(surface_fn))
+    else:
+        raise Exception("Wrong lever! (Lever as in node type, please select a nurbsSurface or mesh)")
+
+    return numpy.array([(p.x, p.y, p.z) for p in points], dtype=float).reshape(-1, 3)
+
+
+def _surfaceOverlaps(surface_fn):
+    """
+    Gets the number of CVs a nurbsSurface repeats in U and V, which is the degree for a periodic form and 0 otherwise
+    """
+    overlap_u = surface_fn.degreeInU if surface_fn.formInU == OpenMaya.MFnNurbsSurface.kPeriodic else 0
+    overlap_v = surface_fn.degreeInV if surface_fn.formInV == OpenMaya.MFnNurbsSurface.kPeriodic else 0
+    return overlap_u, overlap_v
+
+
+def getSurfaceCVCounts(shape_node):
+    """
+    Gets the number of unique CVs in U and V of a nurbsSurface, the same counts cmds.ls(cv[*][0]/cv[0][*]) gives
+    Args:
+        shape_node: The nurbsSurface shape
+    Returns:
+        num_cvs_u, num_cvs_v: The CV counts without the overlapping CVs of periodic forms
+    """
+    selection_list = OpenMaya.MSelectionList()
+    selection_list.add(shape_node)
+    surface_fn = OpenMaya.MFnNurbsSurface(selection_list.getDagPath(0))
+    overlap_u, overlap_v = _surfaceOverlaps(surface_fn)
+
+    return surface_fn.numCVsInU - overlap_u, surface_fn.numCVsInV - overlap_v
+
+
+@deferred
+def createSpanJoints(joint_name, centers):
+    """
+    Creates the bind joints for a cylinder from a precomputed array of span centers
+    Args:
+        joint_name: The preferred name for the newly created joints
+        centers: An (spans, 3) array of joint positions
+    Returns:
+        mesh_bind_joints: A list of the created joints
+    """
+    return centerJoints(centers, spanJointNames(joint_name, len(centers)))
+
+
+def spanJointNames(joint_name, num_of_spans):
+    """
+    Builds the names used for the bind joints of each span (centerJoints adds the "_JNT" suffix)
+    Args:
+        joint_name: The preferred name for the joints
+        num_of_spans: The number of spans/joints
+    Returns:
+        names: A list of names padded to two digits, e.g. left_rope_Main_BIND_03
+    """
+    return ["{}_BIND_{:02d}".format(joint_name, i) for i in range(num_of_spans)]
+
+
+@deferred
+def buildRope(mesh, joint_name, control_spans, verts_in_span=None, rotation=False, bind=True, backend=None):
+    """
+    Builds a Main rope in one go from a compiled build plan instead of running each step on the selection
+    Args:
+        mesh: The cylinder transform
+        joint_name: The preferred name for the rope nodes
+        control_spans: The indices of the spans to place control joints at
+        verts_in_span: The number of vertices that make up one edge loop/span, read from the constructor if None
+        rotation: If True, the motion paths drive the locator rotations
+        bind: If True, bind the mesh and curve to their joints
+        backend: The backend that applies the plan, the Maya scene if None
+    Returns:
+        plan: The applied GraphModifier, use plan.nodeName to look up the created nodes
+    """
+    shape_node = cmds.listRelatives(mesh, s=True)[0]
+    verts_in_span = verts_in_span or getVertsInSpan(mesh)
+    positions = getComponentPositions(shape_node)
+
+    plan = bridgebuilder_plan.compileRopePlan(joint_name, positions, verts_in_span,
+                                              control_spans, rotation=rotation, mesh=mesh if bind else None)
+    plan.doIt(backend or bridgebuilder_api.ModifierBackend(cmds))
+
+    if backend is None:
+        storeFingerprint(mesh, bridgebuilder_core.ropeFingerprint(joint_name, positions, verts_in_span, control_spans,
+                                                                  rotation=rotation))
+
+    return plan
+
+
+def getVertsInSpan(mesh):
+    """
+    Gets the number of vertices/CVs in one span of a cylinder
+    Args:
+        mesh: The cylinder transform
+    Returns:
+        verts_in_span: The CV count of one row for a nurbsSurface or the polyCylinder's subdivisionsAxis
+    """
+    shape_node = cmds.listRelatives(mesh, s=True)[0]
+    if cmds.objectType(shape_node, isType="nurbsSurface"):
+        return getSurfaceCVCounts(shape_node)[1]
+    return cmds.getAttr("{}.subdivisionsAxis".format(cmds.listHistory(mesh)[1]))
+
+
+def storeFingerprint(mesh, fingerprint):
+    """
+    Stores the inputs a rope was built from as a JSON string attribute on its mesh
+    Args:
+        mesh: The cylinder transform
+        fingerprint: The dictionary returned by bridgebuilder_core.ropeFingerprint
+    """
+    if not cmds.attributeQuery(FINGERPRINT_ATTR, node=mesh, exists=True):
+        cmds.addAttr(mesh, longName=FINGERPRINT_ATTR, dataType="string")
+    cmds.setAttr("{}.{}".format(mesh, FINGERPRINT_ATTR), json.dumps(fingerprint), type="string")
+
+
+def readFingerprint(mesh):
+    """
+    Reads the fingerprint stored on a mesh by buildRope/rebuildRope
+    Args:
+        mesh: The cylinder transform
+    Returns:
+        fingerprint: The stored dictionary, None if the mesh doesn't have one
+    """
+    if not cmds.attributeQuery(FINGERPRINT_ATTR, node=mesh, exists=True):
+        return None
+    value = cmds.getAttr("{}.{}".format(mesh, FINGERPRINT_ATTR))
+    return json.loads(value) if value else None
+
+
+def _unbindMesh(mesh):
+    skin_clusters = cmds.ls(cmds.listHistory(mesh) or [], type="skinCluster")
+    for skin_cluster in skin_clusters:
+        cmds.skinCluster(skin_cluster, edit=True, unbind=True)
+
+
+def _deleteSpans(name, indices):
+    nodes = []
+    for i in indices:
+        locator = "{}_BIND_{:02d}_LOC".format(name, i)
+        nodes.extend(cmds.ls([locator, "{}_motionPath".format(locator)]))
+    if nodes:
+        cmds.delete(nodes)
+
+
+@deferred
+def rebuildRope(mesh, control_spans=None, bind=True):
+    """
+    Updates a rope built by buildRope after its mesh was edited. The current mesh is fingerprinted and compared with
+    the fingerprint stored at build time: only the spans whose positions changed, were added or were removed get
+    their locator, bind joint and motion path recreated, everything else is left alone. A change to the control
+    picks, the curve CVs, the span layout or the rope options rebuilds the whole rope since every span depends on
+    them.
+    Args:
+        mesh: The cylinder transform the rope was built from
+        control_spans: New control span indices, the stored ones if None
+        bind: If True and spans were recreated, rebind the mesh to the bind joints
+    Returns:
+        diff: The dictionary returned by bridgebuilder_core.diffFingerprints, or None if nothing changed
+    """
+    old = readFingerprint(mesh)
+    if old is None:
+        raise Exception("{} has no stored rope fingerprint, build it with buildRope first".format(mesh))
+
+    name = old["name"]
+    shape_node = cmds.listRelatives(mesh, s=True)[0]
+    verts_in_span = getVertsInSpan(mesh)
+    positions = getComponentPositions(shape_node)
+    if control_spans is None:
+        control_spans = old["control_spans"]
+    new = bridgebuilder_core.ropeFingerprint(name, positions, verts_in_span, control_spans, rotation=old["rotation"])
+
+    diff = bridgebuilder_core.diffFingerprints(old, new)
+    span_indices = diff["changed"] + diff["added"]
+    if not (diff["full"] or diff["curve_changed"] or span_indices or diff["removed"]):
+        logger.info("%s is up to date", name)
+        return None
+
+    _unbindMesh(mesh)
+
+    if diff["full"] or diff["curve_changed"]:
+        logger.info("Rebuilding all of %s", name)
+        _deleteSpans(name, range(len(old["span_hashes"])))
+        cmds.delete(cmds.ls(["{}_CRV".format(name), "{}_*_CTRL_JNT_ZERO_GRP".format(name)]))
+        buildRope(mesh, name, control_spans, verts_in_span=verts_in_span, rotation=old["rotation"], bind=bind)
+        return diff
+
+    logger.info("Rebuilding %d of %d spans of %s, removing %d", len(span_indices), len(new["span_hashes"]), name,
+                len(diff["removed"]))
+    _deleteSpans(name, span_indices + diff["removed"])
+    if span_indices:
+        curve_shape = cmds.listRelatives("{}_CRV".format(name), shapes=True)[0]
+        plan, _ = bridgebuilder_plan.compileSpanUpdatePlan(new, positions, span_indices, curve_shape)
+        plan.doIt(bridgebuilder_api.ModifierBackend(cmds))
+
+    if bind:
+        bind_joints = ["{}_BIND_{:02d}_JNT".format(name, i) for i in range(len(new["span_hashes"]))]
+        cmds.skinCluster(bind_joints + [mesh], toSelectedBones=True)
+
+    storeFingerprint(mesh, new)
+
+    return diff
+
+
+@deferred
 def addLocators(joints, name=""):
     """
     Creates locators at the selected positions based on a list of transforms
@@ -98,29 +459,30 @@ def addLocators(joints, name=""):
             loc = cmds.spaceLocator(name="{}".format(i).replace("JNT", "LOC"))
         else:
             loc = cmds.spaceLocator(name="{}_LOC".format(name))
-        logger.debug("i: {}".format(i))
-        logger.debug("LOC: {}".format(loc))
+        logger.debug("i: %s", i)
+        logger.debug("LOC: %s", loc)
         cmds.delete(cmds.parentConstraint(i, loc))
         locators.append(loc[0])
 
     return locators
 
 
-def createCurve(name=""):
+@deferred
+def createCurve(name="", control_transforms=None):
     """
     Creates a curve with points along the selected control joints/transforms along with joints to use as controls
+    Args:
+        name: The prefix for the curve name
+        control_transforms: The transforms to build the curve through, the current selection is used if None
     Returns: curve, positions, control_joints
     """
-    control_transforms = cmds.ls(selection=True)
-    positions = []
-    control_joints = []
+    if control_transforms is None:
+        control_transforms = cmds.ls(selection=True)
 
-    # Iterate through the control transforms and save the positions to use for curve creation
-    cmds.select(clear=True)
-    for i in control_transforms:
-        cmds.select(i)
-        control_joints.append(centerJoint(name="{}".format(i.replace("LOC", "CTRL").replace("_BIND",""))))
-        positions.append(cmds.xform(i, query=True, translation=True, worldSpace=True))
+    # Fetch the positions of all control transforms at once and create a control joint at each of them
+    positions = getWorldPositions(control_transforms).tolist()
+    control_joints = centerJoints(positions, ["{}".format(i.replace("LOC", "CTRL").replace("_BIND", ""))
+                                              for i in control_transforms])
 
     # Increase the size of the control joints and create a transform group above them
     for i in control_joints:
@@ -134,6 +496,7 @@ def createCurve(name=""):
 
     return curve, positions, control_joints
 
+@deferred
 def selectAllVerts(constructor_node=None):
     """
     Lists and returns all vertices on the selected mesh or nurbsSurface
@@ -159,37 +522,132 @@ def selectAllVerts(constructor_node=None):
     return all_vertices, selection, constructor_node
 
 
+@deferred
 def centerJoint(name):
     """
-    Creates a joint at the center of the current selection(s).
+    Creates a joint at the center of the current selection(s). The selection is only read, use centerJoints when
+    creating more than one joint.
     CREDIT: Script from Rigging Dojo
     """
     sel = cmds.ls(sl=1, fl=1)
-    # Get the bounding box transforms for the selection(s)
-    pos = [cmds.xform(x, q=1, ws=1, bb=1) for x in sel]
-    val = len(pos)
-    # Add the zipped positions together
-    pos = [sum(e) for e in zip(*pos)]
-    # Divide the updated position by the total number of selected objects
-    pos = [e/val for e in pos]
-    cmds.select(cl=1)
-    # Divide the updated positions by 2 to get the final position (center of the bounding box of all the selected objects put together)
-    jnt = cmds.joint(p=((pos[0]+pos[3])/2, (pos[1] + pos[4])/2, (pos[2]+pos[5])/2), name="{}_JNT".format(name))
-    cmds.select(sel, r=1)
-    return jnt
-
-
-def setPositionPercentage(curve, locators):
+    return centerJoints([sel], [name])[0]
+
+
+@deferred
+def centerJoints(groups, names):
+    """
+    Creates one joint at the center of each group of components/transforms without touching the selection
+    Args:
+        groups: A list where each item is either a list of component/transform names or an array of positions
+        (a single xyz position or an (N, 3) array)
+        names: The names for the joints, "_JNT" is added to each
+    Returns:
+        joints: A list of the created joints in the same order as groups
+    """
+    if len(groups) != len(names):
+        raise ValueError("Got {} groups but {} names".format(len(groups), len(names)))
+
+    # Collect every named component/transform so they can be fetched in one query, positions are used as they are
+    named_items = []
+    group_positions = []
+    for group in groups:
+        if isinstance(group, str):
+            group = [group]
+        if len(group) and isinstance(group[0], str):
+            named_items.extend(group)
+            group_positions.append(len(group))
+        else:
+            group_positions.append(numpy.asarray(group, dtype=float).reshape(-1, 3))
+
+    fetched = getWorldPositions(named_items) if named_items else numpy.zeros((0, 3))
+
+    positions = []
+    counts = []
+    fetched_index = 0
+    for group in group_positions:
+        if isinstance(group, int):
+            positions.append(fetched[fetched_index:fetched_index + group])
+            fetched_index += group
+            counts.append(group)
+        else:
+            positions.append(group)
+            counts.append(len(group))
+
+    centers = bridgebuilder_core.groupCenters(numpy.concatenate(positions) if positions else [], counts)
+
+    # Creating the joints as nodes instead of with cmds.joint keeps them from parenting under whatever is selected
+    joints = []
+    for name, center in zip(names, centers):
+        jnt = cmds.createNode("joint", name="{}_JNT".format(name), skipSelect=True)
+        cmds.setAttr("{}.translate".format(jnt), *center.tolist())
+        joints.append(jnt)
+
+    return joints
+
+
+@deferred
+def getWorldPositions(items):
+    """
+    Gets the world space position of a list of transforms and/or flattened components with a single xform query
+    Args:
+        items: A list of transform or component names (e.g. pCylinder1.vtx[3])
+    Returns:
+        positions: An (N, 3) array of positions
+    """
+    if not items:
+        return numpy.zeros((0, 3))
+    positions = numpy.asarray(cmds.xform(items, query=True, translation=True, worldSpace=True), dtype=float)
+    if positions.size != len(items) * 3:
+        raise Exception("Expected {} positions, got {}. Components need to be flattened".format(len(items),
+                                                                                                  positions.size // 3))
+
+    return positions.reshape(-1, 3)
+
+
+@deferred
+def getCurveData(curve):
+    """
+    Reads the world space CVs, full knot vector and degree of a nurbsCurve in one API query
+    Args:
+        curve: The curve transform or shape
+    Returns:
+        cvs, knots, degree: The data needed to evaluate the curve with bridgebuilder_core
+    """
+    selection_list = OpenMaya.MSelectionList()
+    selection_list.add(curve)
+    dag_path = selection_list.getDagPath(0)
+    if dag_path.apiType() != OpenMaya.MFn.kNurbsCurve:
+        dag_path.extendToShape()
+
+    curve_fn = OpenMaya.MFnNurbsCurve(dag_path)
+    cvs = [[p.x, p.y, p.z] for p in curve_fn.cvPositions(OpenMaya.MSpace.kWorld)]
+
+    return cvs, bridgebuilder_core.fullKnots(curve_fn.knots()), curve_fn.degree
+
+
+@deferred
+def setPositionPercentage(curve, locators, analytic=True):
     """
     Stores the arcLength for each corresponding joint on the curve into a dictionary
     Args:
         curve:
         locators: The transforms to determine the position on the curve
+        analytic: If True, sample the curve once into an arc length table and solve every locator in one batch instead
+        of creating temporary nearestPointOnCurve/arcLengthDimension nodes for each locator
 
     Returns:
         locator_percentage_values: A list of the arcLen/percentage values on the curve of each transform
     """
     locator_percentage_values = {}
+
+    if analytic:
+        cvs, knots, degree = getCurveData(curve)
+        arc_length_table = bridgebuilder_core.ArcLengthTable(cvs, knots, degree)
+        fractions = arc_length_table.fractions(getWorldPositions(locators))
+        for locator, fraction in zip(locators, fractions):
+            locator_percentage_values[locator] = float(fraction)
+        return locator_percentage_values
+
     curve_shape = cmds.listRelatives(curve, shapes=True)[0]
 
     # Get the max arc length value of the curve
@@ -233,10 +691,12 @@ def setPositionPercentage(curve, locators):
 
     return locator_percentage_values
 
+@deferred
 def attachToMotionPath(joint_percentage_values, curve, locators, ctrl_joints=None, rope_type="Main", rotation=False):
     """
     Attaches a motion path node to the locators above each mesh joint using the percentage value from the
-    setPositionPercentage function
+    setPositionPercentage function. Every node, attribute and connection is collected first and applied as one undo
+    step.
     Args:
         joint_percentage_values: The percentage values of transforms along the curve taken from setPositionPercentage()
         curve: The base curve
@@ -246,96 +706,88 @@ def attachToMotionPath(joint_percentage_values, curve, locators, ctrl_joints=Non
         motion_paths: List of motion path nodes created
     """
     curve_shape = cmds.listRelatives(curve, shapes=True)[0]
-    motion_paths = []
-    logger.debug("ROPE TYPE: {}".format(rope_type))
-
-    # Iterate through each joint and attach the motion path node with the corresponding percentage value as the uValue
-    for i in range(len(locators)):
-        motion_paths.append(cmds.createNode('motionPath', name='{}_motionPath'.format(locators[i])))
-        cmds.setAttr('{}.fractionMode'.format(motion_paths[i]), True)
-        cmds.connectAttr('{}.worldSpace[0]'.format(curve_shape), '{}.geometryPath'.format(motion_paths[i]))
-        cmds.setAttr('{}.uValue'.format(motion_paths[i]), joint_percentage_values[locators[i]])
-
-        cmds.connectAttr('{}.allCoordinates'.format(motion_paths[i]), '{}.translate'.format(locators[i]))
+    logger.debug("ROPE TYPE: %s", rope_type)
+
+    if rotation and "Main" not in rope_type and "Support" not in rope_type:
+        raise Exception("Please select rope type 'main' or 'support'")
+
+    # Support ropes use a locator next to the top control joint as the world up object for every motion path
+    up_object = None
+    if rotation and "Support" in rope_type:
+        up_object = createUpObject(ctrl_joints)
+
+    # Record the motion path wiring for every locator and apply it in one go
+    modifier = bridgebuilder_graph.GraphModifier(name="attachToMotionPath")
+    requested_names = []
+    for locator in locators:
+        motion_path = modifier.createNode('motionPath', name='{}_motionPath'.format(locator))
+        requested_names.append(motion_path)
+        modifier.setAttr('{}.fractionMode'.format(motion_path), True)
+        modifier.setAttr('{}.uValue'.format(motion_path), joint_percentage_values[locator])
+        modifier.connectAttr('{}.worldSpace[0]'.format(curve_shape), '{}.geometryPath'.format(motion_path))
+        modifier.connectAttr('{}.allCoordinates'.format(motion_path), '{}.translate'.format(locator))
 
         if rotation:
-            cmds.setAttr('{}.follow'.format(motion_paths[i]), True)
-            cmds.setAttr('{}.worldUpVectorX'.format(motion_paths[i]), 0)
-            cmds.setAttr('{}.worldUpVectorY'.format(motion_paths[i]), 1)
-            cmds.setAttr('{}.worldUpVectorZ'.format(motion_paths[i]), 0)
-
-            cmds.setAttr('{}.frontAxis'.format(motion_paths[i]), 0)
-            cmds.setAttr('{}.upAxis'.format(motion_paths[i]), 1)
-
-            cmds.connectAttr('{}.rotateX'.format(motion_paths[i]), '{}.rotateX'.format(locators[i]))
-            cmds.connectAttr('{}.rotateY'.format(motion_paths[i]), '{}.rotateY'.format(locators[i]))
-            cmds.connectAttr('{}.rotateZ'.format(motion_paths[i]), '{}.rotateZ'.format(locators[i]))
-
-            #Iterate through the control joints and match the transforms of the appropriate locator only if it's a main
-            if "Main" in rope_type:
-                for c in range(len(ctrl_joints)):
-                    logger.debug(ctrl_joints)
-                    ctrl_zero_group = cmds.listRelatives(ctrl_joints[c], parent=True)[0]
-
-                    #Get the value right before "_CTRL" in the control joint and compare to the locator index
-                    ctrl_index = ctrl_joints[c].find("_CTRL")
-                    ctrl_index = ctrl_joints[c][ctrl_index-2:ctrl_index]
-                    logger.debug("CTRL INDEX: {}".format(ctrl_index))
-
-                    locator_index = locators[i].find("_LOC")
-                    locator_index = locators[i][locator_index - 2:locator_index]
-                    logger.debug("LOCATOR INDEX: {}".format(i))
-
-                    if ctrl_index == locator_index:
-                        cmds.delete(cmds.parentConstraint(locators[i], ctrl_zero_group))
-                        logger.debug("SUCCESS")
-                        break
-                    else:
-                        logger.debug("FAIL")
-
-            elif "Support" in rope_type:
-                #Create a new locator to use as the world up object for the motion path only on the top joint
-                if i == 0:
-                    #Get the first control joint to snap the new locator to
-                    first_joint = []
-                    first_joint.append(ctrl_joints[0])
-
-                    # Create the new locator to use as the Up Object for the motion paths
-                    up_object = addLocators(first_joint)
-                    logger.debug("UP OBJECT: {}".format(up_object))
-
-                    # Rename the new locator
-
-                    #Move the new locator inward by 1 unit
-                    up_object_pos = cmds.getAttr("{}.translateX".format(up_object[0]))
-
-                    if "left" in str(up_object[0]):
-                        cmds.move(up_object_pos - 2, up_object[0], x=True)
-                    elif "right" in str(up_object[0]):
-                        cmds.move(up_object_pos + 2, up_object[0], x=True)
-                    else:
-                        raise Exception(
-                            "CTRL joint must have 'left' or 'right' in the name to determine up object position")
-
-                    #Connect worldUp object on the motion path to the up_object locator
-                    cmds.setAttr('{}.worldUpType'.format(motion_paths[i]), 1)
-                    cmds.connectAttr("{}.worldMatrix[0]".format(up_object[0]), "{}.worldUpMatrix".format(motion_paths[i]))
-
-                    # Parent the up object locator to the ik joint parent group
-                    cmds.parent(up_object[i], first_joint[0])
-                    #cmds.pointConstraint(first_joint[0], up_object[i])
+            modifier.setAttr('{}.follow'.format(motion_path), True)
+            modifier.setAttr('{}.worldUpVector'.format(motion_path), 0, 1, 0, type="double3")
+            modifier.setAttr('{}.frontAxis'.format(motion_path), 0)
+            modifier.setAttr('{}.upAxis'.format(motion_path), 1)
+            modifier.connectAttr('{}.rotate'.format(motion_path), '{}.rotate'.format(locator))
 
+            if up_object:
                 # Connect worldUp object on the motion path to the up_object locator
-                else:
-                    # Connect worldUp object on the motion path to the up_object locator
-                    cmds.setAttr('{}.worldUpType'.format(motion_paths[i]), 1)
-                    cmds.connectAttr("{}.worldMatrix[0]".format(up_object[0]), "{}.worldUpMatrix".format(motion_paths[i]))
-                    #cmds.pointConstraint(first_joint[0], up_object[i])
-            else:
-                raise Exception("Please select rope type 'main' or 'support'")
+                modifier.setAttr('{}.worldUpType'.format(motion_path), 1)
+                modifier.connectAttr("{}.worldMatrix[0]".format(up_object), "{}.worldUpMatrix".format(motion_path))
+
+    modifier.doIt(bridgebuilder_api.ModifierBackend(cmds))
+    motion_paths = [modifier.nodeName(i) for i in requested_names]
+
+    #Match the transforms of the control joints to the appropriate locator only if it's a main
+    if rotation and "Main" in rope_type:
+        # Pair locators and controls through the span number before "_LOC"/"_CTRL" in their names
+        for locator, ctrl_joint in bridgebuilder_core.matchControlsToLocators(ctrl_joints, locators):
+            ctrl_zero_group = cmds.listRelatives(ctrl_joint, parent=True)[0]
+            cmds.delete(cmds.parentConstraint(locator, ctrl_zero_group))
+            logger.debug("MATCHED %s TO %s", ctrl_joint, locator)
 
     return motion_paths
 
+
+@deferred
+def createUpObject(ctrl_joints):
+    """
+    Creates the locator used as the world up object for the motion paths of a support rope
+    Args:
+        ctrl_joints: The control joints of the rope, the locator is snapped to the first one and parented under it
+    Returns:
+        up_object: The new locator
+    """
+    #Get the first control joint to snap the new locator to
+    first_joint = []
+    first_joint.append(ctrl_joints[0])
+
+    # Create the new locator to use as the Up Object for the motion paths
+    up_object = addLocators(first_joint)
+    logger.debug("UP OBJECT: %s", up_object)
+
+    #Move the new locator inward by 1 unit
+    up_object_pos = cmds.getAttr("{}.translateX".format(up_object[0]))
+
+    if "left" in str(up_object[0]):
+        cmds.move(up_object_pos - 2, up_object[0], x=True)
+    elif "right" in str(up_object[0]):
+        cmds.move(up_object_pos + 2, up_object[0], x=True)
+    else:
+        raise Exception(
+            "CTRL joint must have 'left' or 'right' in the name to determine up object position")
+
+    # Parent the up object locator to the ik joint parent group
+    cmds.parent(up_object[0], first_joint[0])
+
+    return up_object[0]
+
+
+@deferred
 def createSupports(bind_joints, locators):
     '''
     Creates a curve and connects motionPath and Nearest Point on Curve nodes for a vertical cylinder
@@ -349,33 +801,29 @@ def createSupports(bind_joints, locators):
     cmds.select(clear=True)
     ctrl_joints = []
     cmds.select(locators[0])
-    cmds.select(locators[(len(locators) / 2) - 1], add=True)
-    cmds.select(locators[len(locators) / 2], add=True)
-    cmds.select(locators[(len(locators) / 2) + 1], add=True)
+    cmds.select(locators[(len(locators) // 2) - 1], add=True)
+    cmds.select(locators[len(locators) // 2], add=True)
+    cmds.select(locators[(len(locators) // 2) + 1], add=True)
     cmds.select(locators[-1], add=True)
 
-    logger.debug('Selections: {}'.format(cmds.ls(selection=True)))
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug('Selections: %s', cmds.ls(selection=True))
     # Create the curve with the selected control joints
     curve, positions, ctrl_joints = createCurve()
     cmds.select(clear=True)
 
     curve_shape = cmds.listRelatives(curve, shapes=True)[0]
     motion_paths = []
-    # Create the nPOC and motionPath nodes using the locators created from selectSpans
+    # Solve the closest curve parameter of every locator at once and create the motionPath nodes
+    params = closestParams(curve, locators)
     for i in range(len(locators)):
-        # Create the nPOC node and connect the locators translates to it
-        temp_nPOC = cmds.createNode('nearestPointOnCurve')
-        cmds.connectAttr('{}.worldSpace[0]'.format(curve_shape), '{}.inputCurve'.format(temp_nPOC))
-        cmds.connectAttr('{}.translate'.format(locators[i]), '{}.inPosition'.format(temp_nPOC))
-        param = cmds.getAttr('{}.parameter'.format(temp_nPOC))
-        # Delete the nPOC node to remove its connection from the locator
-        cmds.delete(temp_nPOC)
-
-        # Create the motionPath node and connect the parameter value from the nPOC node into it
+        param = params[i]
+
+        # Create the motionPath node and set the solved parameter as its uValue
         motion_paths.append(cmds.createNode('motionPath', name='{}_motionPath'.format(locators[i])))
         cmds.connectAttr('{}.worldSpace[0]'.format(curve_shape), '{}.geometryPath'.format(motion_paths[i]))
-        logger.debug('Motion Path[{}]: {}'.format(i, motion_paths[i]))
-        logger.debug('Param: {}'.format(param))
+        logger.debug('Motion Path[%s]: %s', i, motion_paths[i])
+        logger.debug('Param: %s', param)
         cmds.setAttr('{}.uValue'.format(motion_paths[i]), param)
 
         # Connect the motionPaths Coordinates and rotate attributes into the locator
@@ -385,6 +833,80 @@ def createSupports(bind_joints, locators):
         cmds.connectAttr('{}.rotateZ'.format(motion_paths[i]), '{}.rotateZ'.format(locators[i]))
 
 
+@deferred
+def closestParams(curve, locators, use_nodes=False):
+    """
+    Finds the parameter of the closest point on a curve for each locator, like a nearestPointOnCurve node would
+    Args:
+        curve: The curve transform or shape
+        locators: The transforms to find the closest parameters for
+        use_nodes: If True, create a temporary nearestPointOnCurve node for each locator instead of solving all of
+        them in one batch with bridgebuilder_core.ClosestParamSolver
+    Returns:
+        params: A list of curve parameters in the same order as locators
+    """
+    if use_nodes:
+        curve_shape = cmds.listRelatives(curve, shapes=True)[0]
+        params = []
+        for locator in locators:
+            # Create the nPOC node and connect the locators translates to it
+            temp_nPOC = cmds.createNode('nearestPointOnCurve')
+            cmds.connectAttr('{}.worldSpace[0]'.format(curve_shape), '{}.inputCurve'.format(temp_nPOC))
+            cmds.connectAttr('{}.translate'.format(locator), '{}.inPosition'.format(temp_nPOC))
+            params.append(cmds.getAttr('{}.parameter'.format(temp_nPOC)))
+            # Delete the nPOC node to remove its connection from the locator
+            cmds.delete(temp_nPOC)
+        return params
+
+    cvs, knots, degree = getCurveData(curve)
+    solver = bridgebuilder_core.ClosestParamSolver(cvs, knots, degree)
+    return solver.solve(getWorldPositions(locators)).tolist()
+
+
+@deferred
+def benchmarkClosestParams(curve, counts=(10, 100, 1000), offset=0.5):
+    """
+    Times closestParams with the batched solver against the nearestPointOnCurve node path. Temporary locators are
+    scattered around the curve for each count and deleted afterwards.
+    Args:
+        curve: The curve to test against
+        counts: The numbers of locators to time
+        offset: How far the locators are randomly moved away from the curve
+    Returns:
+        results: A list of dictionaries with the count, the time of each path and the largest parameter difference
+    """
+    cvs, knots, degree = getCurveData(curve)
+    min_param, max_param = knots[degree], knots[len(cvs)]
+    results = []
+    for count in counts:
+        params = [random.uniform(min_param, max_param) for _ in range(count)]
+        positions = bridgebuilder_core.evaluateBSplines(cvs, knots, degree, params)
+        locators = []
+        for position in positions:
+            locator = cmds.spaceLocator(name="temp_delete_benchmark_LOC")[0]
+            cmds.setAttr("{}.translate".format(locator),
+                         *[v + random.uniform(-offset, offset) for v in position.tolist()])
+            locators.append(locator)
+
+        start = time.time()
+        node_params = closestParams(curve, locators, use_nodes=True)
+        node_time = time.time() - start
+
+        start = time.time()
+        solver_params = closestParams(curve, locators)
+        solver_time = time.time() - start
+
+        cmds.delete(locators)
+        result = {"count": count, "nodes": node_time, "solver": solver_time,
+                  "max_difference": max(abs(a - b) for a, b in zip(node_params, solver_params))}
+        logger.info("{count} locators: nodes {nodes:.4f}s, solver {solver:.4f}s, "
+                    "max param difference {max_difference:.6f}".format(**result))
+        results.append(result)
+
+    return results
+
+
+@deferred
 def setupNPOCPath(curve, locators):
     '''
     Separately create the Nearest Point on Curve and motionPath connections
@@ -395,25 +917,23 @@ def setupNPOCPath(curve, locators):
     '''
     curve_shape = cmds.listRelatives(curve, shapes=True)[0]
     motion_paths = []
-    # Create the nPOC and motionPath nodes using the locators created from selectSpans
+    # Solve the closest curve parameter of every locator at once and create the motionPath nodes
+    params = closestParams(curve, locators)
     for i in range(len(locators)):
-        # Create the nPOC node and connect the locators translates to it
-        temp_nPOC = cmds.createNode('nearestPointOnCurve')
-        cmds.connectAttr('{}.worldSpace[0]'.format(curve_shape), '{}.inputCurve'.format(temp_nPOC))
-        cmds.connectAttr('{}.translate'.format(locators[i]), '{}.inPosition'.format(temp_nPOC))
-        param = cmds.getAttr('{}.parameter'.format(temp_nPOC))
-        # Delete the nPOC node to remove its connection from the locator
-        cmds.delete(temp_nPOC)
-
-        # Create the motionPath node and connect the parameter value from the nPOC node into it
+        param = params[i]
+
+        # Create the motionPath node and set the solved parameter as its uValue
         motion_paths.append(cmds.createNode('motionPath', name='{}_motionPath'.format(locators[i])))
         cmds.connectAttr('{}.worldSpace[0]'.format(curve_shape), '{}.geometryPath'.format(motion_paths[i]))
-        logger.debug('Motion Path[{}]: {}'.format(i, motion_paths[i]))
-        logger.debug('Param: {}'.format(param))
+        logger.debug('Motion Path[%s]: %s', i, motion_paths[i])
+        logger.debug('Param: %s', param)
         cmds.setAttr('{}.uValue'.format(motion_paths[i]), param)
 
         # Connect the motionPaths Coordinates attribute into the locator
         cmds.connectAttr('{}.allCoordinates'.format(motion_paths[i]), '{}.translate'.format(locators[i]))
+
+
+@deferred
 def buildSupport(ctrl_joints, increment=0):
     '''
     Creates 5 joints with an IK chain to control tethered cylinders
@@ -426,6 +946,7 @@ def buildSupport(ctrl_joints, increment=0):
     # Identify the updated name, IK joints and the middle index to isolate the center joint
     new_base_name = str(ctrl_joints[0]).split("0")[0]
 
+    bridgebuilder_core.supportChain(len(ctrl_joints))
     ik_joints = ctrl_joints[::2]
     middle_index = int(len(ik_joints) / 2)
 
@@ -482,51 +1003,92 @@ def buildSupport(ctrl_joints, increment=0):
     return new_ik_handle, new_ik_ctrl, new_pvector
 
 
-def bindPlanks(boards):
+@deferred
+def bindPlanks(boards, bind=True):
     '''
-    Create joints and buffer groups on either side of a poly cube
+    Create joints and buffer groups on either side of a poly cube. All boards are read with one API query each, the
+    side centers and weights are computed for every board at once and nothing goes through the selection.
     Args:
         boards: A list of poly cube meshes
+        bind: If True, skin each board to its two joints
     Returns:
         left_joints, right_joints: Lists of the left and right joints on either sides of the poly cubes
     '''
-
-    left_joints = []
-    right_joints = []
-    for i in boards:
-        # Select all verts on the board
-        cmds.select(i)
-        all_vertices, selection = selectAllVerts()
-
-        # Select just the left side verts and create a joint
-        cmds.select(all_vertices[1::2])
-        left_joint = centerJoint("left_" + str(i))
-        left_joints.append(left_joint)
-
-        # Create a group for the left side joint
-        left_grp = cmds.group(empty=True, n=left_joint + "_BUFF_GRP")
-        cmds.delete(cmds.parentConstraint(left_joint, left_grp))
-        cmds.parent(left_joint, left_grp)
-
-        # Select just the right side verts and create a joint
-        cmds.select(all_vertices[0::2])
-        right_joint = centerJoint("right_" + str(i))
-        right_joints.append(right_joint)
-
-        # Create a group for the right side joint
-        right_grp = cmds.group(empty=True, n=right_joint + "_BUFF_GRP")
-        cmds.delete(cmds.parentConstraint(right_joint, right_grp))
-        cmds.parent(right_joint, right_grp)
-
-        # Bind the joints
-        cmds.select(left_joint, right_joint, i)
-        cmds.SmoothBindSkin()
+    if not boards:
+        return [], []
+
+    board_positions = [getComponentPositions(cmds.listRelatives(board, s=True)[0]) for board in boards]
+    counts = [len(positions) for positions in board_positions]
+    left_centers, right_centers, left_weights = bridgebuilder_core.plankSides(numpy.concatenate(board_positions),
+                                                                               counts)
+
+    # The buffer groups sit at the joint positions with no rotation, the same result the old
+    # parentConstraint/delete snap gave, so the joints are created under them with zeroed transforms
+    plan = bridgebuilder_graph.GraphModifier(name="bindPlanks")
+    joint_pairs = []
+    for board, left_center, right_center in zip(boards, left_centers, right_centers):
+        pair = []
+        for side, center in (("left", left_center), ("right", right_center)):
+            joint_name = "{}_{}_JNT".format(side, board)
+            buffer_grp = plan.createNode("transform", name="{}_BUFF_GRP".format(joint_name))
+            plan.setAttr("{}.translate".format(buffer_grp), *center.tolist())
+            pair.append(plan.createNode("joint", name=joint_name, parent=buffer_grp))
+        joint_pairs.append(pair)
+    plan.doIt(bridgebuilder_api.ModifierBackend(cmds))
+
+    left_joints = [plan.nodeName(left) for left, _ in joint_pairs]
+    right_joints = [plan.nodeName(right) for _, right in joint_pairs]
+
+    if bind:
+        start = 0
+        for board, left_joint, right_joint, count in zip(boards, left_joints, right_joints, counts):
+            skin_cluster = cmds.skinCluster(left_joint, right_joint, board, toSelectedBones=True,
+                                            maximumInfluences=2)[0]
+            weights = left_weights[start:start + count]
+            setSkinWeights(skin_cluster, board, [left_joint, right_joint], numpy.stack([weights, 1.0 - weights], 1))
+            start += count
 
     return left_joints, right_joints
 
+
+def setSkinWeights(skin_cluster, mesh, influences, weights):
+    '''
+    Sets the weights of every vertex of a mesh in one API call
+    Args:
+        skin_cluster: The skinCluster deforming the mesh
+        mesh: The mesh transform or shape
+        influences: The influence objects the weight columns belong to
+        weights: A (vertices, influences) array of weights
+    '''
+    selection_list = OpenMaya.MSelectionList()
+    selection_list.add(skin_cluster)
+    selection_list.add(mesh)
+    skin_fn = OpenMayaAnim.MFnSkinCluster(selection_list.getDependNode(0))
+    dag_path = selection_list.getDagPath(1)
+
+    # setWeights takes physical indices, the influence's position in influenceObjects(). indexForInfluenceObject
+    # gives logical ones, which stop matching as soon as the influence list has a gap.
+    physical_indices = dict((influence_path.fullPathName(), i)
+                            for i, influence_path in enumerate(skin_fn.influenceObjects()))
+    influence_indices = OpenMaya.MIntArray()
+    for influence in influences:
+        influence_list = OpenMaya.MSelectionList()
+        influence_list.add(influence)
+        influence_indices.append(physical_indices[influence_list.getDagPath(0).fullPathName()])
+
+    weights = numpy.asarray(weights, dtype=float)
+    components = OpenMaya.MFnSingleIndexedComponent().create(OpenMaya.MFn.kMeshVertComponent)
+    OpenMaya.MFnSingleIndexedComponent(components).addElements(list(range(len(weights))))
+    skin_fn.setWeights(dag_path, components, influence_indices, OpenMaya.MDoubleArray(weights.ravel().tolist()),
+                       normalize=False)
+
+
+@deferred
 def createControls(ctrl_joints, name):
     '''
-    Creates vertical nurbs circles at given points
+    Creates vertical nurbs circles at given points. The circle is built once as a template with its CV rotation and
+    scale baked in, then every control is stamped out from its CVs and knots with no construction history and its
+    buffer groups are placed by matrix.
     Args:
         ctrl_joints: A list of joints corresponding to the new controls
         name: Intended name for the controls
@@ -534,21 +1096,75 @@ def createControls(ctrl_joints, name):
     Returns:
         controls: A list of created controls
     '''
+    points, knots = controlTemplate()
+    controls = [cmds.curve(name="{}_{}_CTRL".format(name, i), degree=3, periodic=True, point=points, knot=knots)
+                for i in range(len(ctrl_joints))]
+    buffer.createGroups(controls, suffixes=("NULL", "BUFF"), matrices=getWorldMatrices(ctrl_joints, scale=False))
 
-    controls = []
-    for i, v in enumerate(ctrl_joints):
-        new_circle = cmds.circle(n="{}_{}_CTRL".format(name, i), c=(0, 0, 0), nr=(0, 1, 0), sw=360, r=1, d=3, ut=0, tol=0.01, s=8, ch=1)
-        cmds.delete(cmds.parentConstraint(v, new_circle[0]))
+    return controls
 
-        cmds.select("{}.cv[*]".format(new_circle[0]))
-        cmds.rotate(0, 0, 90, r=1, os=1, fo=1)
-        cmds.scale(1.2, 1.2, 1.2, r=1, os=1)
 
-        buffer.createTwo(new_circle[0])
-        controls.append(new_circle[0])
+# Control shapes by their creation arguments, built once per session
+_control_templates = {}
+
+
+def controlTemplate(radius=1, sections=8, rotation=(0, 0, 90), scale=1.2):
+    '''
+    Gets the CVs and knots of the control circle, building a history free circle with the CV rotation and scale
+    applied the first time it's asked for
+    Args:
+        radius: The radius of the circle
+        sections: The number of sections of the circle
+        rotation: The object space rotation applied to the CVs
+        scale: The uniform scale applied to the CVs
+    Returns:
+        points, knots: The CV positions (periodic CVs repeated) and the knot vector for cmds.curve
+    '''
+    key = (radius, sections, tuple(rotation), scale)
+    if key not in _control_templates:
+        template = cmds.circle(c=(0, 0, 0), nr=(0, 1, 0), sw=360, r=radius, d=3, ut=0, tol=0.01, s=sections, ch=0)[0]
+        try:
+            cmds.rotate(rotation[0], rotation[1], rotation[2], "{}.cv[*]".format(template), r=1, os=1, fo=1)
+            cmds.scale(scale, scale, scale, "{}.cv[*]".format(template), r=1, os=1)
+
+            selection_list = OpenMaya.MSelectionList()
+            selection_list.add(template)
+            curve_fn = OpenMaya.MFnNurbsCurve(selection_list.getDagPath(0).extendToShape())
+            points = [(p.x, p.y, p.z) for p in curve_fn.cvPositions(OpenMaya.MSpace.kObject)]
+            _control_templates[key] = (points, list(curve_fn.knots()))
+        finally:
+            cmds.delete(template)
+
+    return _control_templates[key]
 
-    return controls
 
+def getWorldMatrices(nodes, scale=True):
+    '''
+    Reads the world matrix of each node with the API, without touching the selection
+    Args:
+        nodes: The DAG nodes to read
+        scale: If False, scale and shear are removed so the matrices match a parentConstraint snap
+    Returns:
+        matrices: A list of 16 floats per node, ready for cmds.xform(matrix=..., worldSpace=True)
+    '''
+    selection_list = OpenMaya.MSelectionList()
+    for node in nodes:
+        selection_list.add(node)
+
+    matrices = []
+    for i in range(selection_list.length()):
+        matrix = selection_list.getDagPath(i).inclusiveMatrix()
+        if not scale:
+            transformation = OpenMaya.MTransformationMatrix(matrix)
+            transformation.setScale((1.0, 1.0, 1.0), OpenMaya.MSpace.kWorld)
+            transformation.setShear((0.0, 0.0, 0.0), OpenMaya.MSpace.kWorld)
+            matrix = transformation.asMatrix()
+        matrices.append(list(matrix))
+
+    return matrices
+
+
+@deferred
 def bindJoints(mesh, joints, rope_type=""):
     '''
     Bind joints to a single mesh with the rope "type" taken into account
@@ -562,21 +1178,28 @@ def bindJoints(mesh, joints, rope_type=""):
     cmds.select(joints, mesh)
     skin_cluster = cmds.skinCluster()[0]
     if "Support" in rope_type:
-        logger.debug("CV: {}".format("{}.cv[-1]".format(mesh)))
-        logger.debug("CTRL JOINT: {}".format(joints[-1]))
+        logger.debug("CV: %s.cv[-1]", mesh)
+        logger.debug("CTRL JOINT: %s", joints[-1])
         cmds.skinPercent(skin_cluster, "{}.cv[{}]".format(mesh, len(joints)), transformValue = [joints[-1], 1])
 
 
-def addStretchyIK(ctrl_joints):
+@deferred
+def addStretchyIK(ctrl_joints, ik_lengths=None):
     '''
     Create stretchy IK using the side lengths of the triangle made up of the IK joints
     Args:
         ctrl_joints: List of control joints
+        ik_lengths: Optional precomputed (upperarm, lowerarm) lengths, read from the joints if None
     '''
-    # Get the upperarm length
-    upperarm_length = cmds.getAttr("{}.translateX".format(ctrl_joints[2]))
-    # Get the lowerarm length
-    lowerarm_length = cmds.getAttr("{}.translateX".format(ctrl_joints[4]))
+    if ik_lengths is not None:
+        upperarm_length, lowerarm_length = (float(i) for i in ik_lengths)
+    else:
+        # The middle and end joints of the IK chain are parented under the previous one, see buildSupport
+        _, middle, end = bridgebuilder_core.supportChain(len(ctrl_joints))
+        # Get the upperarm length
+        upperarm_length = cmds.getAttr("{}.translateX".format(ctrl_joints[middle]))
+        # Get the lowerarm length
+        lowerarm_length = cmds.getAttr("{}.translateX".format(ctrl_joints[end]))
 
     # Add the shoulder and elbow joint length for the arm length
     arm_length = upperarm_length+lowerarm_length
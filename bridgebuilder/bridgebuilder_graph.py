@@ -0,0 +1,307 @@
+import collections
+import contextlib
+import logging
+import re
+
+# Set up logger config and current level
+logging.basicConfig()
+logger = logging.getLogger("BridgeBuilder Graph")
+logger.setLevel(logging.INFO)
+
+# The order edits are applied in, nodes have to exist before they are parented, set or connected
+CREATE, PARENT, SET, CONNECT, COMMAND = range(5)
+
+# How many suspendedRefresh blocks are open, only the outermost one suspends and restores the viewport
+_refresh_state = {"depth": 0}
+
+
+@contextlib.contextmanager
+def suspendedRefresh(cmds):
+    """
+    Suspends viewport refresh and pauses Viewport 2.0 so nothing pulls on the DG while edits are made. Nested blocks
+    are no-ops, the state is restored when the outermost block exits, even on exceptions.
+    Args:
+        cmds: The maya.cmds module to use
+    """
+    outermost = _refresh_state["depth"] == 0
+    interactive = outermost and not cmds.about(batch=True)
+    paused = False
+    _refresh_state["depth"] += 1
+    if interactive:
+        cmds.refresh(suspend=True)
+        # ogs -pause toggles, so only pause if it isn't already paused
+        if not cmds.ogs(query=True, pause=True):
+            cmds.ogs(pause=True)
+            paused = True
+    try:
+        yield
+    finally:
+        _refresh_state["depth"] -= 1
+        if interactive:
+            if paused:
+                cmds.ogs(pause=True)
+            cmds.refresh(suspend=False)
+
+
+class GraphModifier(object):
+    """
+    A declarative build plan of node creations, parenting, attribute sets, connections and other commands, similar
+    to an MDGModifier. Nothing touches the scene until doIt is called, which applies every edit through a backend
+    (maya.cmds by default, or FakeScene to run without Maya) as a single transaction.
+    """
+    def __init__(self, name="bridgebuilder"):
+        """
+        Args:
+            name: The name of the undo chunk the edits are grouped under
+        """
+        self.name = name
+        self.ops = []
+        self.node_names = {}
+
+    def createNode(self, node_type, name, parent=None):
+        """
+        Records a node creation
+        Args:
+            node_type: The type of node to create
+            name: The requested node name, use it in later plugs of this modifier
+            parent: An optional parent for DAG nodes
+        Returns:
+            name: The requested name, the real name is available from nodeName after doIt
+        """
+        self.ops.append((CREATE, "createNode", (node_type, name, parent), {}))
+        return name
+
+    def curve(self, name, points, degree=3):
+        """
+        Records the creation of a nurbs curve through the given CVs, like cmds.curve(degree=degree, point=points)
+        Args:
+            name: The requested name of the curve transform, the shape can be referenced as name + "Shape"
+            points: The CV positions
+            degree: The degree of the curve
+        Returns:
+            name: The requested name of the curve transform
+        """
+        self.ops.append((CREATE, "curve", (name, [list(map(float, p)) for p in points], degree), {}))
+        return name
+
+    def parent(self, child, parent):
+        """
+        Records a parenting, the child keeps its local transform values
+        """
+        self.ops.append((PARENT, "parent", (child, parent), {}))
+
+    def setAttr(self, plug, *values, **kwargs):
+        """
+        Records an attribute set, takes the same arguments as cmds.setAttr
+        """
+        self.ops.append((SET, "setAttr", (plug, values), kwargs))
+
+    def connectAttr(self, source, destination, force=False):
+        """
+        Records a connection between two plugs
+        """
+        self.ops.append((CONNECT, "connectAttr", (source, destination, force), {}))
+
+    def command(self, command_name, *args, **kwargs):
+        """
+        Records any other maya.cmds command, applied after all nodes are wired. Node names in args are resolved.
+        """
+        self.ops.append((COMMAND, "command", (command_name, args), kwargs))
+
+    def nodeName(self, name):
+        """
+        Gets the name a node was actually created with (Maya renames nodes on clashes)
+        Args:
+            name: The name the node was requested with
+        Returns:
+            name: The real node name, or the given name if the node wasn't created by this modifier
+        """
+        return self.node_names.get(name, name)
+
+    def _resolve(self, plug):
+        if not isinstance(plug, str):
+            return plug
+        node, _, attribute = plug.partition(".")
+        node = self.nodeName(node)
+        return "{}.{}".format(node, attribute) if attribute else node
+
+    def __len__(self):
+        return len(self.ops)
+
+    def doIt(self, backend=None):
+        """
+        Applies every recorded edit as one transaction. Nodes are created first, then parented, then attributes are
+        set and finally everything is connected, so each node only gets dirtied by its incoming connections once.
+        Args:
+            backend: The backend that executes the edits, a CmdsBackend if None
+        Returns:
+            node_names: A dictionary of requested node names to the created node names
+        """
+        if backend is None:
+            backend = CmdsBackend()
+
+        logger.debug("Applying %d edits for %s", len(self), self.name)
+        with backend.transaction(self.name):
+            # sorted is stable, so edits of the same kind keep the order they were recorded in
+            for _, kind, args, kwargs in sorted(self.ops, key=lambda op: op[0]):
+                if kind == "createNode":
+                    node_type, name, parent = args
+                    self.node_names[name] = backend.createNode(node_type, name, self.nodeName(parent) if parent else None)
+                elif kind == "curve":
+                    name, points, degree = args
+                    transform, shape = backend.curve(name, points, degree)
+                    self.node_names[name] = transform
+                    self.node_names[name + "Shape"] = shape
+                elif kind == "parent":
+                    backend.parent(self.nodeName(args[0]), self.nodeName(args[1]))
+                elif kind == "setAttr":
+                    backend.setAttr(self._resolve(args[0]), args[1], kwargs)
+                elif kind == "connectAttr":
+                    backend.connectAttr(self._resolve(args[0]), self._resolve(args[1]), args[2])
+                elif kind == "command":
+                    command_args = [[self._resolve(a) for a in arg] if isinstance(arg, (list, tuple))
+                                    else self._resolve(arg) for arg in args[1]]
+                    backend.command(args[0], command_args, kwargs)
+
+        # Backends that queue their edits (see bridgebuilder_api.ModifierBackend) only know the real names now
+        if hasattr(backend, "nodeName"):
+            self.node_names = dict((name, backend.nodeName(node)) for name, node in self.node_names.items())
+
+        return self.node_names
+
+
+class CmdsBackend(object):
+    """
+    Executes a GraphModifier with maya.cmds inside one undo chunk with viewport refresh suspended
+    """
+    def __init__(self, cmds=None):
+        """
+        Args:
+            cmds: The maya.cmds module (or a wrapper around it) to run the edits with
+        """
+        if cmds is None:
+            from maya import cmds
+        self.cmds = cmds
+
+    @contextlib.contextmanager
+    def transaction(self, name):
+        self.cmds.undoInfo(openChunk=True, chunkName=name)
+        try:
+            with suspendedRefresh(self.cmds):
+                yield
+        finally:
+            self.cmds.undoInfo(closeChunk=True)
+
+    def createNode(self, node_type, name, parent=None):
+        if parent:
+            return self.cmds.createNode(node_type, name=name, parent=parent, skipSelect=True)
+        return self.cmds.createNode(node_type, name=name, skipSelect=True)
+
+    def curve(self, name, points, degree):
+        transform = self.cmds.curve(degree=degree, point=points, name=name)
+        return transform, self.cmds.listRelatives(transform, shapes=True)[0]
+
+    def parent(self, child, parent):
+        self.cmds.parent(child, parent, relative=True)
+
+    def setAttr(self, plug, values, kwargs):
+        self.cmds.setAttr(plug, *values, **kwargs)
+
+    def connectAttr(self, source, destination, force=False):
+        self.cmds.connectAttr(source, destination, force=force)
+
+    def command(self, command_name, args, kwargs):
+        return getattr(self.cmds, command_name)(*args, **kwargs)
+
+
+class FakeScene(object):
+    """
+    An in-memory stand-in for the Maya scene graph that a GraphModifier can be executed against, so build plans can
+    be run, inspected and timed without a Maya license. It keeps track of nodes, parents, attribute values,
+    connections and how many times each kind of edit was made.
+    """
+    def __init__(self):
+        self.nodes = collections.OrderedDict()
+        self.connections = []
+        self.commands = []
+        self.calls = collections.Counter()
+
+    @contextlib.contextmanager
+    def transaction(self, name):
+        self.calls["transaction"] += 1
+        yield
+
+    def _uniqueName(self, name):
+        # Mimic Maya's renaming, clashing names get their trailing number incremented
+        if name not in self.nodes:
+            return name
+        base = re.sub(r"\d+$", "", name)
+        index = 1
+        while "{}{}".format(base, index) in self.nodes:
+            index += 1
+        return "{}{}".format(base, index)
+
+    def _node(self, plug):
+        node = plug.partition(".")[0]
+        if node not in self.nodes:
+            raise RuntimeError("No object matches name: {}".format(plug))
+        return self.nodes[node]
+
+    def createNode(self, node_type, name, parent=None):
+        self.calls["createNode"] += 1
+        if parent is not None:
+            self._node(parent)
+        name = self._uniqueName(name)
+        self.nodes[name] = {"type": node_type, "parent": parent, "attrs": {}}
+        return name
+
+    def curve(self, name, points, degree):
+        self.calls["curve"] += 1
+        transform = self._uniqueName(name)
+        self.nodes[transform] = {"type": "transform", "parent": None, "attrs": {}}
+        shape = self._uniqueName(transform + "Shape")
+        self.nodes[shape] = {"type": "nurbsCurve", "parent": transform,
+                             "attrs": {"degree": degree, "cv": [list(p) for p in points]}}
+        return transform, shape
+
+    def parent(self, child, parent):
+        self.calls["parent"] += 1
+        self._node(parent)
+        self._node(child)["parent"] = parent
+
+    def setAttr(self, plug, values, kwargs):
+        self.calls["setAttr"] += 1
+        node, _, attribute = plug.partition(".")
+        self._node(plug)["attrs"][attribute] = values[0] if len(values) == 1 else tuple(values)
+
+    def connectAttr(self, source, destination, force=False):
+        self.calls["connectAttr"] += 1
+        self._node(source)
+        self._node(destination)
+        if not force and any(d == destination for _, d in self.connections):
+            raise RuntimeError("{} already has an incoming connection".format(destination))
+        self.connections = [c for c in self.connections if c[1] != destination]
+        self.connections.append((source, destination))
+
+    def command(self, command_name, args, kwargs):
+        self.calls[command_name] += 1
+        self.commands.append((command_name, args, kwargs))
+
+    def getAttr(self, plug):
+        """
+        Gets a value set on a fake node
+        """
+        node, _, attribute = plug.partition(".")
+        return self._node(plug)["attrs"][attribute]
+
+    def ls(self, node_type=None):
+        """
+        Lists the fake nodes, optionally of a single type
+        """
+        return [name for name, node in self.nodes.items() if node_type is None or node["type"] == node_type]
+
+    def children(self, node):
+        """
+        Lists the nodes parented directly under node
+        """
+        return [name for name, data in self.nodes.items() if data["parent"] == node]
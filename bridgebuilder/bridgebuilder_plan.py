@@ -0,0 +1,156 @@
+import bridgebuilder.bridgebuilder_core as bridgebuilder_core
+import bridgebuilder.bridgebuilder_graph as bridgebuilder_graph
+
+####################################
+##Headless bridge rope build plans##
+####################################
+# compileRopePlan turns the selectSpans -> createCurve -> setPositionPercentage -> attachToMotionPath -> bindJoints
+# pipeline into a GraphModifier without touching Maya. Run it with doIt() for the real scene or with
+# doIt(bridgebuilder_graph.FakeScene()) to inspect, time or regression test a build anywhere.
+
+
+def compileRopePlan(name, positions, verts_in_span, control_spans, rotation=False, mesh=None):
+    """
+    Compiles the Main rope pipeline into a build plan of node, attribute and connection edits
+    Args:
+        name: The rope name, used the same way as RopeUI ("left_bridge_Main")
+        positions: A flat list or (N, 3) array of the cylinder's vertex/CV positions, ordered span by span
+        verts_in_span: The number of vertices that make up one edge loop/span
+        control_spans: The indices of the spans to place control joints at (at least 4, like the selected locators
+        passed to createCurve)
+        rotation: If True, the motion paths drive the locator rotations and the control joints are oriented to match
+        mesh: If given, the plan also binds this mesh to the bind joints and the curve to the control joints
+    Returns:
+        plan: A GraphModifier holding the whole build
+    """
+    if len(control_spans) < 4:
+        raise ValueError("A degree 3 control curve needs at least 4 control spans, got {}".format(len(control_spans)))
+
+    plan = bridgebuilder_graph.GraphModifier(name="build {}".format(name))
+    centers = bridgebuilder_core.spanCenters(positions, verts_in_span)
+
+    # selectSpans: a locator at the center of each span with the bind joint under it
+    bind_joints, locators = addSpans(plan, name, centers, range(len(centers)))
+
+    # createCurve/setPositionPercentage: a curve through the control spans and the arc length fraction of each locator
+    control_positions = centers[list(control_spans)]
+    cvs = control_positions.tolist()
+    knots = bridgebuilder_core.fullKnots(bridgebuilder_core.uniformKnots(len(cvs)))
+    arc_length_table = bridgebuilder_core.ArcLengthTable(cvs, knots, 3)
+    params, lengths = arc_length_table.closestPoints(centers)
+    fractions = lengths / arc_length_table.total_length if arc_length_table.total_length else lengths * 0.0
+
+    curve = plan.curve("{}_CRV".format(name), control_positions, degree=3)
+    curve_shape = "{}Shape".format(curve)
+
+    # A zeroed control joint at each control span. With rotation on they are snapped to where the motion path puts
+    # their locator, like attachToMotionPath does.
+    ctrl_names = ["{}_{:02d}_CTRL_JNT".format(name, index) for index in control_spans]
+    zero_transforms = dict((ctrl, (position.tolist(), None)) for ctrl, position in zip(ctrl_names, control_positions))
+    if rotation:
+        points = bridgebuilder_core.evaluateBSplines(cvs, knots, 3, params)
+        derivative = bridgebuilder_core.derivativeCurve(cvs, knots, 3)
+        rotations = bridgebuilder_core.motionPathRotations(bridgebuilder_core.evaluateBSplines(*derivative + (params,)))
+        locator_indices = dict((locator, i) for i, locator in enumerate(locators))
+        for locator, ctrl_joint in bridgebuilder_core.matchControlsToLocators(ctrl_names, locators):
+            i = locator_indices[locator]
+            zero_transforms[ctrl_joint] = (points[i].tolist(), rotations[i].tolist())
+
+    ctrl_joints = []
+    for ctrl_joint in ctrl_names:
+        translate, rotate = zero_transforms[ctrl_joint]
+        zero = plan.createNode("transform", name="{}_ZERO_GRP".format(ctrl_joint))
+        plan.setAttr("{}.translate".format(zero), *translate)
+        if rotate:
+            plan.setAttr("{}.rotate".format(zero), *rotate)
+        ctrl_joints.append(plan.createNode("joint", name=ctrl_joint, parent=zero))
+        plan.setAttr("{}.radius".format(ctrl_joint), 1.8)
+
+    # attachToMotionPath
+    addMotionPaths(plan, locators, fractions, curve_shape, rotation=rotation)
+
+    # bindJoints
+    if mesh:
+        plan.command("skinCluster", ctrl_joints + [curve], toSelectedBones=True)
+        plan.command("skinCluster", bind_joints + [mesh], toSelectedBones=True)
+
+    return plan
+
+
+def addSpans(plan, name, centers, indices):
+    """
+    Adds the locator and bind joint of each given span to a plan
+    Args:
+        plan: The GraphModifier to add to
+        name: The rope name
+        centers: The (spans, 3) array of span centers
+        indices: The span indices to add
+    Returns:
+        bind_joints, locators: The requested names of the new nodes
+    """
+    bind_joints = []
+    locators = []
+    for i in indices:
+        locator = plan.createNode("transform", name="{}_BIND_{:02d}_LOC".format(name, i))
+        plan.createNode("locator", name="{}Shape".format(locator), parent=locator)
+        plan.setAttr("{}.translate".format(locator), *centers[i].tolist())
+        bind_joints.append(plan.createNode("joint", name="{}_BIND_{:02d}_JNT".format(name, i), parent=locator))
+        locators.append(locator)
+
+    return bind_joints, locators
+
+
+def addMotionPaths(plan, locators, fractions, curve_shape, rotation=False):
+    """
+    Adds a motionPath for each locator to a plan, wired the same way attachToMotionPath does for a Main rope
+    Args:
+        plan: The GraphModifier to add to
+        locators: The locators to drive
+        fractions: The arc length fraction of each locator along the curve
+        curve_shape: The curve shape the motion paths follow
+        rotation: If True, the motion paths drive the locator rotations as well
+    Returns:
+        motion_paths: The requested names of the new motion paths
+    """
+    motion_paths = []
+    for locator, fraction in zip(locators, fractions):
+        motion_path = plan.createNode("motionPath", name="{}_motionPath".format(locator))
+        plan.setAttr("{}.fractionMode".format(motion_path), True)
+        plan.setAttr("{}.uValue".format(motion_path), float(fraction))
+        plan.connectAttr("{}.worldSpace[0]".format(curve_shape), "{}.geometryPath".format(motion_path))
+        plan.connectAttr("{}.allCoordinates".format(motion_path), "{}.translate".format(locator))
+
+        if rotation:
+            plan.setAttr("{}.follow".format(motion_path), True)
+            plan.setAttr("{}.worldUpVector".format(motion_path), 0, 1, 0, type="double3")
+            plan.setAttr("{}.frontAxis".format(motion_path), 0)
+            plan.setAttr("{}.upAxis".format(motion_path), 1)
+            plan.connectAttr("{}.rotate".format(motion_path), "{}.rotate".format(locator))
+        motion_paths.append(motion_path)
+
+    return motion_paths
+
+
+def compileSpanUpdatePlan(fingerprint, positions, indices, curve_shape):
+    """
+    Compiles the plan that recreates only some spans of an existing rope, attached to its existing curve
+    Args:
+        fingerprint: The new fingerprint of the rope (see bridgebuilder_core.ropeFingerprint)
+        positions: The cylinder's current vertex/CV positions
+        indices: The span indices to create
+        curve_shape: The rope's existing curve shape
+    Returns:
+        plan, bind_joints: The GraphModifier and the requested names of the new bind joints
+    """
+    name = fingerprint["name"]
+    plan = bridgebuilder_graph.GraphModifier(name="update {}".format(name))
+    centers = bridgebuilder_core.spanCenters(positions, fingerprint["verts_in_span"])
+
+    cvs = fingerprint["curve_cvs"]
+    knots = bridgebuilder_core.fullKnots(bridgebuilder_core.uniformKnots(len(cvs)))
+    fractions = bridgebuilder_core.ArcLengthTable(cvs, knots, 3).fractions(centers[list(indices)])
+
+    bind_joints, locators = addSpans(plan, name, centers, indices)
+    addMotionPaths(plan, locators, fractions, curve_shape, rotation=fingerprint["rotation"])
+
+    return plan, bind_joints
@@ -0,0 +1,93 @@
+import collections
+import json
+import time
+
+
+class BuildProfiler(object):
+    """
+    Records wall time, cmds calls per command name and nodes created/deleted for each profiled bridgebuilder call.
+    Counts are inclusive, a call includes everything done by the calls it makes. The report is JSON with a summary per
+    function and a Chrome trace event list, which chrome://tracing, Perfetto and speedscope open as a flame graph.
+    """
+    def __init__(self):
+        self.start_time = time.time()
+        self.calls = collections.Counter()
+        self.nodes = collections.Counter()
+        self.spans = []
+        self.stack = []
+
+    def begin(self, name):
+        """
+        Starts timing a call
+        Args:
+            name: The name of the function being called
+        """
+        self.stack.append({"name": name, "start": time.time(), "depth": len(self.stack),
+                           "calls": self.calls.copy(), "nodes": self.nodes.copy()})
+
+    def end(self):
+        """
+        Stops timing the innermost call and stores it
+        """
+        span = self.stack.pop()
+        span["end"] = time.time()
+        span["calls"] = self.calls - span["calls"]
+        span["nodes"] = self.nodes - span["nodes"]
+        self.spans.append(span)
+
+    def addCall(self, command_name):
+        self.calls[command_name] += 1
+
+    def nodeCreated(self):
+        self.nodes["created"] += 1
+
+    def nodeDeleted(self):
+        self.nodes["deleted"] += 1
+
+    def summary(self):
+        """
+        Totals every profiled call by function name
+        Returns:
+            summary: A dictionary of function name to its call count, wall time, cmds calls and node counts
+        """
+        summary = collections.OrderedDict()
+        for span in sorted(self.spans, key=lambda span: span["start"]):
+            entry = summary.setdefault(span["name"], {"count": 0, "time": 0.0, "cmds_calls": collections.Counter(),
+                                                      "nodes_created": 0, "nodes_deleted": 0})
+            entry["count"] += 1
+            entry["time"] += span["end"] - span["start"]
+            entry["cmds_calls"].update(span["calls"])
+            entry["nodes_created"] += span["nodes"]["created"]
+            entry["nodes_deleted"] += span["nodes"]["deleted"]
+
+        for entry in summary.values():
+            entry["cmds_total"] = sum(entry["cmds_calls"].values())
+            entry["cmds_calls"] = dict(entry["cmds_calls"].most_common())
+
+        return summary
+
+    def traceEvents(self):
+        """
+        Converts the profiled calls to Chrome trace "complete" events (microseconds from the start of profiling)
+        """
+        events = []
+        for span in sorted(self.spans, key=lambda span: span["start"]):
+            events.append({"name": span["name"], "ph": "X", "pid": 0, "tid": 0,
+                           "ts": (span["start"] - self.start_time) * 1e6,
+                           "dur": (span["end"] - span["start"]) * 1e6,
+                           "args": {"cmds_calls": sum(span["calls"].values()),
+                                    "nodes_created": span["nodes"]["created"],
+                                    "nodes_deleted": span["nodes"]["deleted"]}})
+        return events
+
+    def report(self):
+        return {"summary": self.summary(), "traceEvents": self.traceEvents(), "displayTimeUnit": "ms"}
+
+    def write(self, path):
+        """
+        Writes the report as JSON
+        Args:
+            path: The file to write
+        """
+        with open(path, "w") as report_file:
+            json.dump(self.report(), report_file, indent=2)
@@ -2,8 +2,11 @@ from PySide6 import QtWidgets, QtCore, QtGui
 import maya.cmds as cmds
 from maya import OpenMayaUI as omui
 import bridgebuilder.bridgebuilder_func as bridgebuilder_func
+import bridgebuilder.bridgebuilder_core as bridgebuilder_core
 from shiboken6 import wrapInstance
 import logging
+import os
+import sys
 
 # Set up logger config and current level
 logging.basicConfig()
@@ -17,6 +20,20 @@ def getMayaMainWindow():
     return pointer
 
 
+def getPoolExecutable():
+    '''
+    Gets the interpreter worker processes should be started with. Inside the Maya GUI sys.executable is Maya itself,
+    so the workers have to use the mayapy that ships next to it.
+    Returns:
+        executable: The path to mayapy, or None to use sys.executable
+    '''
+    executable_dir, executable_name = os.path.split(sys.executable)
+    if not executable_name.lower().startswith("maya") or executable_name.lower().startswith("mayapy"):
+        return None
+    mayapy = os.path.join(executable_dir, "mayapy.exe" if sys.platform == "win32" else "mayapy")
+    return mayapy if os.path.exists(mayapy) else None
+
+
 class RopeUI(QtWidgets.QDialog):
     def __init__(self):
         parent = getMayaMainWindow()
@@ -161,6 +178,7 @@ class RopeUI(QtWidgets.QDialog):
         # Connect the Type combo box signal to control menu type visibility
         self.type_combo.activated.connect(self.typecomboboxCallback)
 
+    @bridgebuilder_func.deferred
     def runSelectSpans(self):
         self.bind_joints, \
         self.locators, \
@@ -174,6 +192,7 @@ class RopeUI(QtWidgets.QDialog):
         return self.bind_joints, self.locators, self.spans, self.name, self.mesh, self.constructor
 
     # Create functions corresponding to bridgebuilder functions so checkboxes can store/execute them
+    @bridgebuilder_func.deferred
     def runCreateCurve(self):
         self.curv, \
         self.positions, \
@@ -182,10 +201,12 @@ class RopeUI(QtWidgets.QDialog):
                                                                        self.type_combo.currentText()))
         return self.curv, self.positions, self.ctrl_joints
 
+    @bridgebuilder_func.deferred
     def runSetPositionPercentage(self):
         self.joint_percentages = bridgebuilder_func.setPositionPercentage(self.curv, self.locators)
         return self.joint_percentages
 
+    @bridgebuilder_func.deferred
     def runAttachMotionPaths(self):
         self.motion_paths = bridgebuilder_func.attachToMotionPath(joint_percentage_values=self.joint_percentages,
                                                              curve=self.curv, locators=self.locators,
@@ -195,6 +216,7 @@ class RopeUI(QtWidgets.QDialog):
         logger.debug("ROPE TYPE: {}".format(self.type_combo.currentText()))
         return self.motion_paths
 
+    @bridgebuilder_func.deferred
     def runBindJoints(self):
         # Save the skin cluster for the curve and mesh if they exist
         curve_skin_cluster = [i for i in cmds.listHistory(self.curv) if cmds.objectType(i, isType="skinCluster")]
@@ -220,35 +242,87 @@ class RopeUI(QtWidgets.QDialog):
         # Turn on the rotation checkbox so the rotations on motion paths are enabled
         self.rotations_checkbox.setChecked(1)
 
-        # Iterate through each selected mesh and create the support rope
-        for i, v in enumerate(support_meshes):
-            name = "{}_{}_{}".format(self.name_combo.currentText(), self.name_line.text(), i,
-                                                                        self.type_combo.currentText())
+        progress_dialog = QtWidgets.QProgressDialog("Computing support rope geometry...", "Cancel", 0,
+                                                    len(support_meshes) * 2, self)
+        progress_dialog.setWindowTitle("Create Support Ropes")
+        progress_dialog.setWindowModality(QtCore.Qt.WindowModal)
+        progress_dialog.setMinimumDuration(0)
+
+        def updateProgress(value):
+            progress_dialog.setValue(value)
+            QtWidgets.QApplication.processEvents()
+
+        # Read the mesh positions and compute the pure geometry of every rope across a process pool before any
+        # scene edits happen
+        jobs = []
+        for v in support_meshes:
+            shape_node = cmds.listRelatives(v, s=True)[0]
+            constructor = cmds.listHistory(v)[1]
+            jobs.append((bridgebuilder_func.getComponentPositions(shape_node),
+                         cmds.getAttr("{}.subdivisionsAxis".format(constructor))))
+
+        geometries = bridgebuilder_core.computeSupportRopes(jobs, executable=getPoolExecutable(),
+                                                            progress=updateProgress,
+                                                            cancelled=progress_dialog.wasCanceled)
+        if geometries is None:
+            logger.info("Support rope creation cancelled")
+            self.rotations_checkbox.setChecked(0)
+            return
+
+        # Apply the scene edits for every rope in one batched pass
+        progress_dialog.setLabelText("Building support ropes...")
+        with bridgebuilder_func.deferredEvaluation("createSupportRopes"):
+            for i, v in enumerate(support_meshes):
+                if progress_dialog.wasCanceled():
+                    logger.info("Support rope creation cancelled after {} ropes".format(i))
+                    break
+
+                name = "{}_{}_{}".format(self.name_combo.currentText(), self.name_line.text(), i,
+                                                                            self.type_combo.currentText())
+                geometry = geometries[i]
+                self.buildSupportRope(v, name, geometry)
+                updateProgress(len(support_meshes) + i + 1)
+
+        progress_dialog.close()
+
+        # Uncheck the rotations box for motion paths after the function completes so the UI is clean
+        self.rotations_checkbox.setChecked(0)
 
-            cmds.select(v)
-            self.runSelectSpans()
-            # Create the group for the locators
-            loc_group = cmds.group(self.locators, name="{}_LOC_GRP".format(name))
+    def buildSupportRope(self, mesh, name, geometry):
+        '''
+        Builds one support rope from geometry precomputed with bridgebuilder_core.supportRopeGeometry
+        Args:
+            mesh: The support cylinder
+            name: The name for the rope groups
+            geometry: The precomputed centers, fractions and IK lengths of the rope
 
-            cmds.select(self.locators[0::2])
-            self.runCreateCurve()
-            # Run the build supports function
-            new_ik_handle, new_ik_ctrl, new_pvector = bridgebuilder_func.buildSupport(self.ctrl_joints)
+        '''
+        # Same result as runSelectSpans, with the span centers already known
+        self.name = "{}_{}_{}".format(self.name_combo.currentText(), self.name_line.text(),
+                                      self.type_combo.currentText())
+        self.mesh = mesh
+        self.bind_joints = bridgebuilder_func.createSpanJoints(self.name, geometry["centers"])
+        self.locators = bridgebuilder_func.parentUnderLocators(self.bind_joints)
+        # Create the group for the locators
+        loc_group = cmds.group(self.locators, name="{}_LOC_GRP".format(name))
 
-            self.runSetPositionPercentage()
-            self.runAttachMotionPaths()
+        self.curv, \
+        self.positions, \
+        self.ctrl_joints = bridgebuilder_func.createCurve(self.name, control_transforms=self.locators[0::2])
+        # Run the build supports function
+        new_ik_handle, new_ik_ctrl, new_pvector = bridgebuilder_func.buildSupport(self.ctrl_joints)
 
-            bridgebuilder_func.addStretchyIK(self.ctrl_joints)
+        self.joint_percentages = dict(zip(self.locators, geometry["fractions"].tolist()))
+        self.runAttachMotionPaths()
 
-            support_ctrl_jnt_grps = [i for i in cmds.listRelatives(self.ctrl_joints[0::], p=1) if cmds.objectType(i) == "transform"]
-            support_ik_GRP = cmds.listRelatives(new_pvector, ap=1, f=1)[0].split("|")[1]
-            cmds.group(self.mesh, loc_group, support_ctrl_jnt_grps, self.curv, support_ik_GRP, name="{}_GRP".format(name))
+        bridgebuilder_func.addStretchyIK(self.ctrl_joints, ik_lengths=geometry["ik_lengths"])
 
-            self.runBindJoints()
-            self.runBindJoints()
+        support_ctrl_jnt_grps = [i for i in cmds.listRelatives(self.ctrl_joints[0::], p=1) if cmds.objectType(i) == "transform"]
+        support_ik_GRP = cmds.listRelatives(new_pvector, ap=1, f=1)[0].split("|")[1]
+        cmds.group(self.mesh, loc_group, support_ctrl_jnt_grps, self.curv, support_ik_GRP, name="{}_GRP".format(name))
 
-        # Uncheck the rotations box for motion paths after the function completes so the UI is clean
-        self.rotations_checkbox.setChecked(0)
+        self.runBindJoints()
+        self.runBindJoints()
 
     def checkCheckBoxes(self):
         '''
@@ -274,6 +348,7 @@ class RopeUI(QtWidgets.QDialog):
                 self.button_functions.append(rope_functions[i])
         return rope_functions, self.button_functions
 
+    @bridgebuilder_func.deferred
     def runButtonFunctions(self):
         '''
         Goes through the button_functions list and runs each function
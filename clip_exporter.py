@@ -0,0 +1,179 @@
+####Animation Clip Exporter####
+# Exports a skeleton's animation to a clip_format file one block of frames at a time. Keyed channels are evaluated
+# straight from their animCurves with one keyframe query per curve and block, channels driven by anything else
+# (constraints, expressions...) are sampled from the DG in one MDGContext pass per frame when sample=True and written
+# as their current value otherwise. Values are in UI units.
+#
+# Headless:
+#   mayapy clip_exporter.py take_001.ma Hips take_001.clip --start 1 --end 5000 --quantize
+import maya.cmds as cmds
+from maya.api import OpenMaya
+import argparse
+import collections
+import numpy
+import key_transfer
+import clip_format
+
+ATTRIBUTES = ["translateX", "translateY", "translateZ", "rotateX", "rotateY", "rotateZ", "scaleX", "scaleY", "scaleZ"]
+
+
+def _plug_converter(mplug):
+    # Plugs are read in internal units (cm/radians), convert to what getAttr would return
+    attribute = mplug.attribute()
+    if not attribute.hasFn(OpenMaya.MFn.kUnitAttribute):
+        return None
+    unit_type = OpenMaya.MFnUnitAttribute(attribute).unitType()
+    if unit_type == OpenMaya.MFnUnitAttribute.kDistance:
+        return OpenMaya.MDistance.internalToUI
+    if unit_type == OpenMaya.MFnUnitAttribute.kAngle:
+        return OpenMaya.MAngle.internalToUI
+    return None
+
+
+def clip_joint_names(joints):
+    '''
+    Gets the names joints are stored under in a clip: the short name, or the shortest unique end of the DAG path when
+    short names clash (two "hand" joints under different parents become "L_arm|hand" and "R_arm|hand")
+    Args:
+        joints: The long names of the joints
+    Returns: A unique name per joint
+    '''
+    parts = [joint.strip("|").split("|") for joint in joints]
+    depths = [1] * len(parts)
+    while True:
+        names = ["|".join(path[-depth:]) for path, depth in zip(parts, depths)]
+        counts = collections.Counter(names)
+        clashes = [i for i, name in enumerate(names) if counts[name] > 1]
+        if not clashes:
+            return names
+        grown = False
+        for i in clashes:
+            if depths[i] < len(parts[i]):
+                depths[i] += 1
+                grown = True
+        if not grown:
+            raise ValueError("Joints are listed more than once: {}".format(sorted(set(names[i] for i in clashes))))
+
+
+def get_channel_sources(joints, attributes=ATTRIBUTES):
+    '''
+    Works out how each channel of each joint gets its value
+    Args:
+        joints: The joints to export
+        attributes: The attributes exported per joint
+    Returns:
+        channels, sources: The unique channel names (see clip_joint_names) and, per channel, ("curve", animCurve),
+        ("sample", MPlug, converter) or ("constant", value)
+    '''
+    channels = []
+    sources = []
+    for joint, name in zip(joints, clip_joint_names(joints)):
+        curves = dict((attribute, curve) for curve, attribute in key_transfer.get_anim_curves(joint))
+        for attribute in attributes:
+            plug = "{}.{}".format(joint, attribute)
+            channels.append("{}.{}".format(name, attribute))
+            if attribute in curves:
+                sources.append(("curve", curves[attribute]))
+            elif cmds.listConnections(plug, source=True, destination=False):
+                selection_list = OpenMaya.MSelectionList()
+                selection_list.add(plug)
+                mplug = selection_list.getPlug(0)
+                sources.append(("sample", mplug, _plug_converter(mplug)))
+            else:
+                sources.append(("constant", cmds.getAttr(plug)))
+
+    return channels, sources
+
+
+def sample_plugs(plugs, frames):
+    '''
+    Reads plugs at many frames, evaluating the DG once per frame for all of them
+    Args:
+        plugs: A list of (MPlug, converter) tuples from get_channel_sources
+        frames: The frames to sample, in the UI time unit
+    Returns: A (frames, plugs) array in UI units
+    '''
+    values = numpy.empty((len(frames), len(plugs)))
+    for row, frame in enumerate(frames):
+        context = OpenMaya.MDGContext(OpenMaya.MTime(frame, OpenMaya.MTime.uiUnit()))
+        previous = context.makeCurrent()
+        try:
+            for column, (mplug, converter) in enumerate(plugs):
+                value = mplug.asDouble()
+                values[row, column] = converter(value) if converter else value
+        finally:
+            previous.makeCurrent()
+
+    return values
+
+
+def export_clip(root, path, start=None, end=None, block_frames=256, attributes=ATTRIBUTES, sample=True,
+                quantize=False):
+    '''
+    Exports the animation of a joint hierarchy
+    Args:
+        root: The root joint
+        path: The clip file to write
+        start: The first frame, the playback start if None
+        end: The last frame, the playback end if None
+        block_frames: The number of frames evaluated and written at once, bounds the memory used
+        attributes: The attributes exported per joint
+        sample: If True, channels driven by something other than an animCurve are sampled every frame
+        quantize: If True, values are stored as int16 (see clip_format)
+    Returns: The clip footer
+    '''
+    start = cmds.playbackOptions(query=True, minTime=True) if start is None else start
+    end = cmds.playbackOptions(query=True, maxTime=True) if end is None else end
+    joints = key_transfer.get_hierarchy(root)
+    channels, sources = get_channel_sources(joints, attributes)
+    if not sample:
+        sources = [("constant", sample_plugs([source[1:]], [cmds.currentTime(query=True)])[0, 0])
+                   if source[0] == "sample" else source for source in sources]
+
+    frame_rate = OpenMaya.MTime(1, OpenMaya.MTime.kSeconds).asUnits(OpenMaya.MTime.uiUnit())
+    frames = [start + i for i in range(int(end - start) + 1)]
+    metadata = {"scene": cmds.file(query=True, sceneName=True), "root": root, "units": "ui"}
+    sampled = [i for i, source in enumerate(sources) if source[0] == "sample"]
+
+    with clip_format.ClipWriter(path, clip_joint_names(joints), channels, start_frame=start,
+                                frame_rate=frame_rate, quantize=quantize, metadata=metadata) as writer:
+        for block_start in range(0, len(frames), block_frames):
+            block = frames[block_start:block_start + block_frames]
+            values = numpy.empty((len(block), len(sources)))
+            for i, source in enumerate(sources):
+                if source[0] == "curve":
+                    # keyframe -eval evaluates the curve alone at every given time and returns UI units
+                    values[:, i] = cmds.keyframe(source[1], query=True, eval=True, time=[(frame,) for frame in block])
+                elif source[0] == "constant":
+                    values[:, i] = source[1]
+            if sampled:
+                values[:, sampled] = sample_plugs([sources[i][1:] for i in sampled], block)
+            writer.write_block(values)
+
+    return writer.footer
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Export a skeleton's animation to a clip file")
+    parser.add_argument("scene", help="The scene to open")
+    parser.add_argument("root", help="The root joint of the skeleton")
+    parser.add_argument("output", help="The clip file to write")
+    parser.add_argument("--start", type=float, help="The first frame, the playback start by default")
+    parser.add_argument("--end", type=float, help="The last frame, the playback end by default")
+    parser.add_argument("--block-frames", type=int, default=256)
+    parser.add_argument("--no-sample", action="store_true", help="Don't sample channels without animCurves")
+    parser.add_argument("--quantize", action="store_true", help="Store values as int16")
+    args = parser.parse_args(arguments)
+
+    import maya.standalone
+    maya.standalone.initialize()
+    try:
+        cmds.file(args.scene, open=True, force=True)
+        export_clip(args.root, args.output, start=args.start, end=args.end, block_frames=args.block_frames,
+                    sample=not args.no_sample, quantize=args.quantize)
+    finally:
+        maya.standalone.uninitialize()
+
+
+if __name__ == "__main__":
+    main()
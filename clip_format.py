@@ -0,0 +1,182 @@
+####Animation Clip Files####
+# A columnar binary format for skeleton animation. Nothing in here needs Maya, the exporter lives in clip_exporter.
+#
+# File layout:
+#   b"CLP1" | blocks | JSON footer | uint32 footer size | b"CLP1"
+# Frames are written in blocks of up to block_frames frames so an exporter never holds more than one block. Inside a
+# block the values are stored channel by channel (every frame of channel 0, then channel 1...) as little endian
+# float32, or quantized to int16 with a per channel float32 scale and offset stored at the start of the block.
+# The footer lists the joints, the channels ("joint.attribute"), the frame range and where every block starts, it's
+# written last so the file can be streamed.
+import json
+import os
+import struct
+
+import numpy
+
+MAGIC = b"CLP1"
+FORMAT_VERSION = 1
+VALUE_DTYPE = numpy.dtype("<f4")
+QUANTIZED_DTYPE = numpy.dtype("<i2")
+
+
+class ClipWriter(object):
+    '''
+    Streams a clip to disk one block of frames at a time
+
+    with ClipWriter(path, joints, channels, start_frame=1) as writer:
+        for block in blocks:
+            writer.write_block(block)
+    '''
+    def __init__(self, path, joints, channels, start_frame=0, frame_rate=30.0, quantize=False, metadata=None):
+        '''
+        Args:
+            path: The file to write
+            joints: The joint names
+            channels: The channel names, "joint.attribute"
+            start_frame: The frame of the first written row
+            frame_rate: Frames per second
+            quantize: If True, values are stored as int16 scaled to each channel's range within a block
+            metadata: Optional JSON serializable values stored in the footer
+        '''
+        self.path = path
+        self.footer = dict(metadata or {})
+        self.footer.update({"version": FORMAT_VERSION,
+                            "joints": list(joints),
+                            "channels": list(channels),
+                            "start_frame": start_frame,
+                            "frame_rate": frame_rate,
+                            "frame_count": 0,
+                            "quantization": "int16" if quantize else None,
+                            "blocks": []})
+        self.clip_file = open(path, "wb")
+        self.clip_file.write(MAGIC)
+
+    def write_block(self, values):
+        '''
+        Appends frames to the clip
+        Args:
+            values: A (frames, channels) array
+        '''
+        values = numpy.asarray(values, dtype=float).reshape(-1, len(self.footer["channels"]))
+        columns = numpy.ascontiguousarray(values.T)
+        block = {"offset": self.clip_file.tell(), "frames": len(values)}
+
+        if self.footer["quantization"]:
+            offsets = columns.min(axis=1)
+            scales = (columns.max(axis=1) - offsets) / 65535.0
+            scales[scales == 0] = 1.0
+            quantized = numpy.round((columns - offsets[:, None]) / scales[:, None]) - 32768
+            self.clip_file.write(scales.astype(VALUE_DTYPE).tobytes())
+            self.clip_file.write(offsets.astype(VALUE_DTYPE).tobytes())
+            self.clip_file.write(quantized.astype(QUANTIZED_DTYPE).tobytes())
+        else:
+            self.clip_file.write(columns.astype(VALUE_DTYPE).tobytes())
+
+        self.footer["blocks"].append(block)
+        self.footer["frame_count"] += len(values)
+
+    def close(self):
+        '''
+        Writes the footer and closes the file
+        '''
+        if self.clip_file.closed:
+            return
+        footer_data = json.dumps(self.footer, separators=(",", ":")).encode("utf-8")
+        self.clip_file.write(footer_data)
+        self.clip_file.write(struct.pack("<I", len(footer_data)))
+        self.clip_file.write(MAGIC)
+        self.clip_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        if exc_type is not None:
+            # Don't leave a clip without a footer behind
+            os.remove(self.path)
+
+
+class ClipReader(object):
+    '''
+    Reads a clip through memory maps, only the blocks that are asked for are paged in
+    '''
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as clip_file:
+            if clip_file.read(len(MAGIC)) != MAGIC:
+                raise ValueError("{} is not a clip file".format(path))
+            clip_file.seek(-(4 + len(MAGIC)), os.SEEK_END)
+            footer_size = struct.unpack("<I", clip_file.read(4))[0]
+            if clip_file.read(len(MAGIC)) != MAGIC:
+                raise ValueError("{} has no footer, it wasn't closed properly".format(path))
+            clip_file.seek(-(footer_size + 4 + len(MAGIC)), os.SEEK_END)
+            self.footer = json.loads(clip_file.read(footer_size).decode("utf-8"))
+
+        if self.footer["version"] > FORMAT_VERSION:
+            raise ValueError("Clip version {} is newer than {}".format(self.footer["version"], FORMAT_VERSION))
+        self.channels = self.footer["channels"]
+        self.channel_index = dict((channel, i) for i, channel in enumerate(self.channels))
+        self.start_frame = self.footer["start_frame"]
+        self.frame_count = self.footer["frame_count"]
+        block_frames = [block["frames"] for block in self.footer["blocks"]]
+        self.block_starts = numpy.concatenate(([0], numpy.cumsum(block_frames)))
+
+    def block_view(self, index):
+        '''
+        Maps one block without copying it
+        Returns: A (channels, frames) memmap of float32 values, or of int16 values for quantized clips
+        '''
+        block = self.footer["blocks"][index]
+        channel_count = len(self.channels)
+        if self.footer["quantization"]:
+            offset = block["offset"] + 2 * channel_count * VALUE_DTYPE.itemsize
+            dtype = QUANTIZED_DTYPE
+        else:
+            offset = block["offset"]
+            dtype = VALUE_DTYPE
+        return numpy.memmap(self.path, dtype=dtype, mode="r", offset=offset, shape=(channel_count, block["frames"]))
+
+    def _block_values(self, index, columns):
+        values = self.block_view(index)[columns]
+        if not self.footer["quantization"]:
+            return values.astype(float)
+
+        block = self.footer["blocks"][index]
+        channel_count = len(self.channels)
+        ranges = numpy.memmap(self.path, dtype=VALUE_DTYPE, mode="r", offset=block["offset"], shape=(2, channel_count))
+        scales, offsets = ranges[0][columns], ranges[1][columns]
+        return (values.astype(float) + 32768) * scales[:, None] + offsets[:, None]
+
+    def read(self, channels=None, start=None, end=None):
+        '''
+        Reads a frame range of some channels
+        Args:
+            channels: Channel names, every channel if None
+            start: The first frame, the start of the clip if None
+            end: The last frame (inclusive), the end of the clip if None
+        Returns: A (frames, channels) array
+        '''
+        columns = numpy.arange(len(self.channels)) if channels is None else \
+            numpy.array([self.channel_index[channel] for channel in channels], dtype=int)
+        first = 0 if start is None else max(int(start - self.start_frame), 0)
+        last = self.frame_count if end is None else min(int(end - self.start_frame) + 1, self.frame_count)
+        if last <= first:
+            return numpy.zeros((0, len(columns)))
+
+        pieces = []
+        for index in range(numpy.searchsorted(self.block_starts, first, side="right") - 1, len(self.block_starts) - 1):
+            block_start = self.block_starts[index]
+            if block_start >= last:
+                break
+            values = self._block_values(index, columns)
+            pieces.append(values[:, max(first - block_start, 0):last - block_start])
+
+        return numpy.concatenate(pieces, axis=1).T
+
+    def channel(self, name):
+        '''
+        Reads every frame of one channel
+        '''
+        return self.read([name])[:, 0]
@@ -1,40 +1,236 @@
+if __name__ == "__main__":
+    # Start Maya before pymel is imported so headless runs don't depend on pymel initializing it, it's shut down
+    # again at the bottom of the file
+    import maya.standalone
+    maya.standalone.initialize()
 import pymel.core as pm
-from PySide2 import QtCore, QtWidgets, QtGui
+import argparse
+import concurrent.futures
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+import key_transfer
 
-# Get the top group of the referenced rig and save the prefix without "RN"
-ref_node = pm.ls(type="reference")[0]
-clean_ref_name = "{}_".format(str(ref_node).replace("RN", ""))
+# The dialog lives in copy_skeleton_keys_ui so the headless --worker processes never need Qt.
 
-# Duplicate the reference rig group and remove the reference node prefix from the hierarchy
-top_ref_group = ref_node.nodes()[0]
-export_group = pm.duplicate(top_ref_group)
-pm.rename(export_group, "{}".format(str(export_group).replace("1", "")))
+# The file batch_retarget keeps its progress in, inside the output directory. Rerunning a batch skips every scene
+# it lists as done.
+CHECKPOINT_NAME = "retarget_checkpoint.json"
+REPORT_NAME = "retarget_report.json"
+BAKE_ATTRIBUTES = ["tx", "ty", "tz", "rx", "ry", "rz", "sx", "sy", "sz"]
 
-root1 = pm.ls(sl=1)
-joint_children1 = root1[0].listRelatives(ad=1, type='joint')
-joint_children1.insert(0, root1[0])
 
-root2 = pm.ls(sl=1)
-joint_children2 = root2[0].listRelatives(ad=1, type='joint')
-joint_children2.insert(0, root2[0])
+def get_reference_rig(ref_node=None):
+    '''
+    Gets the top group of a referenced rig and its prefix without "RN"
+    Args:
+        ref_node: The reference node, the first reference in the scene if None
+    Returns: ref_node, clean_ref_name, top_ref_group
+    '''
+    if ref_node is None:
+        references = pm.ls(type="reference")
+        if not references:
+            raise RuntimeError("The scene has no referenced rig")
+        ref_node = references[0]
+    ref_node = pm.PyNode(ref_node)
+    clean_ref_name = "{}_".format(str(ref_node).replace("RN", ""))
 
+    return ref_node, clean_ref_name, ref_node.nodes()[0]
 
-for i in range(len(joint_children1)):
-    pm.copyKey(str(joint_children1[i]))
-    pm.pasteKey(str(joint_children2[i]))
 
-class copyKeysUI(QtWidgets.QDialog):
-    def __init__(self):
-        super(copyKeysUI, self).__init__()
+def find_skeleton_root(group):
+    '''
+    Finds the top joint under a group
+    '''
+    joints = pm.listRelatives(group, allDescendents=True, type="joint") or []
+    roots = [joint for joint in joints if not isinstance(joint.getParent(), pm.nt.Joint)]
+    if not roots:
+        raise RuntimeError("No joints under {}".format(group))
+    return roots[-1]
 
-        self.setWindowTitle("Copy Skeleton Keys")
-        # self.rope = RopeUI()
 
-        self.buildUI()
-        #self-populateUI()
+def create_export_skeleton(source_root):
+    '''
+    Duplicates a (referenced) skeleton as plain joints at the world root, without constraints or namespaces
+    Args:
+        source_root: The root joint to copy
+    Returns: The root of the duplicate
+    '''
+    export_root = pm.duplicate(source_root)[0]
+    if export_root.getParent():
+        pm.parent(export_root, world=True)
 
-    def buildUI(self):
-        parent_layout = QtWidgets.QVBoxLayout(self)
+    # The duplicate lists its nodes in the same order as the source, deepest first, so each copy can take its
+    # source's name without the namespace and the parents' names stay valid while their children are renamed
+    copies = pm.listRelatives(export_root, allDescendents=True) + [export_root]
+    sources = pm.listRelatives(source_root, allDescendents=True) + [source_root]
+    pm.delete([copy for copy in copies if isinstance(copy, pm.nt.Constraint)])
+    for copy, source in zip(copies, sources):
+        if not isinstance(source, pm.nt.Constraint):
+            pm.rename(copy, key_transfer.strip_name(source.name()))
 
+    return export_root
 
 
+def copy_reference_keys(ref_node=None, bake=True, start=None, end=None):
+    '''
+    Bakes a referenced rig's skeleton and copies its keys onto a clean, reference free duplicate of it
+    Args:
+        ref_node: The reference node, the first reference in the scene if None
+        bake: If True, the referenced joints are baked first so constraint/IK driven motion is keyed
+        start: The first frame to bake, the playback start if None
+        end: The last frame to bake, the playback end if None
+    Returns: The root of the export skeleton
+    '''
+    ref_node, clean_ref_name, top_ref_group = get_reference_rig(ref_node)
+    source_root = find_skeleton_root(top_ref_group)
+    start = pm.playbackOptions(query=True, minTime=True) if start is None else start
+    end = pm.playbackOptions(query=True, maxTime=True) if end is None else end
+
+    if bake:
+        source_joints = [source_root] + pm.listRelatives(source_root, allDescendents=True, type="joint")
+        pm.bakeResults(source_joints, time=(start, end), simulation=True, attribute=BAKE_ATTRIBUTES)
+
+    export_root = create_export_skeleton(source_root)
+    key_transfer.transfer_hierarchy(source_root.longName(), export_root.longName(), mode="path")
+
+    return export_root
+
+
+def retarget_scene(scene, output_dir):
+    '''
+    Opens an animation scene, copies the keys of its referenced rig onto a clean skeleton and exports only that
+    skeleton to output_dir. This is what each batch worker runs.
+    Returns: The exported file
+    '''
+    pm.openFile(scene, force=True)
+    export_root = copy_reference_keys()
+
+    output = os.path.join(output_dir, "{}_export.ma".format(os.path.splitext(os.path.basename(scene))[0]))
+    pm.select(export_root)
+    pm.exportSelected(output, type="mayaAscii", force=True, constructionHistory=False, channels=True,
+                      constraints=False, expressions=False, shader=False)
+
+    return output
+
+
+def find_mayapy():
+    '''
+    Finds the mayapy executable the batch workers run with
+    '''
+    if os.path.basename(sys.executable).lower().startswith("mayapy"):
+        return sys.executable
+    executable = "mayapy.exe" if sys.platform == "win32" else "mayapy"
+    maya_location = os.environ.get("MAYA_LOCATION")
+    if maya_location and os.path.exists(os.path.join(maya_location, "bin", executable)):
+        return os.path.join(maya_location, "bin", executable)
+    raise RuntimeError("Can't find mayapy, set MAYA_LOCATION")
+
+
+def scene_key(scene):
+    '''
+    Gets the key a scene is stored under in the checkpoint and report, so the same file is found again whatever
+    relative path, separators or (on Windows) case the scene directory was given with
+    '''
+    return os.path.normcase(os.path.abspath(scene))
+
+
+def _save_json(path, data):
+    temp_path = "{}.tmp".format(path)
+    with open(temp_path, "w") as json_file:
+        json.dump(data, json_file, indent=1, sort_keys=True)
+    os.replace(temp_path, path)
+
+
+def _run_worker(mayapy, scene, output_dir, timeout):
+    # Every scene gets its own mayapy process, so a crash or a hang only costs that scene
+    start = time.time()
+    try:
+        process = subprocess.run([mayapy, os.path.abspath(__file__), "--worker", scene, output_dir],
+                                 stdout=subprocess.PIPE, stderr=subprocess.STDOUT, timeout=timeout)
+        output = process.stdout.decode("utf-8", "replace")
+        if process.returncode == 0:
+            return {"status": "done", "seconds": time.time() - start}
+        return {"status": "failed", "seconds": time.time() - start, "error": output[-2000:]}
+    except subprocess.TimeoutExpired:
+        return {"status": "failed", "seconds": time.time() - start, "error": "Timed out after {}s".format(timeout)}
+
+
+def batch_retarget(scene_dir, output_dir, workers=None, patterns=("*.ma", "*.mb"), timeout=None, retry_failed=False,
+                   progress=None):
+    '''
+    Retargets every animation scene in a directory on a pool of headless mayapy processes
+    Args:
+        scene_dir: The directory of animation scenes
+        output_dir: Where the clean skeleton files, the checkpoint and the report are written
+        workers: The number of mayapy processes, half the cores if None since each one is a full Maya
+        patterns: The scene file patterns
+        timeout: Seconds before a scene is given up on, no limit if None
+        retry_failed: If True, scenes that failed in an earlier run are tried again
+        progress: An optional callable taking (scene, result) after every scene
+    Returns: The report, a dictionary of scene path to its status, seconds and error
+    '''
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    checkpoint_path = os.path.join(output_dir, CHECKPOINT_NAME)
+    checkpoint = {}
+    if os.path.exists(checkpoint_path):
+        with open(checkpoint_path) as checkpoint_file:
+            checkpoint = dict((scene_key(scene), result) for scene, result in json.load(checkpoint_file).items())
+
+    scenes = sorted(set(scene_key(scene) for pattern in patterns
+                        for scene in glob.glob(os.path.join(scene_dir, pattern))))
+    skip = ("done", "failed") if not retry_failed else ("done",)
+    pending = [scene for scene in scenes if checkpoint.get(scene, {}).get("status") not in skip]
+
+    mayapy = find_mayapy()
+    workers = workers or max((os.cpu_count() or 2) // 2, 1)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = dict((executor.submit(_run_worker, mayapy, scene, output_dir, timeout), scene) for scene in pending)
+        for future in concurrent.futures.as_completed(futures):
+            scene = futures[future]
+            checkpoint[scene] = future.result()
+            _save_json(checkpoint_path, checkpoint)
+            if progress:
+                progress(scene, checkpoint[scene])
+
+    report = dict((scene, checkpoint[scene]) for scene in scenes if scene in checkpoint)
+    _save_json(os.path.join(output_dir, REPORT_NAME), {
+        "scenes": report,
+        "done": sum(1 for result in report.values() if result["status"] == "done"),
+        "failed": sum(1 for result in report.values() if result["status"] == "failed"),
+        "seconds": sum(result["seconds"] for result in report.values())})
+
+    return report
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Copy referenced rig keys onto clean skeletons")
+    parser.add_argument("scene_dir", help="The scene (with --worker) or directory of scenes to process")
+    parser.add_argument("output_dir", help="Where the clean skeletons are written")
+    parser.add_argument("--worker", action="store_true", help="Process a single scene in this process")
+    parser.add_argument("--workers", type=int, help="The number of mayapy processes")
+    parser.add_argument("--timeout", type=float, help="Seconds before a scene is given up on")
+    parser.add_argument("--retry-failed", action="store_true", help="Retry scenes that failed in an earlier run")
+    args = parser.parse_args(arguments)
+
+    if args.worker:
+        retarget_scene(args.scene_dir, args.output_dir)
+        return
+
+    report = batch_retarget(args.scene_dir, args.output_dir, workers=args.workers, timeout=args.timeout,
+                            retry_failed=args.retry_failed)
+    failed = [scene for scene, result in report.items() if result["status"] == "failed"]
+    print("{} scenes, {} failed".format(len(report), len(failed)))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    finally:
+        # Exiting with Maya still running can crash on the way out and turn a finished scene into a failure
+        maya.standalone.uninitialize()
@@ -0,0 +1,80 @@
+import pymel.core as pm
+try:
+    from PySide6 import QtWidgets
+except ImportError:
+    from PySide2 import QtWidgets
+import os
+import copy_skeleton_keys
+
+
+class copyKeysUI(QtWidgets.QDialog):
+    def __init__(self):
+        super(copyKeysUI, self).__init__()
+
+        self.setWindowTitle("Copy Skeleton Keys")
+
+        self.buildUI()
+        self.populateUI()
+
+    def buildUI(self):
+        parent_layout = QtWidgets.QVBoxLayout(self)
+
+        # Copy the keys of a rig referenced in the open scene
+        scene_group = QtWidgets.QGroupBox("Open Scene")
+        scene_layout = QtWidgets.QHBoxLayout(scene_group)
+        self.reference_box = QtWidgets.QComboBox()
+        scene_layout.addWidget(self.reference_box)
+        copy_button = QtWidgets.QPushButton("Copy Keys")
+        copy_button.clicked.connect(self.runCopyKeys)
+        scene_layout.addWidget(copy_button)
+        parent_layout.addWidget(scene_group)
+
+        # Batch retarget a directory of scenes
+        batch_group = QtWidgets.QGroupBox("Batch")
+        batch_layout = QtWidgets.QFormLayout(batch_group)
+        self.scene_dir_line = self.directoryRow(batch_layout, "Scenes")
+        self.output_dir_line = self.directoryRow(batch_layout, "Output")
+        self.workers_box = QtWidgets.QSpinBox()
+        self.workers_box.setRange(1, 64)
+        self.workers_box.setValue(max((os.cpu_count() or 2) // 2, 1))
+        batch_layout.addRow("Workers", self.workers_box)
+        batch_button = QtWidgets.QPushButton("Run Batch")
+        batch_button.clicked.connect(self.runBatch)
+        batch_layout.addRow(batch_button)
+        parent_layout.addWidget(batch_group)
+
+        self.log = QtWidgets.QPlainTextEdit()
+        self.log.setReadOnly(True)
+        parent_layout.addWidget(self.log)
+
+    def directoryRow(self, layout, label):
+        row = QtWidgets.QHBoxLayout()
+        line = QtWidgets.QLineEdit()
+        row.addWidget(line)
+        browse_button = QtWidgets.QPushButton("...")
+        browse_button.clicked.connect(lambda: line.setText(
+            QtWidgets.QFileDialog.getExistingDirectory(self, label, line.text()) or line.text()))
+        row.addWidget(browse_button)
+        layout.addRow(label, row)
+        return line
+
+    def populateUI(self):
+        self.reference_box.clear()
+        self.reference_box.addItems([str(ref_node) for ref_node in pm.ls(type="reference")
+                                     if str(ref_node) != "sharedReferenceNode"])
+
+    def runCopyKeys(self):
+        export_root = copy_skeleton_keys.copy_reference_keys(self.reference_box.currentText() or None)
+        self.log.appendPlainText("Copied keys to {}".format(export_root))
+
+    def runBatch(self):
+        def progress(scene, result):
+            self.log.appendPlainText("{}: {} ({:.1f}s)".format(os.path.basename(scene), result["status"],
+                                                               result["seconds"]))
+            QtWidgets.QApplication.processEvents()
+
+        report = copy_skeleton_keys.batch_retarget(self.scene_dir_line.text(), self.output_dir_line.text(),
+                                                   workers=self.workers_box.value(), progress=progress)
+        failed = [scene for scene, result in report.items() if result["status"] == "failed"]
+        self.log.appendPlainText("{} scenes, {} failed. See {}".format(len(report), len(failed),
+                                                                       copy_skeleton_keys.REPORT_NAME))
@@ -1,49 +1,68 @@
 import maya.cmds as cmds
+import collections
+import math
 
-def createThree(selection = cmds.ls(sl=True)):
-	if type(selection) is list:
-		for each in selection:
-			grp1 = cmds.group(empty=True, n = each + "_NULL_GRP")
-			cmds.delete(cmds.parentConstraint(each, grp1)[0])
-			grp2 = cmds.group(empty=True, n = each + "_ZERO_GRP")
-			cmds.delete(cmds.parentConstraint(each, grp2)[0])
-			grp3 = cmds.group(empty=True, n = each + "_BUFF_GRP")
-			cmds.delete(cmds.parentConstraint(each, grp3)[0])
-			cmds.parent(each, grp3)
-			cmds.parent(grp3, grp2)
-			cmds.parent(grp2, grp1)
-			cmds.makeIdentity(each, t=1, r=1,s=1, apply=True)
-	else:
-		grp1 = cmds.group(empty=True, n=selection + "_NULL_GRP")
-		cmds.delete(cmds.parentConstraint(selection, grp1)[0])
-		grp2 = cmds.group(empty=True, n=selection + "_ZERO_GRP")
-		cmds.delete(cmds.parentConstraint(selection, grp2)[0])
-		grp3 = cmds.group(empty=True, n=selection + "_BUFF_GRP")
-		cmds.delete(cmds.parentConstraint(selection, grp3)[0])
-		cmds.parent(each, grp3)
-		cmds.parent(grp3, grp2)
-		cmds.parent(grp2, grp1)
-		cmds.makeIdentity(each, t=1, r=1, s=1, apply=True)
-
-	return grp1
-
-def createTwo(selection = cmds.ls(sl=True)):
-	if type(selection) is list:
-		for each in selection:
-			grp1 = cmds.group(empty=True, n=each + "_NULL_GRP")
-			cmds.delete(cmds.parentConstraint(each, grp1))
-			grp2 = cmds.group(empty=True, n=each + "_BUFF_GRP")
-			cmds.delete(cmds.parentConstraint(each, grp2))
-			cmds.parent(each, grp2)
-			cmds.parent(grp2, grp1)
-			#cmds.makeIdentity(each, t=1, r=1, s=1, apply=True)
-	else:
-		grp1 = cmds.group(empty=True, n=selection + "_NULL_GRP")
-		cmds.delete(cmds.parentConstraint(selection, grp1))
-		grp2 = cmds.group(empty=True, n=selection + "_BUFF_GRP")
-		cmds.delete(cmds.parentConstraint(selection, grp2))
-		cmds.parent(selection, grp2)
-		cmds.parent(grp2, grp1)
-		#cmds.makeIdentity(selection, t=1, r=1, s=1, apply=True)
-
-	return grp1
\ No newline at end of file
+
+def _worldMatrix(node):
+	"""
+	Gets the world matrix of a node with scale and shear removed, which is where a parentConstraint would snap a group
+	"""
+	matrix = cmds.xform(node, query=True, matrix=True, worldSpace=True)
+	for row in range(3):
+		axis = matrix[row * 4:row * 4 + 3]
+		length = math.sqrt(sum(value * value for value in axis)) or 1.0
+		matrix[row * 4:row * 4 + 3] = [value / length for value in axis]
+	return matrix
+
+
+def createGroups(selection=None, suffixes=("NULL", "ZERO", "BUFF"), matrices=None, freeze=False):
+	"""
+	Creates a stack of buffer groups above each object, placed by matrix instead of by snapping with constraints.
+	Every world matrix is read once up front, then each stack is built with the top group set to the object's world
+	matrix and the groups below it zeroed.
+	Args:
+		selection: An object or a list of objects, the current selection if None
+		suffixes: The group suffixes from the top group down, each group is named object_SUFFIX_GRP
+		matrices: Optional world matrices (16 floats each) to place the groups at instead of the objects' own, the
+		objects keep their local transforms and move with the groups
+		freeze: If True, the objects' transforms are frozen after they are parented under the groups
+	Returns:
+		groups: An ordered dictionary of each object to its list of groups, top group first
+	"""
+	if selection is None:
+		selection = cmds.ls(sl=True)
+	if type(selection) is not list:
+		selection = [selection]
+	if not suffixes:
+		raise ValueError("At least one group suffix is needed")
+	relative = matrices is not None
+	if matrices is None:
+		matrices = [_worldMatrix(each) for each in selection]
+	if len(matrices) != len(selection):
+		raise ValueError("Got {} objects but {} matrices".format(len(selection), len(matrices)))
+
+	groups = collections.OrderedDict()
+	for each, matrix in zip(selection, matrices):
+		short_name = each.split("|")[-1]
+		stack = [cmds.createNode("transform", n="{}_{}_GRP".format(short_name, suffixes[0]), skipSelect=True)]
+		cmds.xform(stack[0], matrix=matrix, worldSpace=True)
+		for suffix in suffixes[1:]:
+			stack.append(cmds.createNode("transform", n="{}_{}_GRP".format(short_name, suffix), parent=stack[-1],
+										 skipSelect=True))
+
+		child = cmds.parent(each, stack[-1], relative=relative)[0]
+		if freeze:
+			cmds.makeIdentity(child, t=1, r=1, s=1, apply=True)
+		groups[each] = stack
+
+	return groups
+
+
+def createThree(selection=None):
+	groups = createGroups(selection, suffixes=("NULL", "ZERO", "BUFF"), freeze=True)
+	return list(groups.values())[-1][0] if groups else None
+
+
+def createTwo(selection=None):
+	groups = createGroups(selection, suffixes=("NULL", "BUFF"))
+	return list(groups.values())[-1][0] if groups else None
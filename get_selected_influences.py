@@ -1,10 +1,159 @@
 import pymel.core as pm
+from maya.api import OpenMaya
+from maya.api import OpenMayaAnim
+import collections
+
+# Shape node hash -> (shape, skinCluster, influences) MObjectHandles. Only the deformer graph is cached, names are
+# looked up on every call so renaming or reparenting a shape or influence never leaves a stale answer. The cache is
+# cleared when a connection to a skinCluster or other deformer is made or broken, a deformer is deleted or a scene is
+# opened.
+_influence_cache = {}
+# Kept across reload() so the callbacks registered by the previous copy of the module can still be removed
+_callback_ids = globals().get("_callback_ids", [])
+
+# The plug a shape's deformed geometry comes in through
+_GEOMETRY_INPUTS = {OpenMaya.MFn.kMesh: "inMesh", OpenMaya.MFn.kNurbsCurve: "create",
+					OpenMaya.MFn.kNurbsSurface: "create"}
+
+
+def clear_cache(*args):
+	_influence_cache.clear()
+
+
+def _deformer_connection_changed(source_plug, destination_plug, made, *args):
+	# Adding/removing influences, deformers or skinned shapes always connects to or disconnects from a deformer
+	for plug in (source_plug, destination_plug):
+		if plug.node().hasFn(OpenMaya.MFn.kGeometryFilt):
+			clear_cache()
+			return
+
+
+def install_callbacks():
+	'''
+	Registers the callbacks that keep the cache in sync with the deformers in the scene, replacing any that are
+	already registered so they are never doubled up
+	'''
+	remove_callbacks()
+	_callback_ids.append(OpenMaya.MDGMessage.addConnectionCallback(_deformer_connection_changed))
+	# skinCluster inherits from geometryFilter, so this covers every deformer
+	_callback_ids.append(OpenMaya.MDGMessage.addNodeRemovedCallback(clear_cache, "geometryFilter"))
+	for message in (OpenMaya.MSceneMessage.kAfterOpen, OpenMaya.MSceneMessage.kAfterNew):
+		_callback_ids.append(OpenMaya.MSceneMessage.addCallback(message, clear_cache))
+
+
+def remove_callbacks():
+	if _callback_ids:
+		OpenMaya.MMessage.removeCallbacks(_callback_ids)
+		del _callback_ids[:]
+	clear_cache()
+
+
+# A reload leaves the previous copy's callbacks registered, drop them so get_influences installs this copy's
+remove_callbacks()
+
+
+def _influence_name(handle):
+	return OpenMaya.MDagPath.getAPathTo(handle.object()).partialPathName()
+
+
+def _shape_path(node):
+	selection_list = OpenMaya.MSelectionList()
+	selection_list.add(str(node))
+	dag_path = selection_list.getDagPath(0)
+	if dag_path.apiType() not in _GEOMETRY_INPUTS:
+		dag_path.extendToShape()
+	return dag_path
+
+
+def find_skin_cluster(shape_path, max_steps=32):
+	'''
+	Walks upstream from a shape's geometry input through its deformers until it reaches a skinCluster, following
+	only the geometry connections instead of the whole history
+	Args:
+		shape_path: The MDagPath of the mesh/nurbs shape
+		max_steps: The most nodes to walk through
+	Returns: The skinCluster MObject, None if the shape isn't skinned
+	'''
+	attribute = _GEOMETRY_INPUTS.get(shape_path.apiType())
+	if attribute is None:
+		return None
+	plug = OpenMaya.MFnDependencyNode(shape_path.node()).findPlug(attribute, False).source()
+
+	for _ in range(max_steps):
+		if plug.isNull:
+			return None
+		node = plug.node()
+		if node.hasFn(OpenMaya.MFn.kSkinClusterFilter):
+			return node
+
+		node_fn = OpenMaya.MFnDependencyNode(node)
+		if node.hasFn(OpenMaya.MFn.kGeometryFilt):
+			# A deformer's outputGeometry[i] is fed by its input[i].inputGeometry
+			input_plug = node_fn.findPlug("input", False).elementByLogicalIndex(plug.logicalIndex())
+			plug = input_plug.child(node_fn.attribute("inputGeometry")).source()
+		elif node.hasFn(OpenMaya.MFn.kGroupParts):
+			plug = node_fn.findPlug("inputGeometry", False).source()
+		else:
+			# Reached the geometry's creator, nothing upstream of it deforms the shape
+			return None
+
+	return None
+
+
+def get_influences(meshes=None):
+	'''
+	Gets the skinCluster and influences of many meshes at once. The deformer graph is cached until it changes.
+	Args:
+		meshes: Mesh/nurbs transforms or shapes, the selection if None
+	Returns: An ordered dictionary of each mesh to (skinCluster name, [influence names]), (None, []) if it isn't
+	skinned
+	'''
+	if not _callback_ids:
+		install_callbacks()
+	if meshes is None:
+		meshes = pm.selected()
+
+	results = collections.OrderedDict()
+	for mesh in meshes:
+		shape_path = _shape_path(mesh)
+		shape = shape_path.node()
+		key = OpenMaya.MObjectHandle(shape).hashCode()
+		cached = _influence_cache.get(key)
+		if cached is None or not cached[0].isValid() or cached[0].object() != shape:
+			skin_cluster = find_skin_cluster(shape_path)
+			if skin_cluster is None:
+				cached = (OpenMaya.MObjectHandle(shape), None, [])
+			else:
+				influences = OpenMayaAnim.MFnSkinCluster(skin_cluster).influenceObjects()
+				cached = (OpenMaya.MObjectHandle(shape), OpenMaya.MObjectHandle(skin_cluster),
+						  [OpenMaya.MObjectHandle(influence.node()) for influence in influences])
+			_influence_cache[key] = cached
+
+		_, skin_cluster, influences = cached
+		if skin_cluster is None:
+			results[mesh] = (None, [])
+		else:
+			results[mesh] = (OpenMaya.MFnDependencyNode(skin_cluster.object()).name(),
+							 [_influence_name(influence) for influence in influences])
+
+	return results
+
 
 def get_influence_objects_for_mesh(mesh):
-	skin = pm.listHistory(mesh, type="skinCluster")[0]
-	influences = skin.influenceObjects()
-	return influences
+	influences = []
+	for _, mesh_influences in get_influences(mesh if isinstance(mesh, list) else [mesh]).values():
+		influences.extend(i for i in mesh_influences if i not in influences)
+	return [pm.PyNode(i) for i in influences]
+
+
+def select_influences():
+	'''
+	Selects the influences of every selected mesh
+	'''
+	curr = pm.selected()
+	clothing_joints = get_influence_objects_for_mesh(curr)
+	pm.select(clothing_joints)
+
 
-curr = pm.selected()
-clothing_joints = get_influence_objects_for_mesh(curr)
-pm.select(clothing_joints)
\ No newline at end of file
+if __name__ == "__main__":
+	select_influences()
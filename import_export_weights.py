@@ -1,6 +1,11 @@
 ####Import/Export Skin Skin####
 import pymel.core as pm
+from maya.api import OpenMaya
+from maya.api import OpenMayaAnim
+import collections
+import numpy
 import os
+import skin_weight_io
 
 def establish_data_dir():
     '''
@@ -20,15 +25,281 @@ def establish_data_dir():
 
     return data_dir
 
-def import_weights():
+def get_skin_cluster(mesh):
     '''
-    Import skin weights
-    Returns:
+    Finds the skinCluster deforming a mesh
+    Args:
+        mesh: The mesh transform or shape
+    Returns: The skinCluster, None if the mesh isn't skinned
+
+    '''
+    skin_clusters = pm.listHistory(mesh, type="skinCluster")
+    return skin_clusters[0] if skin_clusters else None
+
+
+def get_skin_cluster_fn(skin_cluster, mesh):
+    '''
+    Gets the API function set of a skinCluster and the dag path of the mesh it deforms
+    Returns: skin_fn, dag_path
+
+    '''
+    selection_list = OpenMaya.MSelectionList()
+    selection_list.add(str(skin_cluster))
+    selection_list.add(str(mesh))
+    dag_path = selection_list.getDagPath(1)
+    dag_path.extendToShape()
+
+    return OpenMayaAnim.MFnSkinCluster(selection_list.getDependNode(0)), dag_path
+
+
+def read_skin_weights(mesh, skin_cluster=None):
+    '''
+    Reads the weights of every vertex of a mesh with a single API call
+    Args:
+        mesh: The skinned mesh
+        skin_cluster: The skinCluster to read, found from the mesh history if None
+    Returns: weights, influences - a (vertices, influences) array and the influence names in column order
+
+    '''
+    skin_cluster = skin_cluster or get_skin_cluster(mesh)
+    if skin_cluster is None:
+        raise RuntimeError("{} has no skinCluster".format(mesh))
+    skin_fn, dag_path = get_skin_cluster_fn(skin_cluster, mesh)
+
+    # An empty complete component means every vertex
+    components = OpenMaya.MFnSingleIndexedComponent()
+    components_obj = components.create(OpenMaya.MFn.kMeshVertComponent)
+    components.setCompleteData(OpenMaya.MFnMesh(dag_path).numVertices)
+
+    weights, influence_count = skin_fn.getWeights(dag_path, components_obj)
+    influences = [influence.partialPathName() for influence in skin_fn.influenceObjects()]
+    weights = numpy.fromiter(weights, dtype=numpy.float32, count=len(weights)).reshape(-1, influence_count)
+
+    return weights, influences
+
+
+def get_topology_hash(mesh):
+    '''
+    Hashes the face/vertex connectivity of a mesh
+    Returns: vertex_count, topology_hash
+
+    '''
+    selection_list = OpenMaya.MSelectionList()
+    selection_list.add(str(mesh))
+    mesh_fn = OpenMaya.MFnMesh(selection_list.getDagPath(0).extendToShape())
+    face_counts, face_vertices = mesh_fn.getVertices()
+
+    return mesh_fn.numVertices, skin_weight_io.topology_hash(face_counts, face_vertices)
+
+
+def get_skinned_meshes():
+    '''
+    Lists the transform of every mesh deformed by a skinCluster in the scene
+    '''
+    meshes = []
+    for skin_cluster in pm.ls(type="skinCluster"):
+        for shape in skin_cluster.getGeometry():
+            transform = shape.getParent()
+            if transform not in meshes:
+                meshes.append(transform)
+    return meshes
+
+
+def get_mesh_points(mesh):
+    '''
+    Gets the world space position of every vertex of a mesh with a single API call
+    Returns: A (vertices, 3) array
+
+    '''
+    selection_list = OpenMaya.MSelectionList()
+    selection_list.add(str(mesh))
+    points = OpenMaya.MFnMesh(selection_list.getDagPath(0).extendToShape()).getPoints(OpenMaya.MSpace.kWorld)
+    return numpy.array([(point.x, point.y, point.z) for point in points], dtype=float).reshape(-1, 3)
+
+
+def export_weights(meshes=None, compress=True, workers=None):
+    '''
+    Export skin weights of the selected (or given) skinned meshes to the data directory, every skinned mesh in the
+    scene if nothing is selected. Weights are read from the scene on the main thread just ahead of a thread pool that
+    encodes, compresses and writes the files.
+    Args:
+        meshes: The meshes to export, the selected transforms if None
+        compress: If True, the weight blocks are zlib compressed
+        workers: The number of encoding threads, a thread per core if None, 0 to do everything on the main thread
+    Returns: A list of the written files
 
     '''
     data_dir = establish_data_dir()
-    # List all files in the data  directory
-    data_files = os.listdir(data_dir)
+    if meshes is None:
+        meshes = pm.selected(type=pm.nt.Transform) or get_skinned_meshes()
+
+    index = skin_weight_io.load_index(data_dir)
+
+    def jobs():
+        for mesh in meshes:
+            mesh = pm.PyNode(mesh)
+            skin_cluster = get_skin_cluster(mesh)
+            if skin_cluster is None:
+                pm.warning("{} has no skinCluster, skipping".format(mesh))
+                continue
+
+            weights, influences = read_skin_weights(mesh, skin_cluster)
+            vertex_count, topology_hash = get_topology_hash(mesh)
+            mesh_name = mesh.nodeName()
+            version = skin_weight_io.next_version(index, mesh_name)
+            file_name = "{}_{:03d}.skw".format(mesh_name, version)
+            skin_weight_io.add_to_index(index, mesh_name, version, file_name, vertex_count, topology_hash)
+
+            yield {"path": os.path.join(data_dir, file_name), "weights": weights, "influences": influences,
+                   "compress": compress, "positions": get_mesh_points(mesh),
+                   "metadata": {"mesh": mesh_name, "skin_cluster": skin_cluster.nodeName(),
+                                "weight_version": version, "topology_hash": topology_hash}}
+
+    paths = [path for path, _ in skin_weight_io.write_many(jobs(), workers)]
+    if paths:
+        skin_weight_io.save_index(data_dir, index)
+
+    return paths
+
+
+def get_target_influences(skin_fn):
+    '''
+    Gets the influence names of a skinCluster and their physical indices (positions in influenceObjects()), which is
+    what setWeights expects. Logical indices stop matching once the influence list has a gap.
+    Returns: names, influence_indices
+
+    '''
+    influence_paths = skin_fn.influenceObjects()
+    names = [influence.partialPathName() for influence in influence_paths]
+    influence_indices = OpenMaya.MIntArray(list(range(len(influence_paths))))
+    return names, influence_indices
+
+
+def set_weight_block(skin_fn, dag_path, influence_indices, start, weights):
+    '''
+    Sets the weights of a run of vertices with a single API call
+    Args:
+        skin_fn: The MFnSkinCluster to write to
+        dag_path: The dag path of the deformed mesh
+        influence_indices: The physical indices of the weight columns
+        start: The first vertex of the run
+        weights: A (vertices, influences) array
+    Returns: The vertices that were skipped because all of their weight was on dropped influences, they keep the
+    weights they had instead of being zeroed out
+    '''
+    weighted = weights.sum(axis=1) > 0
+    vertices = numpy.arange(start, start + len(weights))
+    if not weighted.all():
+        weights = weights[weighted]
+    if len(weights):
+        components = OpenMaya.MFnSingleIndexedComponent()
+        components_obj = components.create(OpenMaya.MFn.kMeshVertComponent)
+        components.addElements(vertices[weighted].tolist())
+        skin_fn.setWeights(dag_path, components_obj, influence_indices, OpenMaya.MDoubleArray(weights.ravel()),
+                           normalize=False)
+
+    return vertices[~weighted].tolist()
+
+
+def _warn_skipped(mesh, skipped):
+    if skipped:
+        pm.warning("{} vertices of {} only had weights on missing influences and kept their current weights: {}{}"
+                   .format(len(skipped), mesh, skipped[:20], "..." if len(skipped) > 20 else ""))
+
+
+def _prepare_target(mesh, path, skin_cluster, header):
+    skin_fn, dag_path = get_skin_cluster_fn(skin_cluster, mesh)
+    target_influences, influence_indices = get_target_influences(skin_fn)
+
+    vertex_count = OpenMaya.MFnMesh(dag_path).numVertices
+    if header["vertex_count"] != vertex_count:
+        raise RuntimeError("{} has {} vertices but {} was saved with {}".format(mesh, vertex_count, path,
+                                                                              header["vertex_count"]))
+    lookup, missing = skin_weight_io.influence_lookup(header["influences"], target_influences)
+    if missing:
+        pm.warning("{} is missing influences {}, their weights are dropped".format(skin_cluster, missing))
+
+    return skin_fn, dag_path, influence_indices, lookup, missing
+
+
+def apply_weights(mesh, path, skin_cluster=None):
+    '''
+    Streams a weight file onto a skinned mesh block by block. Influences are matched to the skinCluster by name
+    through a lookup table built once, and each block is set with a single API call.
+    Args:
+        mesh: The skinned mesh
+        path: The weight file to load
+        skin_cluster: The skinCluster to write to, found from the mesh history if None
+    Returns: The names of influences in the file that the skinCluster doesn't have, their weight was dropped
+
+    '''
+    skin_cluster = skin_cluster or get_skin_cluster(mesh)
+    if skin_cluster is None:
+        raise RuntimeError("{} has no skinCluster".format(mesh))
+
+    with skin_weight_io.open_weights(path) as (header, data):
+        skin_fn, dag_path, influence_indices, lookup, missing = _prepare_target(mesh, path, skin_cluster, header)
+        skipped = []
+        for start, weights in skin_weight_io.iter_blocks(header, data, lookup, len(influence_indices)):
+            skipped.extend(set_weight_block(skin_fn, dag_path, influence_indices, start, weights))
+    _warn_skipped(mesh, skipped)
+
+    return missing
+
+
+def apply_weights_by_position(mesh, path, skin_cluster=None, k=4, workers=None):
+    '''
+    Transfers a weight file onto a mesh whose topology has changed since the export. Each vertex blends the weights
+    of the k nearest saved vertices by inverse distance.
+    Args:
+        mesh: The skinned mesh
+        path: The weight file to load, it has to have been exported with positions
+        skin_cluster: The skinCluster to write to, found from the mesh history if None
+        k: The number of saved vertices blended per vertex
+        workers: The number of threads for the neighbor search, -1 for all cores
+    Returns: The names of influences in the file that the skinCluster doesn't have, their weight was dropped
+
+    '''
+    skin_cluster = skin_cluster or get_skin_cluster(mesh)
+    if skin_cluster is None:
+        raise RuntimeError("{} has no skinCluster".format(mesh))
+    skin_fn, dag_path = get_skin_cluster_fn(skin_cluster, mesh)
+    target_influences, influence_indices = get_target_influences(skin_fn)
+
+    with skin_weight_io.open_weights(path) as (header, data):
+        source_points = skin_weight_io.read_positions(header, data)
+        if source_points is None:
+            raise RuntimeError("{} was saved without vertex positions".format(path))
+        lookup, missing = skin_weight_io.influence_lookup(header["influences"], target_influences)
+        if missing:
+            pm.warning("{} is missing influences {}, their weights are dropped".format(skin_cluster, missing))
+        source_weights = numpy.concatenate([weights for _, weights in
+                                            skin_weight_io.iter_blocks(header, data, lookup, len(target_influences))])
+
+    weights = skin_weight_io.transfer_weights(source_points, source_weights, get_mesh_points(mesh), k=k,
+                                              workers=workers)
+    skipped = []
+    for start in range(0, len(weights), 4096):
+        skipped.extend(set_weight_block(skin_fn, dag_path, influence_indices, start, weights[start:start + 4096]))
+    _warn_skipped(mesh, skipped)
+
+    return missing
+
+
+def import_weights(workers=None, by_position=False):
+    '''
+    Import skin weights. The files are picked and matched to the scene first, then their blocks are decoded on a
+    thread pool while the main thread sets each decoded block, so memory stays flat whatever the mesh sizes.
+    Args:
+        workers: The number of decoding threads, a thread per core if None, 0 to do everything on the main thread
+        by_position: If True, meshes whose topology changed get the latest weights transferred by vertex position
+    Returns: A dictionary of each mesh that had a weight file to the file that was loaded
+
+    '''
+    data_dir = establish_data_dir()
+    index = skin_weight_io.load_index(data_dir)
+    if not index["meshes"]:
+        index = skin_weight_io.rebuild_index(data_dir)
 
     # Save the meshes to import weights for
     if not pm.selected():
@@ -36,7 +307,39 @@ def import_weights():
     else:
         mesh_transforms = pm.selected(type=pm.nt.Transform)
 
-    # Cycle through the list of meshes and find the most recent iteration
-    for i in mesh_transforms:
-        valid_files = [i for i in data_files if i.split("_")[0] == i.name()]
+    # Cycle through the list of meshes and find the most recent iteration saved from the same topology
+    loaded = {}
+    targets = []
+    for mesh in mesh_transforms:
+        skin_cluster = get_skin_cluster(mesh) if mesh.nodeName() in index["meshes"] else None
+        if skin_cluster is None:
+            continue
+        vertex_count, topology_hash = get_topology_hash(mesh)
+        entry, rejected = skin_weight_io.find_weights(index, mesh.nodeName(), vertex_count, topology_hash)
+        if entry is None and rejected and by_position:
+            path = os.path.join(data_dir, index["meshes"][mesh.nodeName()][rejected[0]]["file"])
+            apply_weights_by_position(mesh, path, skin_cluster, workers=-1 if workers is None else workers)
+            loaded[mesh.nodeName()] = path
+            continue
+        if rejected:
+            pm.warning("Skipped weight versions {} of {}, the topology doesn't match".format(rejected, mesh))
+        if entry is None:
+            continue
+
+        path = os.path.join(data_dir, entry["file"])
+        with open(path, "rb") as weight_file:
+            header = skin_weight_io.read_header(weight_file)
+        skin_fn, dag_path, influence_indices, lookup, _ = _prepare_target(mesh, path, skin_cluster, header)
+        targets.append((mesh, path, skin_fn, dag_path, influence_indices, lookup))
+
+    # Decode blocks on the pool, set each one at its first vertex on the main thread
+    jobs = ((path, lookup, len(influence_indices)) for _, path, _, _, influence_indices, lookup in targets)
+    skipped = collections.defaultdict(list)
+    for job_index, start, weights in skin_weight_io.read_many(jobs, workers):
+        mesh, path, skin_fn, dag_path, influence_indices, _ = targets[job_index]
+        skipped[job_index].extend(set_weight_block(skin_fn, dag_path, influence_indices, start, weights))
+        loaded[mesh.nodeName()] = path
+    for job_index, vertices in sorted(skipped.items()):
+        _warn_skipped(targets[job_index][0], vertices)
 
+    return loaded
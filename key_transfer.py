@@ -0,0 +1,188 @@
+####Key Transfer####
+# Copies animation from one joint hierarchy to another without the clipboard. Joints are paired by name (ignoring
+# DAG paths, namespaces and prefixes) or by their path under the root, then every source animCurve is duplicated in
+# one call and the copies are connected straight to the matching target plugs, so keys and tangents come across
+# exactly without being read or written one key at a time. Only merging into curves the targets already have
+# (replace=False) goes through copyKey/pasteKey.
+import maya.cmds as cmds
+import collections
+
+# Time driven curves only, driven keys (animCurveU*) are left alone
+TIME_CURVE_TYPES = ["animCurveTL", "animCurveTA", "animCurveTU", "animCurveTT"]
+
+
+def strip_name(name, prefixes=()):
+    '''
+    Strips the DAG path, namespaces and the first matching prefix from a node name
+    Args:
+        name: The node name
+        prefixes: Prefixes to remove, e.g. ("mixamorig_", "Export_")
+    Returns: The bare name used to pair joints
+    '''
+    name = name.split("|")[-1].split(":")[-1]
+    for prefix in prefixes:
+        if prefix and name.startswith(prefix):
+            return name[len(prefix):]
+    return name
+
+
+def get_hierarchy(root, node_type="joint"):
+    '''
+    Lists a root and every node of a type under it, as long names
+    '''
+    nodes = cmds.ls(root, long=True)
+    nodes.extend(reversed(cmds.listRelatives(root, allDescendents=True, type=node_type, fullPath=True) or []))
+    return nodes
+
+
+def match_joints(source_root, target_root, mode="name", prefixes=(), node_type="joint"):
+    '''
+    Pairs the joints of two hierarchies
+    Args:
+        source_root: The root of the animated hierarchy
+        target_root: The root of the hierarchy to copy to
+        mode: "name" pairs joints with the same stripped name anywhere in the hierarchy, "path" pairs joints with the
+        same stripped path under their root
+        prefixes: Prefixes stripped from both sides before comparing
+        node_type: The type of node to pair
+    Returns:
+        pairs, unmatched: A list of (source, target) long names and the source nodes without a target
+    '''
+    if mode not in ("name", "path"):
+        raise ValueError("mode has to be 'name' or 'path', got {}".format(mode))
+
+    def keys(root):
+        nodes = get_hierarchy(root, node_type)
+        root_depth = nodes[0].count("|")
+        result = collections.OrderedDict()
+        for node in nodes:
+            if mode == "name":
+                key = strip_name(node, prefixes)
+            else:
+                parts = node.split("|")[root_depth:]
+                key = "|".join(strip_name(part, prefixes) for part in parts[1:])
+            if key in result:
+                raise RuntimeError("{} and {} both match as {}, use mode='path'".format(result[key], node, key))
+            result[key] = node
+        return result
+
+    targets = keys(target_root)
+    pairs = []
+    unmatched = []
+    for key, source in keys(source_root).items():
+        if key in targets:
+            pairs.append((source, targets[key]))
+        else:
+            unmatched.append(source)
+
+    return pairs, unmatched
+
+
+def get_anim_curves(node):
+    '''
+    Finds the time driven animCurves connected to the attributes of a node with one query
+    Args:
+        node: The node to look at
+    Returns: A list of (animCurve, destination attribute name) tuples
+    '''
+    connections = cmds.listConnections(node, source=True, destination=False, connections=True, plugs=True,
+                                       type="animCurve") or []
+    curves = []
+    for destination, source in zip(connections[0::2], connections[1::2]):
+        curve = source.split(".")[0]
+        if cmds.nodeType(curve) in TIME_CURVE_TYPES:
+            curves.append((curve, destination.partition(".")[2]))
+    return curves
+
+
+def transfer_keys(pairs, replace=True):
+    '''
+    Copies the animation of each source node to its target
+    Args:
+        pairs: A list of (source, target) nodes
+        replace: If True, curves already driving the target attributes are deleted, if False the source keys are
+        merged into them
+    Returns: A list of the new animCurves, merged curves aren't included
+    '''
+    curves = []
+    destinations = []
+    for source, target in pairs:
+        for curve, attribute in get_anim_curves(source):
+            if not cmds.attributeQuery(attribute.split("[")[0], node=target, exists=True):
+                continue
+            curves.append(curve)
+            destinations.append("{}.{}".format(target, attribute))
+
+    if not curves:
+        return []
+
+    if replace:
+        old_curves = cmds.listConnections(destinations, source=True, destination=False, type="animCurve") or []
+        if old_curves:
+            cmds.delete(list(set(old_curves)))
+    else:
+        # Connecting over a keyed attribute would orphan its curve, merge the source keys into it instead
+        merged = set()
+        for curve, destination in zip(curves, destinations):
+            existing = cmds.listConnections(destination, source=True, destination=False, type="animCurve")
+            if existing:
+                merge_keys(curve, existing[0])
+                merged.add(destination)
+        remaining = [(curve, destination) for curve, destination in zip(curves, destinations)
+                     if destination not in merged]
+        curves = [curve for curve, _ in remaining]
+        destinations = [destination for _, destination in remaining]
+
+    # Duplicating every curve in one call copies the keys, tangents and curve settings exactly. A curve fanned out to
+    # several attributes is copied once and the copy keeps driving all of them.
+    copies = duplicate_curves(curves)
+    for curve, destination in zip(curves, destinations):
+        cmds.connectAttr("{}.output".format(copies[curve]), destination, force=True)
+
+    return [copies[curve] for curve in collections.OrderedDict.fromkeys(curves)]
+
+
+def merge_keys(source_curve, target_curve):
+    '''
+    Pastes the keys of one animCurve into another at their own times, replacing target keys on the same frames and
+    keeping the rest
+    '''
+    first = cmds.findKeyframe(source_curve, which="first")
+    cmds.copyKey(source_curve)
+    cmds.pasteKey(target_curve, option="merge", time=(first,))
+
+
+def duplicate_curves(curves):
+    '''
+    Duplicates animCurves with one call, each curve only once however often it's listed
+    Returns: A dictionary of each curve to its copy
+    '''
+    unique_curves = list(collections.OrderedDict.fromkeys(curves))
+    if not unique_curves:
+        return {}
+    return dict(zip(unique_curves, cmds.duplicate(unique_curves, returnRootsOnly=True)))
+
+
+def transfer_hierarchy(source_root, target_root, mode="name", prefixes=(), replace=True):
+    '''
+    Copies the animation of a whole hierarchy to another one inside a single undo chunk
+    Args:
+        source_root: The root of the animated hierarchy
+        target_root: The root of the hierarchy to copy to
+        mode: How joints are paired, see match_joints
+        prefixes: Prefixes stripped from both sides before comparing names
+        replace: If True, existing curves on the targets are deleted, if False the new keys are merged into them
+    Returns:
+        new_curves, unmatched: The new animCurves and the source joints that had no target
+    '''
+    cmds.undoInfo(openChunk=True, chunkName="transfer_hierarchy")
+    try:
+        pairs, unmatched = match_joints(source_root, target_root, mode=mode, prefixes=prefixes)
+        new_curves = transfer_keys(pairs, replace=replace)
+    finally:
+        cmds.undoInfo(closeChunk=True)
+
+    if unmatched:
+        cmds.warning("No target for {} joints: {}".format(len(unmatched), ", ".join(unmatched[:10])))
+
+    return new_curves, unmatched
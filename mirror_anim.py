@@ -1,42 +1,562 @@
+####Mirror Animation####
+# Left/right controls are paired once by swapping whole name tokens ("L_arm_CTRL" <-> "R_arm_CTRL", "arm_L_CTRL" <->
+# "arm_R_CTRL") and the table is cached on the rig. Every keyable value is read in one pass, mirrored with array
+# operations and written back in one batch through the API. mirror_curves does the same to whole clips by moving the
+# animCurves themselves, without changing time or evaluating anything.
 import pymel.core as pm
+import maya.cmds as cmds
+from maya.api import OpenMaya
+from maya.api import OpenMayaAnim
+import collections
+import hashlib
+import json
+import os
+import numpy
+import key_transfer
 
-## Mirror IK foot controls ##
-# Save controls
-left_ik_foot_ctrl = pm.selected()[0]
-right_ik_foot_ctrl = pm.PyNode(left_ik_foot_ctrl.name().replace("L_", "R_"))
+# (left, right) name tokens, names are split on "_" and only whole tokens are swapped so "BALL_CTRL" isn't a side
+DEFAULT_RULES = [("L", "R"), ("l", "r"), ("Left", "Right"), ("left", "right"), ("Lf", "Rt"), ("lf", "rt")]
+# Channels that change sign when a value moves to the other side. Paired controls are usually built with mirrored
+# behaviour so their values swap as they are, center controls flip across the YZ plane.
+DEFAULT_PAIR_SIGNS = {}
+DEFAULT_CENTER_SIGNS = {"translateX": -1, "rotateY": -1, "rotateZ": -1}
+# The string attribute the pairing table is cached in on the rig
+TABLE_ATTR = "mirrorPairingTable"
 
-# Save left control translates and non-zero rig attributes
-left_translates = left_ik_foot_ctrl.getTranslation(space="object")
+# This file is also loaded as a plugin for APPLY_COMMAND, the undoable command the batched API writes run through
+maya_useNewAPI = True
+PLUGIN_NAME = "mirror_anim"
+APPLY_COMMAND = "mirrorAnimApply"
+# Edits waiting for APPLY_COMMAND, callables taking (MDGModifier, MAnimCurveChange)
+_pending_edits = []
+_INTEGER_TYPES = (OpenMaya.MFnNumericData.kBoolean, OpenMaya.MFnNumericData.kByte, OpenMaya.MFnNumericData.kChar,
+                  OpenMaya.MFnNumericData.kShort, OpenMaya.MFnNumericData.kInt)
+_TIME_CURVE_TYPES = (OpenMayaAnim.MFnAnimCurve.kAnimCurveTL, OpenMayaAnim.MFnAnimCurve.kAnimCurveTA,
+                     OpenMayaAnim.MFnAnimCurve.kAnimCurveTU, OpenMayaAnim.MFnAnimCurve.kAnimCurveTT)
 
-left_attrs = left_ik_foot_ctrl.listAttr(keyable=True, inUse=True)[6:]
-left_non_zero_attrs = [i for i in left_attrs if i.get() != 0]
-left_non_zero_attrs_values = [i.get() for i in left_non_zero_attrs]
 
-# Save right control translates and non-zero rig attributes
-right_translates = right_ik_foot_ctrl.getTranslation(space="object")
+class ApplyEditsCommand(OpenMaya.MPxCommand):
+    '''
+    Runs a queued edit with an MDGModifier and an MAnimCurveChange, so Maya undoes and redoes it like any command
+    '''
+    def __init__(self):
+        super(ApplyEditsCommand, self).__init__()
+        self.modifier = OpenMaya.MDGModifier()
+        self.curve_change = OpenMayaAnim.MAnimCurveChange()
 
-right_attrs = right_ik_foot_ctrl.listAttr(keyable=True, inUse=True)[6:]
-right_non_zero_attrs = [i for i in right_attrs if i.get() != 0]
-right_non_zero_attrs_values = [i.get() for i in right_non_zero_attrs]
+    @staticmethod
+    def creator():
+        return ApplyEditsCommand()
 
-# Swap translation values on left & right controls
-left_ik_foot_ctrl.setTranslation(right_translates)
-right_ik_foot_ctrl.setTranslation(left_translates)
+    def isUndoable(self):
+        return True
 
-# Swap rig attributes on left & right controls
-for i, v in enumerate(left_non_zero_attrs):
-    v.set(right_non_zero_attrs_values[i])
-for i, v in enumerate(right_non_zero_attrs):
-    v.set(left_non_zero_attrs_values[i])
+    def doIt(self, args):
+        # Maya loads the plugin as a second copy of this file, the queue lives in the imported module
+        import mirror_anim
+        mirror_anim._pending_edits.pop(0)(self.modifier, self.curve_change)
 
+    def redoIt(self):
+        self.modifier.doIt()
+        self.curve_change.redoIt()
 
-## Mirror FK controls
-left_fk_ctrl = pm.selected()[0]
-# Assumes L_ and R_ naming convention
-right_fk_ctrl = pm.PyNode(left_fk_ctrl.name().replace("L_", "R_"))
+    def undoIt(self):
+        self.curve_change.undoIt()
+        self.modifier.undoIt()
 
-left_rotations = left_fk_ctrl.getRotation(space="object")
-right_rotations = right_fk_ctrl.getRotation(space="object")
 
-left_fk_ctrl.setRotation(right_rotations, space="object")
-right_fk_ctrl.setRotation(left_rotations, space="object")
\ No newline at end of file
+def initializePlugin(plugin):
+    OpenMaya.MFnPlugin(plugin).registerCommand(APPLY_COMMAND, ApplyEditsCommand.creator)
+
+
+def uninitializePlugin(plugin):
+    OpenMaya.MFnPlugin(plugin).deregisterCommand(APPLY_COMMAND)
+
+
+def apply_edits(edit):
+    '''
+    Runs edit(modifier, curve_change) as a single undoable command, loading this file as a plugin the first time.
+    The edit has to call modifier.doIt() itself and pass curve_change to every MFnAnimCurve edit.
+    '''
+    if not cmds.pluginInfo(PLUGIN_NAME, query=True, loaded=True):
+        cmds.loadPlugin("{}.py".format(os.path.splitext(os.path.abspath(__file__))[0]), quiet=True)
+    _pending_edits.append(edit)
+    try:
+        getattr(cmds, APPLY_COMMAND)()
+    finally:
+        del _pending_edits[:]
+
+
+def mirror_name(name, rules=DEFAULT_RULES):
+    '''
+    Gets the name of the control on the other side
+    Args:
+        name: The control name, DAG paths and namespaces are kept
+        rules: (left, right) name token pairs, the first rule that matches is used
+    Returns: The other side's name, None for center controls
+    '''
+    path, _, short_name = name.rpartition("|")
+    namespace, _, short_name = short_name.rpartition(":")
+    tokens = short_name.split("_")
+    for left, right in rules:
+        swap = {left: right, right: left}
+        if any(token in swap for token in tokens):
+            mirrored = "_".join(swap.get(token, token) for token in tokens)
+            return "{}{}{}".format(path + "|" if path else "", namespace + ":" if namespace else "", mirrored)
+    return None
+
+
+def get_rig_controls(rig):
+    '''
+    Lists every transform under a rig that has a nurbsCurve shape
+    '''
+    shapes = cmds.listRelatives(rig, allDescendents=True, type="nurbsCurve", fullPath=True) or []
+    return sorted(set(cmds.listRelatives(shapes, parent=True, fullPath=True) or []))
+
+
+def build_pairing_table(controls, rules=DEFAULT_RULES):
+    '''
+    Pairs every control with the control on the other side
+    Args:
+        controls: The controls to pair
+        rules: (left, right) name token pairs
+    Returns: A dictionary with the "pairs" ([left, right] names), the "centers" and the "unpaired" sided controls
+    whose other side doesn't exist
+    '''
+    controls = cmds.ls(controls)
+    existing = set(controls)
+    table = {"rules": [list(rule) for rule in rules], "pairs": [], "centers": [], "unpaired": []}
+    seen = set()
+    for control in controls:
+        if control in seen:
+            continue
+        other = mirror_name(control, rules)
+        if other is None:
+            table["centers"].append(control)
+        elif other in existing or cmds.objExists(other):
+            table["pairs"].append([control, cmds.ls(other)[0]])
+            seen.add(cmds.ls(other)[0])
+        else:
+            table["unpaired"].append(control)
+        seen.add(control)
+
+    return table
+
+
+def controls_fingerprint(controls):
+    '''
+    Hashes a set of control names, so a cached pairing table can tell when controls were added, removed or renamed
+    '''
+    names = sorted(cmds.ls(controls))
+    return "{}:{}".format(len(names), hashlib.sha1("\n".join(names).encode("utf-8")).hexdigest())
+
+
+def get_pairing_table(rig, controls=None, rules=DEFAULT_RULES, rebuild=False):
+    '''
+    Gets the pairing table cached on a rig. It's built and cached the first time, and rebuilt when the rules or the
+    set of controls change.
+    Args:
+        rig: The rig's top node, the table is stored on it
+        controls: The controls to pair, every nurbsCurve transform under the rig if None
+        rules: (left, right) name token pairs
+        rebuild: If True, the cached table is ignored and replaced
+    Returns: The pairing table, see build_pairing_table
+    '''
+    rules = [list(rule) for rule in rules]
+    controls = controls if controls is not None else get_rig_controls(rig)
+    fingerprint = controls_fingerprint(controls)
+    if not rebuild and cmds.attributeQuery(TABLE_ATTR, node=rig, exists=True):
+        cached = cmds.getAttr("{}.{}".format(rig, TABLE_ATTR))
+        if cached:
+            table = json.loads(cached)
+            if table["rules"] == rules and table.get("fingerprint") == fingerprint:
+                return table
+
+    table = build_pairing_table(controls, rules)
+    table["fingerprint"] = fingerprint
+    if not cmds.attributeQuery(TABLE_ATTR, node=rig, exists=True):
+        cmds.addAttr(rig, longName=TABLE_ATTR, dataType="string")
+    cmds.setAttr("{}.{}".format(rig, TABLE_ATTR), json.dumps(table), type="string")
+
+    return table
+
+
+def _channels(control):
+    return cmds.listAttr(control, keyable=True, scalar=True, unlocked=True) or []
+
+
+def mirror_plan(table, direction="flip", pair_signs=None, center_signs=None):
+    '''
+    Works out where every mirrored value comes from
+    Args:
+        table: The pairing table
+        direction: "flip" swaps both sides, "left" copies the left side onto the right and "right" the other way
+        pair_signs: Channel name -> sign for values moving between paired controls
+        center_signs: Channel name -> sign for center controls
+    Returns:
+        destinations, sources, signs: The plug to write, the plug its value comes from and the sign applied
+    '''
+    if direction not in ("flip", "left", "right"):
+        raise ValueError("direction has to be 'flip', 'left' or 'right', got {}".format(direction))
+    pair_signs = DEFAULT_PAIR_SIGNS if pair_signs is None else pair_signs
+    center_signs = DEFAULT_CENTER_SIGNS if center_signs is None else center_signs
+
+    destinations = []
+    sources = []
+    signs = []
+    for left, right in table["pairs"]:
+        right_channels = set(_channels(right))
+        for channel in [channel for channel in _channels(left) if channel in right_channels]:
+            sign = pair_signs.get(channel, 1)
+            if direction in ("flip", "left"):
+                destinations.append("{}.{}".format(right, channel))
+                sources.append("{}.{}".format(left, channel))
+                signs.append(sign)
+            if direction in ("flip", "right"):
+                destinations.append("{}.{}".format(left, channel))
+                sources.append("{}.{}".format(right, channel))
+                signs.append(sign)
+
+    if direction == "flip":
+        for center in table["centers"]:
+            for channel in _channels(center):
+                if center_signs.get(channel, 1) != 1:
+                    destinations.append("{}.{}".format(center, channel))
+                    sources.append("{}.{}".format(center, channel))
+                    signs.append(center_signs[channel])
+
+    return destinations, sources, numpy.array(signs, dtype=float)
+
+
+def get_mplugs(plugs):
+    '''
+    Looks up many plugs with one selection list
+    '''
+    selection_list = OpenMaya.MSelectionList()
+    for plug in plugs:
+        selection_list.add(plug)
+    return [selection_list.getPlug(i) for i in range(selection_list.length())]
+
+
+def _unit_type(mplug):
+    attribute = mplug.attribute()
+    if attribute.hasFn(OpenMaya.MFn.kUnitAttribute):
+        return OpenMaya.MFnUnitAttribute(attribute).unitType()
+    return None
+
+
+def _is_integer(mplug):
+    attribute = mplug.attribute()
+    if attribute.hasFn(OpenMaya.MFn.kEnumAttribute):
+        return True
+    return attribute.hasFn(OpenMaya.MFn.kNumericAttribute) and \
+        OpenMaya.MFnNumericAttribute(attribute).numericType() in _INTEGER_TYPES
+
+
+def _to_ui(mplug, value):
+    unit_type = _unit_type(mplug)
+    if unit_type == OpenMaya.MFnUnitAttribute.kAngle:
+        return OpenMaya.MAngle.internalToUI(value)
+    if unit_type == OpenMaya.MFnUnitAttribute.kDistance:
+        return OpenMaya.MDistance.internalToUI(value)
+    return value
+
+
+def _to_internal(mplug, value):
+    unit_type = _unit_type(mplug)
+    if unit_type == OpenMaya.MFnUnitAttribute.kAngle:
+        return OpenMaya.MAngle.uiToInternal(value)
+    if unit_type == OpenMaya.MFnUnitAttribute.kDistance:
+        return OpenMaya.MDistance.uiToInternal(value)
+    return value
+
+
+def read_values(mplugs, ui_units=True):
+    '''
+    Reads plug values
+    Args:
+        mplugs: The MPlugs to read
+        ui_units: If True, values are in UI units like getAttr returns, otherwise in internal units (cm/radians)
+    Returns: An array with a value per plug
+    '''
+    values = numpy.empty(len(mplugs))
+    for i, mplug in enumerate(mplugs):
+        values[i] = _to_ui(mplug, mplug.asDouble()) if ui_units else mplug.asDouble()
+    return values
+
+
+def get_time_curve(mplug):
+    '''
+    Gets the time driven animCurve connected straight into a plug
+    Returns: An MFnAnimCurve, None if the plug isn't keyed
+    '''
+    source = mplug.source()
+    if source.isNull or not source.node().hasFn(OpenMaya.MFn.kAnimCurve):
+        return None
+    curve_fn = OpenMayaAnim.MFnAnimCurve(source.node())
+    return curve_fn if curve_fn.animCurveType in _TIME_CURVE_TYPES else None
+
+
+def read_range(plugs, mplugs, times):
+    '''
+    Reads plug values at many times without changing the current time. Keyed plugs are evaluated straight from
+    their animCurves, only plugs driven by something else are evaluated through the DG.
+    Args:
+        plugs: The plug names
+        mplugs: Their MPlugs
+        times: A list of MTimes
+    Returns: A (times, plugs) array in internal units
+    '''
+    values = numpy.empty((len(times), len(mplugs)))
+    for i, (plug, mplug) in enumerate(zip(plugs, mplugs)):
+        curve_fn = get_time_curve(mplug)
+        if curve_fn is not None:
+            values[:, i] = [curve_fn.evaluate(time) for time in times]
+        elif mplug.isDestination:
+            values[:, i] = [_to_internal(mplug, cmds.getAttr(plug, time=time.value)) for time in times]
+        else:
+            values[:, i] = mplug.asDouble()
+    return values
+
+
+def is_driven(mplug):
+    '''
+    Checks if a plug gets its value from something other than a time animCurve (constraints, expressions,
+    pairBlends, anim layers...)
+    '''
+    return mplug.isDestination and get_time_curve(mplug) is None
+
+
+def drop_driven(destinations, sources, signs, driven_sources=False):
+    '''
+    Drops the channels of a mirror plan that can't be written because they're driven, with a warning
+    Args:
+        destinations, sources, signs: The plan from mirror_plan
+        driven_sources: If True, channels whose source is driven are dropped too
+    Returns: destinations, sources, signs without the driven channels
+    '''
+    driven_destinations = set(plug for plug, mplug in zip(destinations, get_mplugs(destinations)) if is_driven(mplug))
+    driven = set(driven_destinations)
+    if driven_sources:
+        unique_sources = sorted(set(sources))
+        driven.update(plug for plug, mplug in zip(unique_sources, get_mplugs(unique_sources)) if is_driven(mplug))
+    keep = [i for i, (destination, source) in enumerate(zip(destinations, sources))
+            if destination not in driven_destinations and not (driven_sources and source in driven)]
+    if len(keep) < len(destinations):
+        cmds.warning("Skipped driven channels {}".format(", ".join(sorted(driven))))
+
+    return [destinations[i] for i in keep], [sources[i] for i in keep], signs[keep]
+
+
+def keyed_times(plugs, frame_range):
+    '''
+    Collects every key time of some plugs inside a frame range
+    '''
+    curves = cmds.listConnections(plugs, source=True, destination=False, type="animCurve") or []
+    if not curves:
+        return []
+    times = cmds.keyframe(list(set(curves)), query=True, time=tuple(frame_range), timeChange=True) or []
+    return sorted(set(times))
+
+
+def _set_values(modifier, mplugs, values):
+    for mplug, value in zip(mplugs, values):
+        if _is_integer(mplug):
+            modifier.newPlugValueInt(mplug, int(round(value)))
+        else:
+            modifier.newPlugValueDouble(mplug, value)
+
+
+def _key_values(modifier, curve_change, mplugs, times, frames):
+    # Every destination gets a curve first, plugs that aren't keyed yet get a new one connected by the modifier
+    curve_fns = []
+    for mplug in mplugs:
+        curve_fn = get_time_curve(mplug)
+        if curve_fn is None:
+            curve_fn = OpenMayaAnim.MFnAnimCurve()
+            curve_fn.create(mplug, modifier)
+        curve_fns.append(curve_fn)
+    modifier.doIt()
+
+    for curve_fn, values in zip(curve_fns, frames.T.tolist()):
+        new_times = []
+        new_values = []
+        for time, value in zip(times, values):
+            index = curve_fn.find(time)
+            if index is None:
+                new_times.append(time)
+                new_values.append(value)
+            else:
+                curve_fn.setValue(index, value, curve_change)
+        if new_times:
+            curve_fn.addKeys(new_times, new_values, OpenMayaAnim.MFnAnimCurve.kTangentGlobal,
+                             OpenMayaAnim.MFnAnimCurve.kTangentGlobal, True, curve_change)
+
+
+def mirror(rig=None, controls=None, direction="flip", frame_range=None, rules=DEFAULT_RULES, pair_signs=None,
+           center_signs=None):
+    '''
+    Mirrors or flips a rig's pose on the current frame, or its keys across a frame range. Values are read through
+    the API, mirrored as arrays and written with one undoable command, the current time never changes.
+    Args:
+        rig: The rig's top node, every control under it is mirrored using the pairing table cached on it
+        controls: The controls to mirror instead of a whole rig, they are paired on the fly
+        direction: "flip" swaps both sides, "left" copies the left side onto the right and "right" the other way
+        frame_range: (start, end) to mirror every keyed frame in the range instead of the current frame
+        rules: (left, right) name token pairs
+        pair_signs: Channel name -> sign for values moving between paired controls
+        center_signs: Channel name -> sign for center controls
+    Returns: The number of values written
+    '''
+    if controls is not None:
+        table = build_pairing_table([str(control) for control in controls], rules)
+    elif rig is not None:
+        table = get_pairing_table(rig, rules=rules)
+    else:
+        raise RuntimeError("Give a rig or some controls to mirror")
+    if table["unpaired"]:
+        cmds.warning("No other side for {}".format(", ".join(table["unpaired"])))
+
+    destinations, sources, signs = drop_driven(*mirror_plan(table, direction, pair_signs, center_signs))
+    if not destinations:
+        return 0
+    destination_mplugs = get_mplugs(destinations)
+
+    source_plugs = sorted(set(sources))
+    source_index = dict((plug, i) for i, plug in enumerate(source_plugs))
+    gather = numpy.array([source_index[plug] for plug in sources], dtype=int)
+    source_mplugs = get_mplugs(source_plugs)
+
+    # Internal units in and out, swapping or negating a value doesn't depend on its unit
+    if frame_range is None:
+        mirrored = read_values(source_mplugs, ui_units=False)[gather] * signs
+
+        def edit(modifier, curve_change):
+            _set_values(modifier, destination_mplugs, mirrored.tolist())
+            modifier.doIt()
+
+        apply_edits(edit)
+        return len(destination_mplugs)
+
+    # Every frame is read before anything is written, new keys would change what later frames evaluate to
+    times = [OpenMaya.MTime(time, OpenMaya.MTime.uiUnit())
+             for time in keyed_times(source_plugs + destinations, frame_range)]
+    if not times:
+        return 0
+    frames = read_range(source_plugs, source_mplugs, times)[:, gather] * signs
+    apply_edits(lambda modifier, curve_change: _key_values(modifier, curve_change, destination_mplugs, times, frames))
+
+    return frames.size
+
+
+def mirror_curves(rig=None, controls=None, direction="flip", rules=DEFAULT_RULES, pair_signs=None, center_signs=None):
+    '''
+    Mirrors or flips whole clips by moving animCurves between the paired controls. Flipping reconnects the existing
+    curves, mirroring one side onto the other duplicates them, and negated channels are scaled by -1 around 0 which
+    flips the key values and tangents together. Key times and tangents are never resampled, so the result is exact.
+    Args:
+        rig: The rig's top node, every control under it is mirrored using the pairing table cached on it
+        controls: The controls to mirror instead of a whole rig, they are paired on the fly
+        direction: "flip" swaps both sides, "left" copies the left side onto the right and "right" the other way
+        rules: (left, right) name token pairs
+        pair_signs: Channel name -> sign for values moving between paired controls
+        center_signs: Channel name -> sign for center controls
+    Returns: The animCurves now connected to the mirrored channels
+    '''
+    if controls is not None:
+        table = build_pairing_table([str(control) for control in controls], rules)
+    elif rig is not None:
+        table = get_pairing_table(rig, rules=rules)
+    else:
+        raise RuntimeError("Give a rig or some controls to mirror")
+    if table["unpaired"]:
+        cmds.warning("No other side for {}".format(", ".join(table["unpaired"])))
+
+    # Only curves are moved, so a channel is left alone when either side is driven by something else
+    destinations, sources, signs = drop_driven(*mirror_plan(table, direction, pair_signs, center_signs),
+                                               driven_sources=True)
+    if not destinations:
+        return []
+
+    # One connection query per control finds every curve, plugs without one mirror their static value
+    nodes = set(plug.split(".")[0] for plug in destinations + sources)
+    curves = {}
+    for node in nodes:
+        for curve, attribute in key_transfer.get_anim_curves(node):
+            curves["{}.{}".format(node, attribute)] = curve
+    static_plugs = sorted(set(plug for plug in sources if plug not in curves))
+    static_values = dict(zip(static_plugs, read_values(get_mplugs(static_plugs)).tolist())) if static_plugs else {}
+
+    cmds.undoInfo(openChunk=True, chunkName="mirror_curves")
+    try:
+        # A curve is needed once per sign it's mirrored with, a curve fanned out to several channels only once.
+        # Flipping hands every curve to the other side so its first use can be moved, otherwise it's copied.
+        uses = list(collections.OrderedDict.fromkeys((curves[source], sign) for source, sign in
+                                                     zip(sources, signs.tolist()) if source in curves))
+        new_curve_for = {}
+        if direction == "flip":
+            for curve, sign in uses:
+                if curve not in new_curve_for.values():
+                    new_curve_for[(curve, sign)] = curve
+        to_copy = [use for use in uses if use not in new_curve_for]
+        while to_copy:
+            # duplicate_curves copies each curve once, a curve needed with both signs takes a second pass
+            batch = []
+            for curve, sign in to_copy:
+                if curve not in [batch_curve for batch_curve, _ in batch]:
+                    batch.append((curve, sign))
+            copies = key_transfer.duplicate_curves([curve for curve, _ in batch])
+            for curve, sign in batch:
+                new_curve_for[(curve, sign)] = copies[curve]
+            to_copy = [use for use in to_copy if use not in new_curve_for]
+        new_curves = [new_curve_for[(curves[source], sign)] if source in curves else None
+                      for source, sign in zip(sources, signs.tolist())]
+
+        moved = set(new_curves)
+        old_curves = [curves[plug] for plug in destinations if plug in curves]
+        for plug in destinations:
+            if plug in curves:
+                cmds.disconnectAttr("{}.output".format(curves[plug]), plug)
+        unused = [curve for curve in set(old_curves) if curve not in moved]
+        if unused:
+            cmds.delete(unused)
+
+        negated = [new_curve_for[(curve, sign)] for curve, sign in uses if sign < 0]
+        if negated:
+            cmds.scaleKey(negated, valueScale=-1, valuePivot=0)
+
+        # Curves are renamed after their new plug, through a temporary name first so a swapped pair doesn't clash
+        result = []
+        for destination, source, curve, sign in zip(destinations, sources, new_curves, signs.tolist()):
+            if curve is None:
+                cmds.setAttr(destination, static_values[source] * sign)
+                continue
+            cmds.connectAttr("{}.output".format(curve), destination, force=True)
+        for curve in collections.OrderedDict.fromkeys(curve for curve in new_curves if curve):
+            result.append(cmds.rename(curve, "mirrorCurve#"))
+        for i, curve in enumerate(result):
+            node, _, attribute = cmds.listConnections("{}.output".format(curve), plugs=True)[0].partition(".")
+            result[i] = cmds.rename(curve, "{}_{}".format(node.split(":")[-1], attribute))
+        return result
+    finally:
+        cmds.undoInfo(closeChunk=True)
+
+
+def mirror_selected(direction="flip", frame_range=None, curves=False):
+    '''
+    Mirrors the selected controls and their other sides, like the old L_/R_ foot and FK swaps did
+    Args:
+        direction: "flip", "left" or "right", see mirror
+        frame_range: (start, end) to mirror every keyed frame in the range instead of the current frame
+        curves: If True, the whole animation is mirrored at the curve level with mirror_curves
+    '''
+    selected = [control.name() for control in pm.selected()]
+    others = [mirror_name(control) for control in selected]
+    controls = selected + [other for other in others if other and cmds.objExists(other)]
+    if curves:
+        return mirror_curves(controls=controls, direction=direction)
+    return mirror(controls=controls, direction=direction, frame_range=frame_range)
+
+
+if __name__ == "__main__":
+    mirror_selected()
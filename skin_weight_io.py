@@ -0,0 +1,775 @@
+####Skin Weight Files####
+# Reads and writes skin weights in a compact sparse binary format. Nothing in here needs Maya, the Maya side lives in
+# import_export_weights.
+#
+# File layout:
+#   b"SKW1" | uint32 header size | JSON header | blocks | positions (optional)
+# Each block holds the weights of up to block_size consecutive vertices as three little endian arrays:
+#   counts (uint16, one per vertex) | influence indices (uint16, one per weight) | weights (float32, one per weight)
+# and is optionally zlib compressed. The header lists the influences and the offset/size of every block, offsets
+# are relative to the end of the header. Positions are the world space float32 xyz of every vertex, used to transfer
+# weights to a mesh whose topology has changed.
+import collections
+import concurrent.futures
+import contextlib
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+import time
+import zlib
+
+import numpy
+
+try:
+    from scipy import spatial
+except ImportError:
+    spatial = None
+
+MAGIC = b"SKW1"
+FORMAT_VERSION = 1
+COUNT_DTYPE = numpy.dtype("<u2")
+INDEX_DTYPE = numpy.dtype("<u2")
+WEIGHT_DTYPE = numpy.dtype("<f4")
+# The index of every weight file in a data directory: mesh name -> versions -> file, vertex count and topology hash
+INDEX_NAME = "weights_index.json"
+
+
+def encode_block(weights, threshold=1e-6, compress=True):
+    '''
+    Encodes the dense weights of a run of vertices as one sparse block
+    Args:
+        weights: A (vertices, influences) array
+        threshold: Weights at or below this are dropped
+        compress: If True, the block is zlib compressed
+    Returns:
+        data, nonzero: The block bytes and the number of weights stored
+    '''
+    weights = numpy.asarray(weights)
+    mask = weights > threshold
+    counts = mask.sum(axis=1).astype(COUNT_DTYPE)
+    # nonzero walks the mask row by row, so the weights of each vertex stay together
+    indices = numpy.nonzero(mask)[1].astype(INDEX_DTYPE)
+    values = weights[mask].astype(WEIGHT_DTYPE)
+
+    data = counts.tobytes() + indices.tobytes() + values.tobytes()
+    if compress:
+        data = zlib.compress(data, 1)
+
+    return data, len(values)
+
+
+def decode_block(data, vertices, nonzero, compressed=True):
+    '''
+    Decodes a block written by encode_block
+    Args:
+        data: The block bytes (bytes, memoryview or an mmap slice)
+        vertices: The number of vertices in the block
+        nonzero: The number of weights stored in the block
+        compressed: If True, the block is zlib compressed
+    Returns:
+        counts, indices, values: The per vertex weight counts, the influence index and the value of every weight
+    '''
+    if compressed:
+        data = zlib.decompress(data)
+
+    counts = numpy.frombuffer(data, COUNT_DTYPE, vertices)
+    offset = vertices * COUNT_DTYPE.itemsize
+    indices = numpy.frombuffer(data, INDEX_DTYPE, nonzero, offset)
+    offset += nonzero * INDEX_DTYPE.itemsize
+    values = numpy.frombuffer(data, WEIGHT_DTYPE, nonzero, offset)
+
+    return counts, indices, values
+
+
+def densify(counts, indices, values, influence_count):
+    '''
+    Expands a decoded block back to a (vertices, influences) array. Weights that land in the same column are summed,
+    which happens when a lookup maps two file influences to one target influence.
+    '''
+    rows = numpy.repeat(numpy.arange(len(counts)), counts)
+    dense = numpy.zeros((len(counts), influence_count), dtype=float)
+    numpy.add.at(dense, (rows, indices), values)
+    return dense
+
+
+def write_weights(path, weights, influences, block_size=4096, threshold=1e-6, compress=True, metadata=None,
+                  positions=None):
+    '''
+    Writes the skin weights of a mesh
+    Args:
+        path: The file to write
+        weights: A (vertices, influences) array, or anything that reshapes to one like a flat MDoubleArray
+        influences: The influence names, in column order
+        block_size: The number of vertices per block
+        threshold: Weights at or below this are dropped
+        compress: If True, each block is zlib compressed
+        metadata: Optional JSON serializable values stored in the header (mesh name, topology info...)
+        positions: Optional (vertices, 3) world space positions, needed to import by position
+    Returns:
+        header: The header that was written
+    '''
+    if len(influences) > numpy.iinfo(INDEX_DTYPE).max:
+        raise ValueError("Can't store more than {} influences".format(numpy.iinfo(INDEX_DTYPE).max))
+    weights = numpy.asarray(weights).reshape(-1, len(influences))
+
+    blocks = []
+    block_data = []
+    offset = 0
+    for start in range(0, len(weights), block_size):
+        data, nonzero = encode_block(weights[start:start + block_size], threshold, compress)
+        blocks.append({"offset": offset, "size": len(data), "vertices": min(block_size, len(weights) - start),
+                       "nonzero": nonzero})
+        block_data.append(data)
+        offset += len(data)
+
+    if positions is not None:
+        positions = numpy.asarray(positions, dtype=WEIGHT_DTYPE).reshape(-1, 3)
+        if len(positions) != len(weights):
+            raise ValueError("Got {} positions for {} vertices".format(len(positions), len(weights)))
+
+    header = dict(metadata or {})
+    header.update({"version": FORMAT_VERSION,
+                   "vertex_count": len(weights),
+                   "influences": [str(influence) for influence in influences],
+                   "compression": "zlib" if compress else None,
+                   "blocks": blocks})
+    if positions is not None:
+        header["positions"] = {"offset": offset, "size": positions.nbytes}
+    header_data = json.dumps(header, separators=(",", ":")).encode("utf-8")
+
+    with open(path, "wb") as weight_file:
+        weight_file.write(MAGIC)
+        weight_file.write(numpy.uint32(len(header_data)).astype("<u4").tobytes())
+        weight_file.write(header_data)
+        for data in block_data:
+            weight_file.write(data)
+        if positions is not None:
+            weight_file.write(positions.tobytes())
+
+    return header
+
+
+def read_header(weight_file):
+    '''
+    Reads the header of a weight file without touching its blocks
+    Args:
+        weight_file: An open binary file
+    Returns:
+        header: The header dictionary, "data_offset" is added with the file position the block offsets start from
+    '''
+    weight_file.seek(0)
+    if weight_file.read(len(MAGIC)) != MAGIC:
+        raise ValueError("{} is not a skin weight file".format(getattr(weight_file, "name", weight_file)))
+    header_size = int(numpy.frombuffer(weight_file.read(4), "<u4")[0])
+    header = json.loads(weight_file.read(header_size).decode("utf-8"))
+    if header["version"] > FORMAT_VERSION:
+        raise ValueError("Weight file version {} is newer than {}".format(header["version"], FORMAT_VERSION))
+    header["data_offset"] = len(MAGIC) + 4 + header_size
+
+    return header
+
+
+def read_weights(path):
+    '''
+    Reads a whole weight file into a dense array
+    Args:
+        path: The file to read
+    Returns:
+        header, weights: The header and a (vertices, influences) array
+    '''
+    with open(path, "rb") as weight_file:
+        header = read_header(weight_file)
+        influence_count = len(header["influences"])
+        compressed = header["compression"] == "zlib"
+        weights = []
+        for block in header["blocks"]:
+            weight_file.seek(header["data_offset"] + block["offset"])
+            decoded = decode_block(weight_file.read(block["size"]), block["vertices"], block["nonzero"], compressed)
+            weights.append(densify(*decoded, influence_count=influence_count))
+
+    return header, numpy.concatenate(weights) if weights else numpy.zeros((0, influence_count))
+
+
+@contextlib.contextmanager
+def open_weights(path):
+    '''
+    Memory maps a weight file so its blocks can be read without loading the file
+    Args:
+        path: The file to open
+    Returns:
+        header, data: The header and the mapped file
+    '''
+    with open(path, "rb") as weight_file:
+        header = read_header(weight_file)
+        data = mmap.mmap(weight_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield header, data
+        finally:
+            data.close()
+
+
+def block_weights(header, block, block_data, lookup=None, influence_count=None):
+    '''
+    Decodes one block of a weight file into dense weights
+    Args:
+        header: The file header
+        block: The block's entry in header["blocks"]
+        block_data: The block's bytes
+        lookup: An optional array mapping each file influence index to a target column (-1 to drop it), see
+        influence_lookup
+        influence_count: The number of target columns, the file's influence count if None
+    Returns: A (vertices, influences) array, rows whose every influence was dropped are left all zero
+    '''
+    if influence_count is None:
+        influence_count = len(header["influences"])
+    counts, indices, values = decode_block(block_data, block["vertices"], block["nonzero"],
+                                           header["compression"] == "zlib")
+    renormalize = False
+    if lookup is not None:
+        indices = lookup[indices]
+        keep = indices >= 0
+        if not keep.all():
+            rows = numpy.repeat(numpy.arange(len(counts)), counts)
+            counts = numpy.bincount(rows[keep], minlength=len(counts))
+            indices, values = indices[keep], values[keep]
+            renormalize = True
+
+    weights = densify(counts, indices, values, influence_count)
+    if renormalize:
+        # Dropped influences lose their weight, the rest of each vertex is scaled back up to 1
+        totals = weights.sum(axis=1, keepdims=True)
+        numpy.divide(weights, totals, out=weights, where=totals > 0)
+
+    return weights
+
+
+def _block_data(header, data):
+    # (first vertex, block, bytes) per block, the bytes are copied out of the map so they outlive it
+    start = 0
+    for block in header["blocks"]:
+        offset = header["data_offset"] + block["offset"]
+        yield start, block, data[offset:offset + block["size"]]
+        start += block["vertices"]
+
+
+def iter_blocks(header, data, lookup=None, influence_count=None):
+    '''
+    Streams the weights of a memory mapped file one block at a time, so memory use only depends on the block size
+    Args:
+        header: The header from open_weights
+        data: The mapped file from open_weights
+        lookup: An optional lookup from influence_lookup
+        influence_count: The number of target columns, the file's influence count if None
+    Returns:
+        A generator of (first vertex, (vertices, influences) array) per block
+    '''
+    for start, block, block_data in _block_data(header, data):
+        yield start, block_weights(header, block, block_data, lookup, influence_count)
+
+
+def short_name(name):
+    '''
+    Strips the DAG path and namespaces from a node name
+    '''
+    return name.split("|")[-1].split(":")[-1]
+
+
+def influence_lookup(source_influences, target_influences):
+    '''
+    Builds the table that maps the influence indices of a weight file to the columns of a target skinCluster. Names
+    are matched exactly first, then without DAG paths and namespaces.
+    Args:
+        source_influences: The influence names stored in the file
+        target_influences: The influence names of the target skinCluster, in column order
+    Returns:
+        lookup, missing: An int array with the target column of each source influence (-1 if it has none) and the
+        names of the source influences that couldn't be matched
+    '''
+    exact = dict((name, i) for i, name in enumerate(target_influences))
+    short = dict((short_name(name), i) for i, name in enumerate(target_influences))
+
+    lookup = numpy.full(len(source_influences), -1, dtype=numpy.int64)
+    missing = []
+    for i, name in enumerate(source_influences):
+        column = exact.get(name, short.get(short_name(name), -1))
+        lookup[i] = column
+        if column < 0:
+            missing.append(name)
+
+    return lookup, missing
+
+
+def topology_hash(face_counts, face_vertices):
+    '''
+    Hashes the face/vertex connectivity of a mesh, so weights are only reused on a mesh with the same topology
+    Args:
+        face_counts: The number of vertices of each face
+        face_vertices: The vertex indices of every face, back to back
+    Returns: A hex digest
+    '''
+    digest = hashlib.sha1(numpy.asarray(face_counts, dtype="<i4").tobytes())
+    digest.update(numpy.asarray(face_vertices, dtype="<i4").tobytes())
+    return digest.hexdigest()
+
+
+def load_index(data_dir):
+    '''
+    Reads the weight index of a data directory
+    Returns: The index dictionary, an empty one if the directory has no index yet
+    '''
+    path = os.path.join(data_dir, INDEX_NAME)
+    if not os.path.exists(path):
+        return {"version": FORMAT_VERSION, "meshes": {}}
+    with open(path) as index_file:
+        return json.load(index_file)
+
+
+def save_index(data_dir, index):
+    '''
+    Writes the weight index of a data directory. It's written next to the old one and swapped in, so a crash never
+    leaves a half written index behind.
+    '''
+    path = os.path.join(data_dir, INDEX_NAME)
+    temp_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(temp_path, "w") as index_file:
+        json.dump(index, index_file, indent=1, sort_keys=True)
+    os.replace(temp_path, path)
+
+
+def next_version(index, mesh_name):
+    '''
+    Gets the version number the next export of a mesh should use
+    '''
+    versions = index["meshes"].get(mesh_name, {})
+    return max(int(version) for version in versions) + 1 if versions else 1
+
+
+def add_to_index(index, mesh_name, version, file_name, vertex_count, mesh_topology_hash):
+    '''
+    Records a weight file in an index
+    Args:
+        index: The index dictionary from load_index
+        mesh_name: The mesh the weights belong to
+        version: The version number of the file
+        file_name: The file name, relative to the data directory
+        vertex_count: The vertex count of the mesh
+        mesh_topology_hash: The topology_hash of the mesh
+    '''
+    index["meshes"].setdefault(mesh_name, {})["{:03d}".format(version)] = {"file": file_name,
+                                                                         "vertex_count": vertex_count,
+                                                                         "topology_hash": mesh_topology_hash}
+
+
+def find_weights(index, mesh_name, vertex_count, mesh_topology_hash):
+    '''
+    Picks the latest weight file that was saved from the same topology
+    Args:
+        index: The index dictionary from load_index
+        mesh_name: The mesh to find weights for
+        vertex_count: The current vertex count of the mesh
+        mesh_topology_hash: The current topology_hash of the mesh
+    Returns:
+        entry, rejected: The index entry of the latest compatible file (None if there isn't one) and the versions
+        that were skipped because their topology doesn't match
+    '''
+    versions = index["meshes"].get(mesh_name, {})
+    rejected = []
+    for version in sorted(versions, key=int, reverse=True):
+        entry = versions[version]
+        if entry["vertex_count"] == vertex_count and entry.get("topology_hash") in (None, mesh_topology_hash):
+            return entry, rejected
+        rejected.append(version)
+
+    return None, rejected
+
+
+def rebuild_index(data_dir):
+    '''
+    Builds an index from the headers of the weight files in a data directory, for directories written before the
+    index existed. Only the headers are read.
+    Returns: The index dictionary, also saved to the data directory
+    '''
+    index = {"version": FORMAT_VERSION, "meshes": {}}
+    for file_name in sorted(os.listdir(data_dir)):
+        if not file_name.endswith(".skw"):
+            continue
+        with open(os.path.join(data_dir, file_name), "rb") as weight_file:
+            header = read_header(weight_file)
+        if "mesh" in header and "weight_version" in header:
+            add_to_index(index, header["mesh"], header["weight_version"], file_name, header["vertex_count"],
+                         header.get("topology_hash"))
+    save_index(data_dir, index)
+
+    return index
+
+
+def read_positions(header, data):
+    '''
+    Reads the vertex positions stored in a memory mapped weight file
+    Args:
+        header: The header from open_weights
+        data: The mapped file from open_weights
+    Returns: A (vertices, 3) array, None if the file was written without positions
+    '''
+    if "positions" not in header:
+        return None
+    offset = header["data_offset"] + header["positions"]["offset"]
+    data = data[offset:offset + header["positions"]["size"]]
+    return numpy.frombuffer(data, WEIGHT_DTYPE).reshape(-1, 3).astype(float)
+
+
+class GridIndex(object):
+    '''
+    A uniform grid over a point cloud for k nearest neighbor queries, used when scipy isn't available. Each query
+    point first searches the 27 cells around it, which is exact whenever its kth neighbor is within one cell size.
+    Points where it isn't (sparse regions) search twice as far until they are, points that are still unresolved
+    after max_reach cells (far off the source) are compared with every point.
+
+    One cell size can't suit a mesh with uneven density, so points in cells holding more than max_cell_points are
+    moved into a finer GridIndex of their own (up to max_depth levels) and queries merge the results of both.
+    Queries run in chunks of query_chunk points and each distance batch is kept under batch_elements candidates, so
+    memory stays bounded whatever the density.
+    '''
+    max_reach = 8
+    max_depth = 4
+    query_chunk = 512
+    batch_elements = 1 << 21
+
+    def __init__(self, points, points_per_cell=16, max_cell_points=256, _depth=0):
+        points = numpy.asarray(points, dtype=float).reshape(-1, 3)
+        self.size = len(points)
+        self.ids = numpy.arange(len(points))
+        self.dense = None
+        cells = self._build(points, points_per_cell)
+
+        crowded = (self.cell_count > max_cell_points)[cells]
+        if _depth < self.max_depth and crowded.any() and not crowded.all():
+            self.dense = GridIndex(points[crowded], points_per_cell, max_cell_points, _depth + 1)
+            self.dense_ids = numpy.flatnonzero(crowded)
+            self.dense_bounds = (points[crowded].min(axis=0), points[crowded].max(axis=0))
+            self.ids = numpy.flatnonzero(~crowded)
+            self._build(points[~crowded], points_per_cell)
+
+    def _build(self, points, points_per_cell):
+        self.points = points
+        self.minimum = points.min(axis=0)
+        extent = numpy.maximum(points.max(axis=0) - self.minimum, 1e-9)
+
+        # Aim for points_per_cell points per occupied cell, assuming the points lie roughly on a surface
+        area = sorted(extent)[1] * extent.max()
+        self.cell_size = max(numpy.sqrt(area * points_per_cell / len(points)), extent.max() / 256.0)
+        self.dims = numpy.floor(extent / self.cell_size).astype(numpy.int64) + 1
+
+        cells = self._cellIds(self._cellCoords(points))
+        self.order = numpy.argsort(cells, kind="stable")
+        sorted_cells = cells[self.order]
+        self.cell_start = numpy.searchsorted(sorted_cells, numpy.arange(self.dims.prod()))
+        self.cell_count = numpy.searchsorted(sorted_cells, numpy.arange(self.dims.prod()), side="right") - \
+            self.cell_start
+        return cells
+
+    def _cellCoords(self, points):
+        return numpy.floor((points - self.minimum) / self.cell_size).astype(numpy.int64)
+
+    def _cellIds(self, coords):
+        return (coords[..., 0] * self.dims[1] + coords[..., 1]) * self.dims[2] + coords[..., 2]
+
+    def _search(self, points, k, reach):
+        # The k nearest candidates within reach cells of each point, as squared distances and indices
+        steps = numpy.arange(-reach, reach + 1)
+        offsets = numpy.stack(numpy.meshgrid(steps, steps, steps, indexing="ij"), axis=-1).reshape(-1, 3)
+        coords = self._cellCoords(points)[:, None, :] + offsets[None, :, :]
+        valid = numpy.all((coords >= 0) & (coords < self.dims), axis=2)
+        cells = numpy.where(valid, self._cellIds(numpy.clip(coords, 0, self.dims - 1)), 0)
+        counts = numpy.where(valid, self.cell_count[cells], 0)
+
+        # Split the rows so no candidate array grows past batch_elements
+        rows_per_batch = max(self.batch_elements // max(int(counts.sum(axis=1).max()), k), 1)
+        if rows_per_batch >= len(points):
+            return self._candidates(points, cells, counts, k)
+        results = [self._candidates(points[start:start + rows_per_batch], cells[start:start + rows_per_batch],
+                                    counts[start:start + rows_per_batch], k)
+                   for start in range(0, len(points), rows_per_batch)]
+        return numpy.concatenate([r[0] for r in results]), numpy.concatenate([r[1] for r in results])
+
+    def _candidates(self, points, cells, counts, k):
+        # Lay every candidate of every query point out in one padded (N, most candidates) array
+        totals = counts.sum(axis=1)
+        width = max(int(totals.max()), k)
+        flat_counts = counts.ravel()
+        rows = numpy.repeat(numpy.arange(len(points)), totals)
+        within = numpy.arange(flat_counts.sum()) - numpy.repeat(numpy.cumsum(flat_counts) - flat_counts, flat_counts)
+        columns = numpy.repeat((numpy.cumsum(counts, axis=1) - counts).ravel(), flat_counts) + within
+        starts = numpy.repeat(self.cell_start[cells].ravel(), flat_counts)
+
+        candidates = numpy.full((len(points), width), -1, dtype=numpy.int64)
+        candidates[rows, columns] = self.order[starts + within]
+        distances = ((points[:, None, :] - self.points[numpy.maximum(candidates, 0)]) ** 2).sum(axis=2)
+        distances[candidates < 0] = numpy.inf
+
+        nearest = numpy.argpartition(distances, k - 1, axis=1)[:, :k]
+        return numpy.take_along_axis(distances, nearest, axis=1), numpy.take_along_axis(candidates, nearest, axis=1)
+
+    def _queryOwn(self, points, k):
+        # k nearest squared distances and local indices among this level's own points
+        distances = numpy.full((len(points), k), numpy.inf)
+        indices = numpy.zeros((len(points), k), dtype=numpy.int64)
+
+        for chunk_start in range(0, len(points), self.query_chunk):
+            pending = numpy.arange(chunk_start, min(chunk_start + self.query_chunk, len(points)))
+            reach = 1
+            while len(pending) and reach <= self.max_reach:
+                found_distances, found_indices = self._search(points[pending], k, reach)
+                # Anything further than reach cells away could have a closer point outside the searched cells
+                done = found_distances.max(axis=1) <= (reach * self.cell_size) ** 2
+                distances[pending[done]] = found_distances[done]
+                indices[pending[done]] = found_indices[done]
+                pending = pending[~done]
+                reach *= 2
+
+            rows_per_batch = max(self.batch_elements // len(self.points), 1)
+            for start in range(0, len(pending), rows_per_batch):
+                batch = pending[start:start + rows_per_batch]
+                all_distances = ((points[batch, None, :] - self.points[None, :, :]) ** 2).sum(axis=2)
+                nearest = numpy.argpartition(all_distances, k - 1, axis=1)[:, :k]
+                distances[batch] = numpy.take_along_axis(all_distances, nearest, axis=1)
+                indices[batch] = nearest
+
+        return distances, indices
+
+    def _querySquared(self, points, k):
+        # k nearest squared distances and indices into the points the index was built from, unsorted
+        own_k = min(k, len(self.points))
+        distances = numpy.full((len(points), k), numpy.inf)
+        indices = numpy.zeros((len(points), k), dtype=numpy.int64)
+        own_distances, own_indices = self._queryOwn(points, own_k)
+        distances[:, :own_k] = own_distances
+        indices[:, :own_k] = self.ids[own_indices]
+        if self.dense is None:
+            return distances, indices
+
+        # Only points whose kth neighbor so far is further than the crowded region can have a closer one in it
+        low, high = self.dense_bounds
+        gaps = (numpy.maximum(numpy.maximum(low - points, points - high), 0) ** 2).sum(axis=1)
+        near = numpy.flatnonzero(gaps <= distances.max(axis=1))
+        if len(near):
+            dense_distances, dense_indices = self.dense._querySquared(points[near], k)
+            merged_distances = numpy.concatenate([distances[near], dense_distances], axis=1)
+            merged_indices = numpy.concatenate([indices[near], self.dense_ids[dense_indices]], axis=1)
+            nearest = numpy.argpartition(merged_distances, k - 1, axis=1)[:, :k]
+            distances[near] = numpy.take_along_axis(merged_distances, nearest, axis=1)
+            indices[near] = numpy.take_along_axis(merged_indices, nearest, axis=1)
+
+        return distances, indices
+
+    def query(self, points, k=4):
+        '''
+        Finds the k nearest points
+        Args:
+            points: A (N, 3) array of query points
+            k: The number of neighbors
+        Returns:
+            distances, indices: (N, k) arrays sorted nearest first
+        '''
+        points = numpy.asarray(points, dtype=float).reshape(-1, 3)
+        k = min(k, self.size)
+        distances, indices = self._querySquared(points, k)
+
+        order = numpy.argsort(distances, axis=1)
+        return numpy.sqrt(numpy.take_along_axis(distances, order, axis=1)), numpy.take_along_axis(indices, order, axis=1)
+
+
+def nearest_neighbors(source_points, target_points, k=4, workers=None, chunk_size=4096):
+    '''
+    Finds the k nearest source points of every target point, with scipy's cKDTree if it's installed and a GridIndex
+    otherwise
+    Args:
+        source_points: A (S, 3) array
+        target_points: A (T, 3) array
+        k: The number of neighbors
+        workers: The number of threads, all cores if -1, a single thread if None
+        chunk_size: The number of target points queried at once by the grid
+    Returns:
+        distances, indices: (T, k) arrays sorted nearest first
+    '''
+    target_points = numpy.asarray(target_points, dtype=float).reshape(-1, 3)
+    k = min(k, len(source_points))
+    if spatial is not None:
+        tree = spatial.cKDTree(source_points)
+        try:
+            distances, indices = tree.query(target_points, k, workers=workers or 1)
+        except TypeError:
+            # scipy < 1.6 calls it n_jobs
+            distances, indices = tree.query(target_points, k, n_jobs=workers or 1)
+        return distances.reshape(len(target_points), k), indices.reshape(len(target_points), k)
+
+    grid = GridIndex(source_points)
+    chunks = (target_points[start:start + chunk_size] for start in range(0, len(target_points), chunk_size))
+    thread_count = os.cpu_count() if workers == -1 else (workers or 0)
+    results = list(imap_bounded(lambda chunk: grid.query(chunk, k), chunks, thread_count if thread_count > 1 else 0))
+    if not results:
+        return numpy.zeros((0, k)), numpy.zeros((0, k), dtype=numpy.int64)
+
+    return numpy.concatenate([r[0] for r in results]), numpy.concatenate([r[1] for r in results])
+
+
+def transfer_weights(source_points, source_weights, target_points, k=4, power=2.0, workers=None, chunk_size=4096):
+    '''
+    Transfers weights between meshes by position. Each target vertex blends the weights of its k nearest source
+    vertices by inverse distance, a target sitting on a source vertex takes its weights as they are.
+    Args:
+        source_points: The (S, 3) positions the weights were saved with
+        source_weights: A (S, influences) array
+        target_points: The (T, 3) positions to transfer to
+        k: The number of source vertices blended per target vertex
+        power: The inverse distance falloff, higher values favour the nearest vertex more
+        workers: The number of threads for the neighbor search, all cores if -1
+        chunk_size: The number of target vertices blended at once, bounds the memory used
+    Returns: A (T, influences) array of normalized weights
+    '''
+    source_weights = numpy.asarray(source_weights)
+    distances, indices = nearest_neighbors(source_points, target_points, k, workers, chunk_size)
+
+    target_weights = numpy.zeros((len(distances), source_weights.shape[1]), dtype=float)
+    for start in range(0, len(distances), chunk_size):
+        chunk_distances = distances[start:start + chunk_size]
+        exact = chunk_distances[:, :1] < 1e-9
+        with numpy.errstate(divide="ignore"):
+            blend = numpy.where(exact, (chunk_distances < 1e-9).astype(float), 1.0 / chunk_distances ** power)
+        blend /= blend.sum(axis=1, keepdims=True)
+
+        chunk = numpy.einsum("tk,tki->ti", blend, source_weights[indices[start:start + chunk_size]])
+        totals = chunk.sum(axis=1, keepdims=True)
+        target_weights[start:start + chunk_size] = numpy.divide(chunk, totals, out=chunk, where=totals > 0)
+
+    return target_weights
+
+
+def imap_bounded(function, items, workers=None, window=None):
+    '''
+    Runs function over items on a thread pool and yields the results in order. Items are only pulled from the
+    iterable as slots free up, so a generator that reads from the scene is read just ahead of the workers and only
+    window results are ever held in memory. zlib, numpy and file I/O release the GIL, so threads scale for encoding,
+    decoding, reading and writing.
+    Args:
+        function: Called with each item
+        items: An iterable of items, only iterated on the calling thread
+        workers: The number of threads, a thread per core if None, 0 runs everything on the calling thread
+        window: The most results to hold at once, twice the worker count if None
+    '''
+    if workers == 0:
+        for item in items:
+            yield function(item)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    window = window or workers * 2
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = collections.deque()
+        for item in items:
+            pending.append(executor.submit(function, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _write_job(job):
+    return job["path"], write_weights(job["path"], job["weights"], job["influences"], compress=job.get("compress", True),
+                                      metadata=job.get("metadata"), positions=job.get("positions"))
+
+
+def write_many(jobs, workers=None):
+    '''
+    Writes many weight files in parallel
+    Args:
+        jobs: An iterable of dictionaries with the write_weights arguments "path", "weights", "influences" and
+        optionally "compress", "metadata" and "positions"
+        workers: The number of threads, see imap_bounded
+    Returns: A generator of (path, header) per job, in order
+    '''
+    return imap_bounded(_write_job, jobs, workers)
+
+
+def read_many(jobs, workers=None):
+    '''
+    Reads and decodes many weight files in parallel, block by block. The main thread reads each block's bytes and
+    the pool decodes them, so only about twice the worker count of blocks are ever decoded at once whatever the
+    size of the meshes.
+    Args:
+        jobs: An iterable of (path, lookup, influence_count) tuples, see iter_blocks
+        workers: The number of threads, see imap_bounded
+    Returns: A generator of (job index, first vertex, (vertices, influences) array) per block, in file order
+    '''
+    def blocks():
+        for job_index, (path, lookup, influence_count) in enumerate(jobs):
+            with open_weights(path) as (header, data):
+                for start, block, block_data in _block_data(header, data):
+                    yield job_index, start, header, block, block_data, lookup, influence_count
+
+    def decode(item):
+        job_index, start, header, block, block_data, lookup, influence_count = item
+        return job_index, start, block_weights(header, block, block_data, lookup, influence_count)
+
+    return imap_bounded(decode, blocks(), workers)
+
+
+def synthetic_weights(vertex_count, influence_count, per_vertex=4, seed=0):
+    '''
+    Makes a normalized weight array with per_vertex random influences per vertex, like a typical skinned mesh
+    '''
+    random = numpy.random.RandomState(seed)
+    weights = numpy.zeros((vertex_count, influence_count), dtype=numpy.float32)
+    values = random.random_sample((vertex_count, per_vertex)).astype(numpy.float32)
+    columns = numpy.argpartition(random.random_sample((vertex_count, influence_count)), per_vertex, axis=1)
+    columns = columns[:, :per_vertex]
+    numpy.put_along_axis(weights, columns, values / values.sum(axis=1, keepdims=True), axis=1)
+    return weights
+
+
+def benchmark(mesh_count=150, vertex_range=(500, 20000), influence_count=100, workers=None, seed=0):
+    '''
+    Times exporting and importing a synthetic character, serially and on a thread pool, without Maya
+    Args:
+        mesh_count: The number of meshes
+        vertex_range: The smallest and largest vertex count of a mesh
+        influence_count: The number of influences per mesh
+        workers: The thread count of the parallel runs, a thread per core if None
+        seed: The random seed of the dataset
+    Returns: A dictionary of timings in seconds plus the dataset and file sizes
+    '''
+    random = numpy.random.RandomState(seed)
+    vertex_counts = random.randint(vertex_range[0], vertex_range[1], mesh_count)
+    meshes = [synthetic_weights(count, influence_count, seed=seed + i) for i, count in enumerate(vertex_counts)]
+    influences = ["joint_{:03d}".format(i) for i in range(influence_count)]
+
+    results = {"meshes": mesh_count, "vertices": int(vertex_counts.sum()), "workers": workers or os.cpu_count()}
+    data_dir = tempfile.mkdtemp(prefix="skin_weight_benchmark_")
+    try:
+        for label, thread_count in (("serial", 0), ("parallel", workers)):
+            jobs = ({"path": os.path.join(data_dir, "mesh{:03d}_{}.skw".format(i, label)), "weights": weights,
+                     "influences": influences} for i, weights in enumerate(meshes))
+            start = time.time()
+            paths = [path for path, _ in write_many(jobs, thread_count)]
+            results["export_{}".format(label)] = time.time() - start
+
+            start = time.time()
+            for _ in read_many(((path, None, None) for path in paths), thread_count):
+                pass
+            results["import_{}".format(label)] = time.time() - start
+
+        results["file_mb"] = sum(os.path.getsize(path) for path in paths) / 1e6
+        results["dense_mb"] = sum(weights.nbytes for weights in meshes) / 1e6
+    finally:
+        for file_name in os.listdir(data_dir):
+            os.remove(os.path.join(data_dir, file_name))
+        os.rmdir(data_dir)
+
+    return results
+
+
+if __name__ == "__main__":
+    for key, value in sorted(benchmark().items()):
+        print("{}: {}".format(key, round(value, 3) if isinstance(value, float) else value))
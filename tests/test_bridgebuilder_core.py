@@ -0,0 +1,264 @@
+import random
+
+import numpy
+import pytest
+
+import bridgebuilder.bridgebuilder_core as bridgebuilder_core
+
+
+def ropeNames(span_count, name="left_rope_Main"):
+    ctrl_joints = ["{}_{:02d}_CTRL_JNT".format(name, index) for index in range(span_count)]
+    locators = ["{}_{:02d}_LOC".format(name, index) for index in range(span_count)]
+    return ctrl_joints, locators
+
+
+def test_span_centers_of_cylinder():
+    # Two unit circle loops of 4 vertices at x = 0 and x = 5, plus a leftover cap vertex that isn't a full span
+    circle = [(0, 1, 0), (0, 0, 1), (0, -1, 0), (0, 0, -1)]
+    positions = [(x, y, z) for x in (0.0, 5.0) for _, y, z in circle] + [(9.0, 9.0, 9.0)]
+
+    centers = bridgebuilder_core.spanCenters(numpy.ravel(positions), 4)
+
+    numpy.testing.assert_allclose(centers, [(0, 0, 0), (5, 0, 0)], atol=1e-12)
+
+
+def test_span_centers_bad_span_size_raises():
+    with pytest.raises(ValueError):
+        bridgebuilder_core.spanCenters([(0, 0, 0)], 0)
+
+
+def test_group_centers_uneven_groups():
+    positions = [(0, 0, 0), (2, 0, 0), (0, 3, 0), (0, 0, 3), (0, 0, 0), (1, 1, 1)]
+
+    centers = bridgebuilder_core.groupCenters(positions, [2, 1, 3])
+
+    numpy.testing.assert_allclose(centers, [(1, 0, 0), (0, 3, 0), (1 / 3.0, 1 / 3.0, 4 / 3.0)])
+    assert bridgebuilder_core.groupCenters([], []).shape == (0, 3)
+
+
+def test_group_centers_bad_counts_raise():
+    with pytest.raises(ValueError):
+        bridgebuilder_core.groupCenters([(0, 0, 0), (1, 1, 1)], [3])
+    with pytest.raises(ValueError):
+        bridgebuilder_core.groupCenters([(0, 0, 0), (1, 1, 1)], [2, 0])
+
+
+def test_unique_surface_cvs_trims_periodic_overlap():
+    # A surface periodic in V with degree 3: 4 unique CVs per row repeated as 7, and 5 open rows in U
+    rows = [[(u, numpy.cos(a), numpy.sin(a)) for a in numpy.linspace(0, 2 * numpy.pi, 4, endpoint=False)]
+            for u in range(5)]
+    cv_positions = [row + row[:3] for row in rows]
+
+    positions = bridgebuilder_core.uniqueSurfaceCVs(numpy.ravel(cv_positions), 5, 7, overlap_v=3)
+
+    numpy.testing.assert_allclose(positions, numpy.reshape(rows, (-1, 3)))
+    numpy.testing.assert_allclose(bridgebuilder_core.spanCenters(positions, 4), [(u, 0, 0) for u in range(5)],
+                                  atol=1e-12)
+    with pytest.raises(ValueError):
+        bridgebuilder_core.uniqueSurfaceCVs(numpy.ravel(cv_positions), 5, 6)
+
+
+def test_trailing_index_any_width():
+    assert bridgebuilder_core.trailingIndex("left_rope_Main_07_CTRL_JNT", "_CTRL") == 7
+    assert bridgebuilder_core.trailingIndex("left_rope_Main_12_CTRL_JNT", "_CTRL") == 12
+    assert bridgebuilder_core.trailingIndex("left_rope_Main_1234_LOC", "_LOC") == 1234
+    assert bridgebuilder_core.trailingIndex("left_rope_Main_CTRL_JNT", "_CTRL") is None
+
+
+def test_match_1000_spans_shuffled():
+    ctrl_joints, locators = ropeNames(1000)
+    shuffled = random.Random(0)
+    shuffled.shuffle(ctrl_joints)
+    shuffled.shuffle(locators)
+
+    pairs = bridgebuilder_core.matchControlsToLocators(ctrl_joints, locators, strict=True)
+
+    assert [locator for locator, _ in pairs] == locators
+    for locator, ctrl_joint in pairs:
+        assert ctrl_joint == locator.replace("_LOC", "_CTRL_JNT")
+
+
+def test_match_multi_digit_indices():
+    ctrl_joints = ["rope_span_10_CTRL_JNT", "rope_span_9_CTRL_JNT", "rope_span_100_CTRL_JNT"]
+    locators = ["rope_span_9_LOC", "rope_span_10_LOC", "rope_span_100_LOC"]
+
+    pairs = bridgebuilder_core.matchControlsToLocators(ctrl_joints, locators, strict=True)
+
+    assert pairs == [("rope_span_9_LOC", "rope_span_9_CTRL_JNT"),
+                     ("rope_span_10_LOC", "rope_span_10_CTRL_JNT"),
+                     ("rope_span_100_LOC", "rope_span_100_CTRL_JNT")]
+
+
+def test_match_skips_locators_without_control():
+    ctrl_joints, locators = ropeNames(10)
+
+    pairs = bridgebuilder_core.matchControlsToLocators(ctrl_joints[0::2], locators)
+
+    assert [locator for locator, _ in pairs] == locators[0::2]
+
+
+def test_match_mismatched_count_raises():
+    ctrl_joints, locators = ropeNames(1000)
+
+    with pytest.raises(ValueError):
+        bridgebuilder_core.matchControlsToLocators(ctrl_joints[:-1], locators, strict=True)
+
+
+def test_match_unpaired_locator_raises():
+    ctrl_joints, locators = ropeNames(5)
+    locators[2] = "left_rope_Main_99_LOC"
+
+    with pytest.raises(ValueError):
+        bridgebuilder_core.matchControlsToLocators(ctrl_joints, locators, strict=True)
+
+
+def straightCurve(num_cvs=7, length=6.0):
+    # Evenly spaced CVs along X give a straight, clamped, degree 3 curve that is symmetric about its middle
+    cvs = [(x, 0.0, 0.0) for x in numpy.linspace(0, length, num_cvs)]
+    return cvs, bridgebuilder_core.fullKnots(bridgebuilder_core.uniformKnots(num_cvs)), 3
+
+
+def test_uniform_knots_match_maya():
+    assert bridgebuilder_core.uniformKnots(4) == [0, 0, 0, 1, 1, 1]
+    assert bridgebuilder_core.uniformKnots(6) == [0, 0, 0, 1, 2, 3, 3, 3]
+    assert bridgebuilder_core.fullKnots([0, 0, 0, 1, 1, 1]) == [0, 0, 0, 0, 1, 1, 1, 1]
+    with pytest.raises(ValueError):
+        bridgebuilder_core.uniformKnots(3)
+
+
+def test_clamped_endpoints():
+    cvs, knots, degree = straightCurve()
+    spans = knots[len(cvs)]
+
+    numpy.testing.assert_allclose(bridgebuilder_core.evaluateBSpline(cvs, knots, degree, 0.0), cvs[0])
+    numpy.testing.assert_allclose(bridgebuilder_core.evaluateBSpline(cvs, knots, degree, spans), cvs[-1])
+    # Parameters outside of the domain are clamped to the ends
+    numpy.testing.assert_allclose(bridgebuilder_core.evaluateBSplines(cvs, knots, degree, [-1.0, spans + 1.0]),
+                                  [cvs[0], cvs[-1]])
+
+
+def test_vectorized_evaluation_matches_de_boor():
+    cvs = [(0, 0, 0), (1, 2, 0), (3, 2, 1), (4, 0, 1), (6, -1, 0), (7, 1, 2)]
+    knots = bridgebuilder_core.fullKnots(bridgebuilder_core.uniformKnots(len(cvs)))
+    params = numpy.linspace(0, knots[len(cvs)], 25)
+
+    points = bridgebuilder_core.evaluateBSplines(cvs, knots, 3, params)
+
+    numpy.testing.assert_allclose(points, [bridgebuilder_core.evaluateBSpline(cvs, knots, 3, p) for p in params],
+                                  atol=1e-12)
+
+
+def test_derivative_curve_matches_finite_differences():
+    cvs = [(0, 0, 0), (1, 2, 0), (3, 2, 1), (4, 0, 1), (6, -1, 0), (7, 1, 2)]
+    knots = bridgebuilder_core.fullKnots(bridgebuilder_core.uniformKnots(len(cvs)))
+    derivative = bridgebuilder_core.derivativeCurve(cvs, knots, 3)
+    params = numpy.linspace(0.01, knots[len(cvs)] - 0.01, 15)
+    step = 1e-6
+
+    tangents = bridgebuilder_core.evaluateBSplines(*(derivative + (params,)))
+    expected = (bridgebuilder_core.evaluateBSplines(cvs, knots, 3, params + step) -
+                bridgebuilder_core.evaluateBSplines(cvs, knots, 3, params - step)) / (2 * step)
+
+    assert derivative[2] == 2
+    numpy.testing.assert_allclose(tangents, expected, atol=1e-6)
+    # A clamped curve leaves its first CV along the first leg of the hull
+    start_tangent = bridgebuilder_core.evaluateBSplines(*(derivative + ([0.0],)))[0]
+    numpy.testing.assert_allclose(start_tangent, 3 * (numpy.array(cvs[1]) - numpy.array(cvs[0])))
+
+
+def test_arc_length_fractions_are_linear_on_a_line():
+    cvs, knots, degree = straightCurve(length=6.0)
+    table = bridgebuilder_core.ArcLengthTable(cvs, knots, degree)
+    xs = numpy.linspace(0, 6.0, 13)
+
+    fractions = table.fractions([(x, 1.0, 0.0) for x in xs])
+
+    assert table.total_length == pytest.approx(6.0)
+    numpy.testing.assert_allclose(fractions, xs / 6.0, atol=1e-9)
+    # Points past the ends snap to the clamped endpoints
+    numpy.testing.assert_allclose(table.fractions([(-2.0, 0, 0), (9.0, 0, 0)]), [0.0, 1.0])
+
+
+def test_closest_param_at_symmetric_midpoint():
+    cvs, knots, degree = straightCurve()
+    spans = knots[len(cvs)]
+    solver = bridgebuilder_core.ClosestParamSolver(cvs, knots, degree)
+
+    params = solver.solve([(3.0, 1.0, 0.0), (3.0, 0.0, -5.0), (-1.0, 0.0, 0.0), (8.0, 2.0, 0.0)])
+
+    numpy.testing.assert_allclose(params, [spans / 2.0, spans / 2.0, 0.0, spans], atol=1e-9)
+
+
+def test_closest_param_matches_brute_force():
+    cvs = [(0, 0, 0), (2, 3, 0), (4, -1, 1), (6, 2, 0), (8, 0, -1), (10, 1, 0)]
+    knots = bridgebuilder_core.fullKnots(bridgebuilder_core.uniformKnots(len(cvs)))
+    solver = bridgebuilder_core.ClosestParamSolver(cvs, knots, 3)
+    points = numpy.random.RandomState(0).uniform((0, -1, -1), (10, 2, 1), (50, 3))
+
+    params = solver.solve(points)
+
+    dense = numpy.linspace(0, knots[len(cvs)], 20001)
+    samples = bridgebuilder_core.evaluateBSplines(cvs, knots, 3, dense)
+    closest = numpy.sum((points[:, None, :] - samples[None, :, :]) ** 2, axis=2).min(axis=1)
+    solved = numpy.sum((bridgebuilder_core.evaluateBSplines(cvs, knots, 3, params) - points) ** 2, axis=1)
+    numpy.testing.assert_allclose(solved, closest, atol=1e-6)
+
+
+def test_motion_path_rotations():
+    tangents = [(1, 0, 0), (0, 0, -1), (1, 1, 0), (-2, 0, 0)]
+
+    rotations = bridgebuilder_core.motionPathRotations(tangents)
+
+    numpy.testing.assert_allclose(rotations[:3], [(0, 0, 0), (0, 90, 0), (0, 0, 45)], atol=1e-9)
+    # Whatever euler solution comes out for the flipped tangent, it has to point the front axis down -X
+    ry, rz = numpy.radians(rotations[3, 1]), numpy.radians(rotations[3, 2])
+    front = (numpy.cos(ry) * numpy.cos(rz), numpy.cos(ry) * numpy.sin(rz), -numpy.sin(ry))
+    numpy.testing.assert_allclose(front, (-1, 0, 0), atol=1e-9)
+
+
+def test_closest_param_seeds_match_nearest_sample():
+    # A long rope that doubles back on itself, so the grid has many cells and neighbouring cells hold far params
+    angles = numpy.linspace(0, 6 * numpy.pi, 40)
+    cvs = numpy.stack([angles, 3 * numpy.sin(angles), numpy.cos(angles)], axis=1)
+    knots = bridgebuilder_core.fullKnots(bridgebuilder_core.uniformKnots(len(cvs)))
+    solver = bridgebuilder_core.ClosestParamSolver(cvs, knots, 3)
+    random_state = numpy.random.RandomState(2)
+    inside = cvs[random_state.randint(len(cvs), size=200)] + random_state.normal(0, 0.5, (200, 3))
+    outside = numpy.array([(-50.0, 0, 0), (100.0, 20.0, -5.0)])
+    points = numpy.concatenate([inside, outside])
+
+    seeds = solver.seedParams(points)
+
+    distances = numpy.sum((points[:, None, :] - solver.sample_points[None, :, :]) ** 2, axis=2)
+    expected = solver.sample_params[numpy.argmin(distances, axis=1)]
+    numpy.testing.assert_array_equal(seeds, expected)
+    numpy.testing.assert_allclose(solver.solve(outside), [0.0, knots[len(cvs)]], atol=1e-9)
+
+
+def supportPositions(span_count, verts_in_span=4):
+    # A straight support cylinder along X with a span every unit, so control joint i sits at x = 2 * i
+    angles = numpy.linspace(0, 2 * numpy.pi, verts_in_span, endpoint=False)
+    loops = [numpy.stack([numpy.full(verts_in_span, float(x)), numpy.cos(angles), numpy.sin(angles)], 1)
+             for x in range(span_count)]
+    return numpy.concatenate(loops)
+
+
+def test_support_chain_matches_build_support():
+    assert bridgebuilder_core.supportChain(5) == (0, 2, 4)
+    assert bridgebuilder_core.supportChain(7) == (0, 4, 6)
+    assert bridgebuilder_core.supportChain(9) == (0, 4, 8)
+    with pytest.raises(ValueError):
+        bridgebuilder_core.supportChain(4)
+
+
+@pytest.mark.parametrize("span_count, ik_lengths", [(9, [4.0, 4.0]), (13, [8.0, 4.0])])
+def test_support_rope_ik_lengths(span_count, ik_lengths):
+    geometry = bridgebuilder_core.supportRopeGeometry(supportPositions(span_count), 4)
+
+    numpy.testing.assert_allclose(geometry["centers"][:, 0], numpy.arange(span_count), atol=1e-12)
+    numpy.testing.assert_allclose(geometry["ik_lengths"], ik_lengths)
+
+
+def test_support_rope_too_few_controls_raises():
+    with pytest.raises(ValueError):
+        bridgebuilder_core.supportRopeGeometry(supportPositions(7), 4)
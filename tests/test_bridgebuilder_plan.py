@@ -0,0 +1,135 @@
+import numpy
+
+import bridgebuilder.bridgebuilder_core as bridgebuilder_core
+import bridgebuilder.bridgebuilder_graph as bridgebuilder_graph
+import bridgebuilder.bridgebuilder_plan as bridgebuilder_plan
+
+NAME = "left_bridge_Main"
+SPAN_COUNT = 10
+VERTS_IN_SPAN = 8
+CONTROL_SPANS = [0, 3, 6, 9]
+
+
+def cylinderPositions(span_count=SPAN_COUNT, verts_in_span=VERTS_IN_SPAN, length=18.0, radius=1.0):
+    # A straight cylinder along X, one edge loop per span
+    angles = numpy.linspace(0, 2 * numpy.pi, verts_in_span, endpoint=False)
+    loops = [numpy.stack([numpy.full(verts_in_span, x), radius * numpy.cos(angles), radius * numpy.sin(angles)], 1)
+             for x in numpy.linspace(0, length, span_count)]
+    return numpy.concatenate(loops)
+
+
+def buildScene(rotation=False, mesh=None):
+    scene = bridgebuilder_graph.FakeScene()
+    if mesh:
+        scene.createNode("mesh", mesh)
+    plan = bridgebuilder_plan.compileRopePlan(NAME, cylinderPositions(), VERTS_IN_SPAN, CONTROL_SPANS,
+                                              rotation=rotation, mesh=mesh)
+    plan.doIt(scene)
+    return plan, scene
+
+
+def locatorName(index):
+    return "{}_BIND_{:02d}_LOC".format(NAME, index)
+
+
+def test_rope_plan_creates_nodes():
+    _, scene = buildScene()
+
+    assert len(scene.ls("locator")) == SPAN_COUNT
+    assert len(scene.ls("motionPath")) == SPAN_COUNT
+    assert len(scene.ls("joint")) == SPAN_COUNT + len(CONTROL_SPANS)
+    assert scene.ls("nurbsCurve") == ["{}_CRVShape".format(NAME)]
+    assert scene.getAttr("{}_CRVShape.degree".format(NAME)) == 3
+    assert scene.calls["transaction"] == 1
+
+
+def test_rope_plan_parenting():
+    _, scene = buildScene()
+
+    for i in range(SPAN_COUNT):
+        locator = locatorName(i)
+        assert scene.nodes[locator]["parent"] is None
+        assert sorted(scene.children(locator)) == sorted(["{}Shape".format(locator),
+                                                          "{}_BIND_{:02d}_JNT".format(NAME, i)])
+    for index in CONTROL_SPANS:
+        ctrl_joint = "{}_{:02d}_CTRL_JNT".format(NAME, index)
+        assert scene.nodes[ctrl_joint]["parent"] == "{}_ZERO_GRP".format(ctrl_joint)
+        assert scene.getAttr("{}.radius".format(ctrl_joint)) == 1.8
+
+
+def test_rope_plan_connections():
+    _, scene = buildScene()
+    connections = set(scene.connections)
+
+    fractions = []
+    for i in range(SPAN_COUNT):
+        motion_path = "{}_motionPath".format(locatorName(i))
+        assert ("{}_CRVShape.worldSpace[0]".format(NAME), "{}.geometryPath".format(motion_path)) in connections
+        assert ("{}.allCoordinates".format(motion_path), "{}.translate".format(locatorName(i))) in connections
+        assert scene.getAttr("{}.fractionMode".format(motion_path)) is True
+        fractions.append(scene.getAttr("{}.uValue".format(motion_path)))
+
+    # Evenly spaced spans on a straight rope sit at evenly spaced fractions of its length
+    numpy.testing.assert_allclose(fractions, numpy.linspace(0, 1, SPAN_COUNT), atol=1e-4)
+    assert not any(destination.endswith(".rotate") for _, destination in connections)
+
+
+def test_rope_plan_locators_at_span_centers():
+    _, scene = buildScene()
+    centers = bridgebuilder_core.spanCenters(cylinderPositions(), VERTS_IN_SPAN)
+
+    for i, center in enumerate(centers):
+        numpy.testing.assert_allclose(scene.getAttr("{}.translate".format(locatorName(i))), center, atol=1e-9)
+
+
+def test_rope_plan_rotation():
+    _, scene = buildScene(rotation=True)
+    connections = set(scene.connections)
+
+    for i in range(SPAN_COUNT):
+        motion_path = "{}_motionPath".format(locatorName(i))
+        assert ("{}.rotate".format(motion_path), "{}.rotate".format(locatorName(i))) in connections
+        assert scene.getAttr("{}.follow".format(motion_path)) is True
+    for index in CONTROL_SPANS:
+        # The rope runs straight down X, so the controls aren't rotated
+        rotate = scene.getAttr("{}_{:02d}_CTRL_JNT_ZERO_GRP.rotate".format(NAME, index))
+        numpy.testing.assert_allclose(rotate, (0, 0, 0), atol=1e-6)
+
+
+def test_rope_plan_binds_mesh():
+    _, scene = buildScene(mesh="rope_geo")
+
+    assert [command for command, _, _ in scene.commands] == ["skinCluster", "skinCluster"]
+    (_, (ctrl_nodes,), _), (_, (mesh_nodes,), mesh_kwargs) = scene.commands
+    ctrl_joints = ["{}_{:02d}_CTRL_JNT".format(NAME, index) for index in CONTROL_SPANS]
+    assert ctrl_nodes == ctrl_joints + ["{}_CRV".format(NAME)]
+    assert mesh_nodes == ["{}_BIND_{:02d}_JNT".format(NAME, i) for i in range(SPAN_COUNT)] + ["rope_geo"]
+    assert mesh_kwargs == {"toSelectedBones": True}
+
+
+def test_rope_plan_resolves_renamed_nodes():
+    plan, scene = buildScene()
+    second_plan = bridgebuilder_plan.compileRopePlan(NAME, cylinderPositions(), VERTS_IN_SPAN, CONTROL_SPANS)
+    node_names = second_plan.doIt(scene)
+
+    renamed = node_names[locatorName(0)]
+    assert renamed != locatorName(0) and renamed in scene.nodes
+    assert ("{}.allCoordinates".format(node_names["{}_motionPath".format(locatorName(0))]),
+            "{}.translate".format(renamed)) in set(scene.connections)
+    assert plan.nodeName(locatorName(0)) == locatorName(0)
+
+
+def test_span_update_plan():
+    _, scene = buildScene()
+    positions = cylinderPositions()
+    fingerprint = bridgebuilder_core.ropeFingerprint(NAME, positions, VERTS_IN_SPAN, CONTROL_SPANS)
+    curve_shape = "{}_CRVShape".format(NAME)
+
+    plan, bind_joints = bridgebuilder_plan.compileSpanUpdatePlan(fingerprint, positions, [2, 3], curve_shape)
+    node_names = plan.doIt(scene)
+
+    assert len(bind_joints) == 2
+    assert len(scene.ls("motionPath")) == SPAN_COUNT + 2
+    for requested in ["{}_motionPath".format(locatorName(i)) for i in (2, 3)]:
+        assert (curve_shape + ".worldSpace[0]", "{}.geometryPath".format(node_names[requested])) in \
+            set(scene.connections)
@@ -0,0 +1,86 @@
+import numpy
+import pytest
+
+import clip_format
+
+JOINTS = ["root", "spine", "head"]
+CHANNELS = ["{}.{}".format(joint, attribute) for joint in JOINTS for attribute in ("translateX", "rotateY")]
+
+
+def sampleValues(frame_count=250):
+    # Smooth curves with very different ranges per channel, plus one constant channel
+    frames = numpy.arange(frame_count)[:, None]
+    values = numpy.sin(frames / 10.0 + numpy.arange(len(CHANNELS))) * numpy.array([1, 90, 0.01, 180, 5, 0])
+    values[:, -1] = 7.5
+    return values
+
+
+def writeClip(path, values, block_frames=100, quantize=False):
+    with clip_format.ClipWriter(path, JOINTS, CHANNELS, start_frame=10, frame_rate=24.0, quantize=quantize,
+                                metadata={"scene": "walk"}) as writer:
+        for first in range(0, len(values), block_frames):
+            writer.write_block(values[first:first + block_frames])
+
+
+def test_round_trip_float32(tmp_path):
+    path = str(tmp_path / "walk.clip")
+    values = sampleValues()
+    writeClip(path, values)
+
+    reader = clip_format.ClipReader(path)
+
+    assert reader.frame_count == 250 and reader.start_frame == 10
+    assert reader.footer["scene"] == "walk" and reader.footer["frame_rate"] == 24.0
+    assert [block["frames"] for block in reader.footer["blocks"]] == [100, 100, 50]
+    numpy.testing.assert_allclose(reader.read(), values, rtol=1e-6, atol=1e-6)
+
+
+def test_round_trip_int16(tmp_path):
+    path = str(tmp_path / "walk.clip")
+    values = sampleValues()
+    writeClip(path, values, quantize=True)
+
+    read = clip_format.ClipReader(path).read()
+
+    # Each channel is off by at most half a quantisation step of its range within a block
+    steps = numpy.ptp(values, axis=0) / 65535.0
+    assert numpy.all(numpy.abs(read - values) <= steps * 0.5 + 1e-5 * numpy.abs(values).max(axis=0) + 1e-9)
+    numpy.testing.assert_array_equal(read[:, -1], 7.5)
+
+
+@pytest.mark.parametrize("quantize", [False, True])
+def test_read_channels_and_ranges_across_blocks(tmp_path, quantize):
+    path = str(tmp_path / "walk.clip")
+    values = sampleValues()
+    writeClip(path, values, quantize=quantize)
+    reader = clip_format.ClipReader(path)
+
+    read = reader.read(["head.rotateY", "root.translateX"], start=95, end=215)
+
+    # Frames are numbered from start_frame, so frame 95 is row 85
+    assert read.shape == (121, 2)
+    numpy.testing.assert_allclose(read, values[85:206][:, [5, 0]], atol=1e-3)
+    numpy.testing.assert_allclose(reader.channel("spine.rotateY"), values[:, 3], atol=1e-2)
+    assert reader.read(start=300).shape == (0, len(CHANNELS))
+
+
+def test_failed_write_leaves_no_file(tmp_path):
+    path = tmp_path / "broken.clip"
+
+    with pytest.raises(RuntimeError):
+        with clip_format.ClipWriter(str(path), JOINTS, CHANNELS) as writer:
+            writer.write_block(sampleValues(10))
+            raise RuntimeError("export failed")
+
+    assert not path.exists()
+
+
+def test_unclosed_clip_is_rejected(tmp_path):
+    path = str(tmp_path / "open.clip")
+    writer = clip_format.ClipWriter(path, JOINTS, CHANNELS)
+    writer.write_block(sampleValues(10))
+    writer.clip_file.flush()
+
+    with pytest.raises(ValueError):
+        clip_format.ClipReader(path)
+    writer.close()
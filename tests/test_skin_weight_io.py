@@ -0,0 +1,121 @@
+import numpy
+import pytest
+
+import skin_weight_io
+
+INFLUENCES = ["joint{}".format(i) for i in range(12)]
+
+
+def writeSynthetic(path, vertex_count=10000, block_size=4096, compress=True, positions=None):
+    weights = skin_weight_io.synthetic_weights(vertex_count, len(INFLUENCES), seed=vertex_count)
+    header = skin_weight_io.write_weights(path, weights, INFLUENCES, block_size=block_size, compress=compress,
+                                          metadata={"mesh": "body"}, positions=positions)
+    return weights, header
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_write_read_round_trip(tmp_path, compress):
+    path = str(tmp_path / "body.skw")
+    weights, header = writeSynthetic(path, compress=compress)
+
+    read_header, read = skin_weight_io.read_weights(path)
+
+    # The last block holds the leftover vertices
+    assert [block["vertices"] for block in header["blocks"]] == [4096, 4096, 1808]
+    assert read_header["mesh"] == "body" and read_header["influences"] == INFLUENCES
+    numpy.testing.assert_allclose(read, weights, atol=1e-7)
+
+
+def test_threshold_drops_tiny_weights(tmp_path):
+    path = str(tmp_path / "tiny.skw")
+    weights = numpy.array([[0.5, 0.5 - 1e-8, 1e-8], [1.0, 0.0, 0.0]])
+
+    header = skin_weight_io.write_weights(path, weights, INFLUENCES[:3])
+
+    assert header["blocks"][0]["nonzero"] == 3
+    numpy.testing.assert_allclose(skin_weight_io.read_weights(path)[1], [[0.5, 0.5, 0.0], [1.0, 0.0, 0.0]],
+                                  atol=1e-7)
+
+
+def test_iter_blocks_streams_every_vertex(tmp_path):
+    path = str(tmp_path / "body.skw")
+    positions = numpy.random.RandomState(1).random_sample((10000, 3))
+    weights, _ = writeSynthetic(path, block_size=1000, positions=positions)
+
+    with skin_weight_io.open_weights(path) as (header, data):
+        blocks = list(skin_weight_io.iter_blocks(header, data))
+        read_positions = skin_weight_io.read_positions(header, data)
+
+    assert [start for start, _ in blocks] == list(range(0, 10000, 1000))
+    numpy.testing.assert_allclose(numpy.concatenate([block for _, block in blocks]), weights, atol=1e-7)
+    numpy.testing.assert_allclose(read_positions, positions, atol=1e-6)
+
+
+def test_iter_blocks_lookup_reorders_and_renormalizes(tmp_path):
+    path = str(tmp_path / "body.skw")
+    weights, _ = writeSynthetic(path)
+    # The target skinCluster lists the influences in reverse, under a namespace, and doesn't have joint0
+    target = ["rig:{}".format(name) for name in reversed(INFLUENCES[1:])]
+    lookup, missing = skin_weight_io.influence_lookup(INFLUENCES, target)
+
+    with skin_weight_io.open_weights(path) as (header, data):
+        read = numpy.concatenate([block for _, block in skin_weight_io.iter_blocks(header, data, lookup, len(target))])
+
+    expected = weights[:, :0:-1]
+    totals = expected.sum(axis=1, keepdims=True)
+    expected = numpy.divide(expected, totals, out=numpy.zeros_like(expected), where=totals > 0)
+    assert missing == ["joint0"]
+    numpy.testing.assert_allclose(read, expected, atol=1e-6)
+    kept = totals[:, 0] > 0
+    numpy.testing.assert_allclose(read[kept].sum(axis=1), 1.0, atol=1e-6)
+
+
+def test_write_many_read_many_match(tmp_path):
+    jobs = [{"path": str(tmp_path / "mesh{}.skw".format(i)), "influences": INFLUENCES,
+             "weights": skin_weight_io.synthetic_weights(count, len(INFLUENCES), seed=i)}
+            for i, count in enumerate([10, 5000, 9000])]
+
+    written = [path for path, _ in skin_weight_io.write_many(jobs, workers=2)]
+    read = [numpy.zeros_like(job["weights"]) for job in jobs]
+    for job_index, start, block in skin_weight_io.read_many(((job["path"], None, None) for job in jobs), workers=2):
+        read[job_index][start:start + len(block)] = block
+
+    assert written == [job["path"] for job in jobs]
+    for job, weights in zip(jobs, read):
+        numpy.testing.assert_allclose(weights, job["weights"], atol=1e-7)
+
+
+def test_read_rejects_other_files(tmp_path):
+    path = tmp_path / "not_weights.skw"
+    path.write_bytes(b"nope" + bytes(16))
+
+    with pytest.raises(ValueError):
+        skin_weight_io.read_weights(str(path))
+
+
+def test_lookup_merging_influences_sums_their_weights(tmp_path):
+    path = str(tmp_path / "merged.skw")
+    weights = numpy.array([[0.25, 0.25, 0.5], [0.0, 0.6, 0.4]])
+    skin_weight_io.write_weights(path, weights, ["rig:joint1", "joint1", "joint2"])
+    # Both file influences resolve to the same target column once namespaces are stripped
+    lookup, missing = skin_weight_io.influence_lookup(["rig:joint1", "joint1", "joint2"], ["joint1", "joint2"])
+
+    with skin_weight_io.open_weights(path) as (header, data):
+        blocks = list(skin_weight_io.iter_blocks(header, data, lookup, 2))
+
+    assert missing == []
+    numpy.testing.assert_allclose(blocks[0][1], [[0.5, 0.5], [0.6, 0.4]], atol=1e-6)
+
+
+def test_lookup_dropping_every_influence_leaves_row_empty(tmp_path):
+    path = str(tmp_path / "dropped.skw")
+    weights = numpy.array([[1.0, 0.0, 0.0], [0.2, 0.3, 0.5]])
+    skin_weight_io.write_weights(path, weights, ["joint1", "joint2", "joint3"])
+    lookup, missing = skin_weight_io.influence_lookup(["joint1", "joint2", "joint3"], ["joint2", "joint3"])
+
+    with skin_weight_io.open_weights(path) as (header, data):
+        _, block = next(skin_weight_io.iter_blocks(header, data, lookup, 2))
+
+    assert missing == ["joint1"]
+    # The first vertex has nothing left to normalize, it is left empty for the importer to skip
+    numpy.testing.assert_allclose(block, [[0.0, 0.0], [0.375, 0.625]], atol=1e-6)